@@ -4,29 +4,40 @@
 Icon Copyright:
 Prescription by Dam from the Noun Project
 """
+from collections import deque
 from contextlib import contextmanager
 from dataclasses import replace
 from functools import partial, wraps
 import os
 import signal
-import subprocess
 import sys
+import time
 
 from PySide2.QtCore import (
     Qt,
     QCoreApplication,
+    QProcess,
     QSettings,
+    QThreadPool,
 )
 from PySide2.QtWidgets import QApplication
 from PySide2.QtUiTools import QUiLoader
 from PySide2.QtGui import QIcon, QIntValidator
 
 from ocio_lut_prescription import core
-from ocio_lut_prescription.core import ui
+from ocio_lut_prescription.core import (
+    bake_queue,
+    memory,
+    metrics,
+    presets,
+    preview,
+    stream,
+    ui,
+)
 from ocio_lut_prescription.ui import qrc  # pylint: disable=unused-import
 
 
-def main():
+def main():  # pylint: disable=too-many-statements
     """main application function"""
     # Adds Ctrl+C support to kill app
     signal.signal(signal.SIGINT, signal.SIG_DFL)
@@ -38,6 +49,10 @@ def main():
     QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
 
     app = QApplication(sys.argv)
+    # turned on before the config of the settings is loaded, reported on exit
+    app.aboutToQuit.connect(
+        partial(memory.write_memory_report, memory.start_from_env())
+    )
     app.setOrganizationName("djieffx")
     app.setApplicationName("ocio-lut-prescription")
 
@@ -49,7 +64,13 @@ def main():
     main_window.setWindowIcon(QIcon(":/icons/icon.png"))
     main_window.iccWhitePointLineEdit.setValidator(QIntValidator(1, 10000))
 
+    preview.initialize_preview(main_window)
+    bake_queue.initialize_bake_queue(main_window)
+
     settings = QSettings()
+    preset_store = presets.open_preset_store()
+    show = presets.get_default_show()
+    ui.prewarm_processors(main_window, settings)
     if env_ocio:
         main_window.ocioCfgLineEdit.setText(env_ocio)
         main_window.ocioSeqLineEdit.setText(env_sequence)
@@ -97,26 +118,107 @@ def main():
 
         return decorator
 
-    @with_ocio_context()
+    log_tail = deque(maxlen=stream.LOG_TAIL_LINES)
+    main_window.resultLogTextEdit.document().setMaximumBlockCount(stream.LOG_TAIL_LINES)
+
+    def read_bake_output(process: QProcess):
+        """stream the ociobakelut output lines to the log while it runs"""
+        while process.canReadLine():
+            line = bytes(process.readLine()).decode("utf-8", errors="replace")
+            log_tail.append(line.rstrip("\n"))
+            main_window.resultLogTextEdit.append(log_tail[-1])
+
+    def finish_bake_lut(
+        process: QProcess,
+        bake_cmd_data: ui.BakeCmdData,
+        ociobakelut_cmd: list,
+        cube_size_note: str,
+        start: float,
+        exit_code: int,
+        exit_status: QProcess.ExitStatus,
+    ):
+        """report the outcome of the bake, with the tail of its output"""
+        read_bake_output(process)
+        remainder = bytes(process.readAll()).decode("utf-8", errors="replace")
+        if remainder:
+            log_tail.append(remainder)
+        if exit_code or exit_status != QProcess.NormalExit:
+            main_window.resultLineEdit.setText("Error")
+            main_window.resultLogTextEdit.setText("\n".join(log_tail))
+        else:
+            main_window.resultLineEdit.setText(bake_cmd_data.lut_filename)
+            main_window.resultLogTextEdit.setText(
+                core.ocio_report(
+                    bake_cmd_data, ociobakelut_cmd, "\n".join(log_tail), cube_size_note
+                )
+            )
+        metrics.export_bake(
+            bake_cmd_data,
+            not exit_code and exit_status == QProcess.NormalExit,
+            time.perf_counter() - start,
+        )
+        process.deleteLater()
+        ui.check_to_enable_baking(main_window)
+
+    def fail_bake_lut(
+        process: QProcess,
+        bake_cmd_data: ui.BakeCmdData,
+        start: float,
+        error: QProcess.ProcessError,
+    ):
+        """report an ociobakelut that could not start, finished is not emitted"""
+        if error != QProcess.FailedToStart:
+            return
+        main_window.resultLineEdit.setText("Error")
+        main_window.resultLogTextEdit.setText(
+            f"Cannot run {process.program()}: {process.errorString()}"
+        )
+        metrics.export_bake(bake_cmd_data, False, time.perf_counter() - start)
+        process.deleteLater()
+        ui.check_to_enable_baking(main_window)
+
     def process_bake_lut():
-        """from the UI, generate a valid ociobakelut command, and execute it"""
-        bake_cmd_data = ui.BakeCmdData(*ui.get_bake_cmd_data(main_window))
+        """from the UI, resolve the cube size in the background, then bake"""
+        log_tail.clear()
+        main_window.resultLineEdit.clear()
+        main_window.resultLogTextEdit.clear()
+        main_window.processBakeLutPushButton.setDisabled(True)
+
+        worker = bake_queue.CubeSizeWorker(
+            ui.BakeCmdData(*ui.get_bake_cmd_data(main_window))
+        )
+        worker.signals.resolved.connect(start_bake_lut)
+        # keep a reference, the worker must outlive this call
+        main_window.cube_size_worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    @with_ocio_context()
+    def start_bake_lut(bake_cmd_data: ui.BakeCmdData, cube_size_note: str):
+        """generate a valid ociobakelut command, and execute it"""
         lut_name_param = {"lut_filename": core.get_lut_filename(bake_cmd_data)}
         bake_cmd_data = replace(bake_cmd_data, **lut_name_param)
         ociobakelut_cmd = core.get_ociobakelut_cmd(bake_cmd_data)
 
-        with subprocess.Popen(
-            ociobakelut_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        ) as process:
-            _, stderr = process.communicate()
-
-            if process.returncode:
-                main_window.resultLineEdit.setText("Error")
-                main_window.resultLogTextEdit.setText(stderr.decode("utf-8"))
-            else:
-                main_window.resultLineEdit.setText(bake_cmd_data.lut_filename)
-                stringed_log = core.ocio_report(bake_cmd_data, ociobakelut_cmd)
-                main_window.resultLogTextEdit.setText(stringed_log)
+        # the process inherits the ocio context of the environment when started
+        process = QProcess(main_window)
+        process.setProcessChannelMode(QProcess.MergedChannels)
+        process.readyReadStandardOutput.connect(partial(read_bake_output, process))
+        start = time.perf_counter()
+        # PySide2 connects a partial to the finished(int) overload otherwise
+        process.finished[int, QProcess.ExitStatus].connect(
+            partial(
+                finish_bake_lut,
+                process,
+                bake_cmd_data,
+                ociobakelut_cmd,
+                cube_size_note,
+                start,
+            )
+        )
+        process.errorOccurred.connect(
+            partial(fail_bake_lut, process, bake_cmd_data, start)
+        )
+        process.start(ociobakelut_cmd[0], ociobakelut_cmd[1:])
 
     main_window.ocioCfgLoadPushButton.clicked.connect(
         partial(ui.browse_for_ocio_config, main_window, settings)
@@ -180,6 +282,7 @@ def main():
     main_window.actionSettingsClear.triggered.connect(
         partial(ui.settings_clear, app, settings, main_window)
     )
+    ui.connect_preset_actions(main_window, settings, preset_store, show)
     main_window.processBakeLutPushButton.clicked.connect(process_bake_lut)
 
     main_window.show()
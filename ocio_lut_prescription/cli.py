@@ -0,0 +1,548 @@
+"""Command line batch baking of LUT prescription manifests
+
+A manifest is a json list of prescriptions, see core.batch for its format.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from ocio_lut_prescription.core import (
+    batch,
+    engine,
+    lut_diff,
+    memory,
+    metrics,
+    prefetch,
+    preflight,
+    presets,
+    shard,
+    work_queue,
+)
+
+
+def print_bake_line(lut_filename: str, _stream_name: str, line: str):
+    print(f"[{os.path.basename(lut_filename)}] {line}", file=sys.stderr, flush=True)
+
+
+def print_prefetch_report(report: prefetch.PrefetchReport):
+    print(
+        f"Prefetched {report.files} files, {report.bytes_read / 1024**2:.1f} MB in "
+        f"{report.duration:.2f}s (read one by one: {report.read_time:.2f}s, "
+        f"saved: {report.time_saved:.2f}s)",
+        file=sys.stderr,
+    )
+    for file_name in report.missing:
+        print(f"Missing file: {file_name}", file=sys.stderr)
+
+
+def load_presets(names: list, show: str) -> list:
+    """Prescriptions of named presets, exit on an unknown name"""
+    preset_store = presets.PresetStore()
+    jobs = [preset_store.load(name, show) for name in names]
+    preset_store.close()
+    missing = [name for name, job in zip(names, jobs) if job is None]
+    if missing:
+        sys.exit(f"Unknown presets for show '{show}': {', '.join(missing)}")
+    return jobs
+
+
+def bake_command(args: argparse.Namespace) -> int:
+    if args.memory_report:
+        memory.ACCOUNTING.start()
+    jobs = batch.load_manifest(args.manifest) if args.manifest else []
+    jobs += load_presets(args.presets or [], args.show)
+    journal_path = args.journal or (
+        f"{args.manifest}.journal" if args.manifest else None
+    )
+    try:
+        results = batch.run_batch(
+            jobs,
+            workers=args.workers,
+            preflight=not args.no_preflight,
+            journal_path=journal_path,
+            resume=args.resume,
+            on_line=print_bake_line,
+            in_process=args.in_process
+            or args.share_input
+            or args.resample_tolerance is not None
+            or bool(args.lattice_processes),
+            resample_tolerance=args.resample_tolerance,
+            on_prefetch=None if args.no_prefetch else print_prefetch_report,
+            share_input=args.share_input,
+            auto_cube_tolerance=args.auto_cube_tolerance,
+            lattice_processes=args.lattice_processes,
+        )
+    except preflight.PreflightError as err:
+        print(f"Preflight failed:\n{err}", file=sys.stderr)
+        return 2
+    finally:
+        if args.metrics:
+            metrics.write_metrics(args.metrics)
+        memory.write_memory_report(args.memory_report)
+
+    if args.report:
+        batch.write_report(args.report, results)
+
+    for result in results:
+        if result.resumed:
+            print(f"SKIP  {result.lut_filename}")
+        elif result.ok:
+            print(f"OK    {result.lut_filename} ({result.duration:.2f}s)")
+        else:
+            print(f"ERROR {result.lut_filename}\n{result.log}", file=sys.stderr)
+    return 0 if all(result.ok for result in results) else 1
+
+
+def presets_list_command(args: argparse.Namespace) -> int:
+    preset_store = presets.PresetStore()
+    for preset in preset_store.list(args.show, args.config, args.output_space):
+        print(
+            f"{preset.show or '-':<16} {preset.name:<40} {preset.output_space:<24} "
+            f"{preset.ocio_config}"
+        )
+    preset_store.close()
+    return 0
+
+
+def presets_export_command(args: argparse.Namespace) -> int:
+    batch.write_manifest(args.output, load_presets(args.names, args.show))
+    return 0
+
+
+def prefetch_command(args: argparse.Namespace) -> int:
+    report = prefetch.prefetch_jobs(batch.load_manifest(args.manifest), args.workers)
+    print_prefetch_report(report)
+    return 0
+
+
+def preflight_command(args: argparse.Namespace) -> int:
+    jobs = batch.load_manifest(args.manifest)
+    try:
+        preflight.run_preflight(jobs)
+    except preflight.PreflightError as err:
+        print(f"Preflight failed:\n{err}", file=sys.stderr)
+        return 2
+    print(f"Preflight passed: {len(jobs)} jobs")
+    return 0
+
+
+def multi_config_command(args: argparse.Namespace) -> int:
+    jobs = batch.load_manifest(args.manifest)
+    try:
+        summaries = batch.run_multi_config(
+            jobs, args.configs, args.output_root, workers=args.workers
+        )
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 2
+
+    print(f"{'config':<40} {'jobs':>6} {'failed':>6} {'time':>9}")
+    for summary in summaries:
+        print(
+            f"{summary.label:<40} {len(summary.results):>6} {summary.failed:>6} "
+            f"{summary.duration:>8.2f}s"
+        )
+        if summary.error:
+            print(f"Preflight failed:\n{summary.error}", file=sys.stderr)
+    return 0 if all(not s.failed and not s.error for s in summaries) else 1
+
+
+def shard_command(args: argparse.Namespace) -> int:
+    jobs = batch.load_manifest(args.manifest)
+    for shard_dir in shard.write_shards(jobs, args.shards, args.shards_dir):
+        with open(
+            os.path.join(shard_dir, shard.SHARD_INFO_FILENAME), encoding="utf-8"
+        ) as shard_info_file:
+            shard_info = json.load(shard_info_file)
+        print(f"{shard_dir}: {shard_info['jobs']} jobs, cost {shard_info['cost']:.0f}")
+    return 0
+
+
+def merge_command(args: argparse.Namespace) -> int:
+    shard_dirs = [
+        os.path.dirname(shard_info_path)
+        for shard_info_path in glob.glob(
+            os.path.join(args.shards_dir, "*", shard.SHARD_INFO_FILENAME)
+        )
+    ]
+    report_path = args.report or os.path.join(args.shards_dir, shard.REPORT_FILENAME)
+    results, missing_shards = shard.merge_shards(shard_dirs, report_path)
+    failed = sum(not result.ok for result in results)
+    print(f"Merged {len(results)} jobs, {failed} failed, report: {report_path}")
+    for shard_dir in missing_shards:
+        print(f"Missing report: {shard_dir}", file=sys.stderr)
+    return 0 if not failed and not missing_shards else 1
+
+
+def queue_submit_command(args: argparse.Namespace) -> int:
+    jobs = batch.load_manifest(args.manifest)
+    try:
+        count = work_queue.submit_jobs(
+            jobs,
+            args.queue_dir,
+            lease_timeout=args.lease_timeout,
+            preflight=not args.no_preflight,
+            auto_cube_tolerance=args.auto_cube_tolerance,
+        )
+    except preflight.PreflightError as err:
+        print(f"Preflight failed:\n{err}", file=sys.stderr)
+        return 2
+    print(f"Queued {count} jobs in {args.queue_dir}")
+    return 0
+
+
+def queue_work_command(args: argparse.Namespace) -> int:
+    try:
+        results = work_queue.run_worker(
+            args.queue_dir, args.workers, args.worker_id, on_line=print_bake_line
+        )
+    finally:
+        if args.metrics:
+            metrics.write_metrics(args.metrics)
+    for result in results:
+        if result.ok:
+            print(f"OK    {result.lut_filename} ({result.duration:.2f}s)")
+        else:
+            print(f"ERROR {result.lut_filename}\n{result.log}", file=sys.stderr)
+    return 0 if all(result.ok for result in results) else 1
+
+
+def queue_gather_command(args: argparse.Namespace) -> int:
+    report_path = args.report or os.path.join(args.queue_dir, shard.REPORT_FILENAME)
+    results, unfinished = work_queue.gather_results(args.queue_dir, report_path)
+    failed = sum(not result.ok for result in results)
+    print(f"Gathered {len(results)} jobs, {failed} failed, report: {report_path}")
+    for job_name in unfinished:
+        print(f"Unfinished: {job_name}", file=sys.stderr)
+    return 0 if not failed and not unfinished else 1
+
+
+def diff_command(args: argparse.Namespace) -> int:
+    names = (
+        [
+            os.path.basename(job.lut_filename)
+            for job in batch.load_manifest(args.manifest)
+        ]
+        if args.manifest
+        else None
+    )
+    diffs = lut_diff.diff_directories(args.old_dir, args.new_dir, names, args.workers)
+    significant = lut_diff.write_diff_report(args.report, diffs, args.threshold)
+    statuses = sorted({diff.status for diff in diffs})
+    print(
+        f"{len(diffs)} LUTs: "
+        + ", ".join(
+            f"{sum(diff.status == status for diff in diffs)} {status}"
+            for status in statuses
+        )
+        + f", {len(significant)} above {args.threshold:.3g}"
+    )
+    for diff in significant:
+        if diff.status in lut_diff.STRUCTURAL_STATUSES:
+            print(f"{diff.status.upper():<10} {diff.name} {diff.error}".rstrip())
+        else:
+            print(
+                f"{diff.status.upper():<10} {diff.name} max {diff.max_delta:.3g} "
+                f"mean {diff.mean_delta:.3g} p{lut_diff.PERCENTILE} "
+                f"{diff.p99_delta:.3g}"
+            )
+    return 1 if significant else 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ocio-lut-prescription-batch", description=__doc__
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bake_parser = subparsers.add_parser("bake", help="bake every job of a manifest")
+    bake_parser.add_argument(
+        "manifest", nargs="?", help="json manifest of prescriptions"
+    )
+    bake_parser.add_argument(
+        "-p",
+        "--preset",
+        dest="presets",
+        action="append",
+        help="bake a preset of the library, repeat for each preset",
+    )
+    bake_parser.add_argument(
+        "--show",
+        default=presets.get_default_show(),
+        help="show of the presets (default: $SHOW)",
+    )
+    bake_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="maximum concurrent bakes, fewer run when memory or cpus are short "
+        "(default: twice the cpu count)",
+    )
+    bake_parser.add_argument(
+        "--no-preflight",
+        action="store_true",
+        help="skip the config and jobs validation before baking",
+    )
+    bake_parser.add_argument(
+        "--no-prefetch",
+        action="store_true",
+        help="skip reading the files referenced by the jobs ahead of the bakes",
+    )
+    bake_parser.add_argument("--report", help="write the results to a json file")
+    bake_parser.add_argument(
+        "--metrics",
+        default=metrics.get_metrics_path(),
+        help="write bake statistics to an OpenMetrics text file, e.g. for the "
+        f"node_exporter textfile collector (default: ${metrics.METRICS_PATH_ENV})",
+    )
+    bake_parser.add_argument(
+        "--memory-report",
+        default=memory.get_memory_report_path(),
+        help="account the memory of each stage, config parsings, manifest "
+        "loading, planning, preflight and bakes, in a json file "
+        f"(default: ${memory.MEMORY_REPORT_ENV})",
+    )
+    bake_parser.add_argument(
+        "--journal",
+        help="journal of the finished bakes (default: <manifest>.journal)",
+    )
+    bake_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the jobs the journal records as baked, if their output is unchanged",
+    )
+    bake_parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="bake without ociobakelut when possible, a prescription listing "
+        "several lut_formats is then evaluated once",
+    )
+    bake_parser.add_argument(
+        "--derive-cube-sizes",
+        dest="resample_tolerance",
+        type=float,
+        nargs="?",
+        const=engine.DEFAULT_RESAMPLE_TOLERANCE,
+        metavar="TOLERANCE",
+        help="bake in process, resampling the smaller cube sizes of a transform "
+        "from its largest one, unless the resampling error exceeds the tolerance "
+        f"(default: {engine.DEFAULT_RESAMPLE_TOLERANCE:.3g})",
+    )
+    bake_parser.add_argument(
+        "--share-input",
+        action="store_true",
+        help="bake in process, the jobs sharing an input space evaluate its "
+        "conversion to the reference space once, for every output space",
+    )
+    bake_parser.add_argument(
+        "--lattice-processes",
+        type=int,
+        metavar="PROCESSES",
+        help="bake in process, the lattices of large cube sizes are evaluated by "
+        "that many worker processes, in shared memory",
+    )
+    bake_parser.add_argument(
+        "--auto-cube-tolerance",
+        type=float,
+        default=engine.DEFAULT_AUTO_CUBE_TOLERANCE,
+        metavar="TOLERANCE",
+        help='largest interpolation error of the jobs whose cube_size is "auto", '
+        "the smallest size within it is baked "
+        f"(default: {engine.DEFAULT_AUTO_CUBE_TOLERANCE:.3g})",
+    )
+    bake_parser.set_defaults(func=bake_command)
+
+    multi_config_parser = subparsers.add_parser(
+        "multi-config",
+        help="bake a manifest with several configs, one process per config",
+    )
+    multi_config_parser.add_argument("manifest", help="json manifest of prescriptions")
+    multi_config_parser.add_argument(
+        "-c",
+        "--config",
+        dest="configs",
+        action="append",
+        required=True,
+        help="ocio config to bake with, repeat for each config",
+    )
+    multi_config_parser.add_argument(
+        "-o",
+        "--output-root",
+        required=True,
+        help="directory receiving one sub-directory per config",
+    )
+    multi_config_parser.add_argument(
+        "-j", "--workers", type=int, help="concurrent bakes per config"
+    )
+    multi_config_parser.set_defaults(func=multi_config_command)
+
+    shard_parser = subparsers.add_parser(
+        "shard", help="split a manifest into cost balanced shards for render nodes"
+    )
+    shard_parser.add_argument("manifest", help="json manifest of prescriptions")
+    shard_parser.add_argument(
+        "-n", "--shards", type=int, required=True, help="number of shards"
+    )
+    shard_parser.add_argument(
+        "-o", "--shards-dir", required=True, help="directory receiving the shards"
+    )
+    shard_parser.set_defaults(func=shard_command)
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="copy the LUTs baked by shards to their destination"
+    )
+    merge_parser.add_argument("shards_dir", help="directory holding the shards")
+    merge_parser.add_argument(
+        "--report", help="merged report (default: <shards_dir>/report.json)"
+    )
+    merge_parser.set_defaults(func=merge_command)
+
+    diff_parser = subparsers.add_parser(
+        "diff",
+        help="compare the values of the LUTs of two output directories, by file name",
+    )
+    diff_parser.add_argument("old_dir", help="directory of the LUTs baked before")
+    diff_parser.add_argument("new_dir", help="directory of the LUTs baked after")
+    diff_parser.add_argument(
+        "--manifest",
+        help="compare the LUTs of the prescriptions of a manifest only, their files "
+        "missing from either or both directories included",
+    )
+    diff_parser.add_argument(
+        "--report",
+        default="lut_diff.json",
+        help="json report of the significant changes (default: lut_diff.json)",
+    )
+    diff_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=lut_diff.DEFAULT_THRESHOLD,
+        help="largest value difference of an insignificant change "
+        f"(default: {lut_diff.DEFAULT_THRESHOLD:.3g})",
+    )
+    diff_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="concurrent processes (default: the cpu count)",
+    )
+    diff_parser.set_defaults(func=diff_command)
+
+    queue_parser = subparsers.add_parser(
+        "queue", help="bake a manifest with workers pulling from a shared directory"
+    )
+    queue_subparsers = queue_parser.add_subparsers(dest="queue_command", required=True)
+    queue_submit_parser = queue_subparsers.add_parser(
+        "submit", help="check the jobs of a manifest and queue them"
+    )
+    queue_submit_parser.add_argument("manifest", help="json manifest of prescriptions")
+    queue_submit_parser.add_argument("queue_dir", help="shared queue directory")
+    queue_submit_parser.add_argument(
+        "--lease-timeout",
+        type=float,
+        default=work_queue.DEFAULT_LEASE_TIMEOUT,
+        help="seconds after which the job of a silent worker is queued again "
+        f"(default: {work_queue.DEFAULT_LEASE_TIMEOUT:.0f})",
+    )
+    queue_submit_parser.add_argument(
+        "--no-preflight",
+        action="store_true",
+        help="skip the config and jobs validation before queueing",
+    )
+    queue_submit_parser.add_argument(
+        "--auto-cube-tolerance",
+        type=float,
+        default=engine.DEFAULT_AUTO_CUBE_TOLERANCE,
+        metavar="TOLERANCE",
+        help='largest interpolation error of the jobs whose cube_size is "auto" '
+        f"(default: {engine.DEFAULT_AUTO_CUBE_TOLERANCE:.3g})",
+    )
+    queue_submit_parser.set_defaults(func=queue_submit_command)
+    queue_work_parser = queue_subparsers.add_parser(
+        "work", help="bake queued jobs until none is left"
+    )
+    queue_work_parser.add_argument("queue_dir", help="shared queue directory")
+    queue_work_parser.add_argument(
+        "-j", "--workers", type=int, default=1, help="concurrent bakes (default: 1)"
+    )
+    queue_work_parser.add_argument(
+        "--worker-id", help="name of the worker in the claims (default: host-pid)"
+    )
+    queue_work_parser.add_argument(
+        "--metrics",
+        default=metrics.get_metrics_path(),
+        help="write bake statistics to an OpenMetrics text file once the worker "
+        f"is done (default: ${metrics.METRICS_PATH_ENV})",
+    )
+    queue_work_parser.set_defaults(func=queue_work_command)
+    queue_gather_parser = queue_subparsers.add_parser(
+        "gather", help="combine the results of the workers into one report"
+    )
+    queue_gather_parser.add_argument("queue_dir", help="shared queue directory")
+    queue_gather_parser.add_argument(
+        "--report", help="combined report (default: <queue_dir>/report.json)"
+    )
+    queue_gather_parser.set_defaults(func=queue_gather_command)
+
+    presets_parser = subparsers.add_parser(
+        "presets", help="list or export the presets of the library"
+    )
+    presets_subparsers = presets_parser.add_subparsers(
+        dest="presets_command", required=True
+    )
+    presets_list_parser = presets_subparsers.add_parser(
+        "list", help="list the presets matching every given filter"
+    )
+    presets_list_parser.add_argument("--show")
+    presets_list_parser.add_argument("--config")
+    presets_list_parser.add_argument("--output-space")
+    presets_list_parser.set_defaults(func=presets_list_command)
+    presets_export_parser = presets_subparsers.add_parser(
+        "export", help="write presets to a manifest"
+    )
+    presets_export_parser.add_argument("names", nargs="+", help="preset names")
+    presets_export_parser.add_argument(
+        "-o", "--output", required=True, help="manifest to write"
+    )
+    presets_export_parser.add_argument(
+        "--show",
+        default=presets.get_default_show(),
+        help="show of the presets (default: $SHOW)",
+    )
+    presets_export_parser.set_defaults(func=presets_export_command)
+
+    prefetch_parser = subparsers.add_parser(
+        "prefetch", help="read the files referenced by a manifest into the page cache"
+    )
+    prefetch_parser.add_argument("manifest", help="json manifest of prescriptions")
+    prefetch_parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=prefetch.PREFETCH_WORKERS,
+        help=f"concurrent reads (default: {prefetch.PREFETCH_WORKERS})",
+    )
+    prefetch_parser.set_defaults(func=prefetch_command)
+
+    preflight_parser = subparsers.add_parser(
+        "preflight", help="validate the configs and jobs of a manifest"
+    )
+    preflight_parser.add_argument("manifest", help="json manifest of prescriptions")
+    preflight_parser.set_defaults(func=preflight_command)
+
+    return parser
+
+
+def main(argv=None):
+    """batch application function"""
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.command == "bake" and not args.manifest and not args.presets:
+        parser.error("bake needs a manifest or presets")
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -115,7 +115,19 @@ def get_ociobakelut_cmd(bake_cmd_data: BakeCmdData) -> list:
     return cmd
 
 
-def ocio_report(bake_cmd_data: BakeCmdData, ociobakelut_cmd: list) -> str:
+def ocio_report(
+    bake_cmd_data: BakeCmdData,
+    ociobakelut_cmd: list,
+    log_tail: str = "",
+    cube_size_note: str = "",
+) -> str:
+    log_section = (
+        f"\nociobakelut output (last lines):\n{log_tail}\n" if log_tail else ""
+    )
+    cube_size = bake_cmd_data.cube_size if bake_cmd_data.use_cube_size else "default"
+    cube_size_line = (
+        f"Cube Size: {cube_size} ({cube_size_note})\n" if cube_size_note else ""
+    )
     return f"""--------- LUT prescription below -----------
 OCIO: {bake_cmd_data.ocio_config}
 SEQ: {bake_cmd_data.env_seq if bake_cmd_data.env_seq else 'N/A'}
@@ -124,8 +136,8 @@ Input ColorSpace: {bake_cmd_data.input_space}
 Shaper ColorSpace: {bake_cmd_data.shaper_space if bake_cmd_data.use_shaper_space else 'N/A'}
 Output ColorSpace: {bake_cmd_data.output_space if bake_cmd_data.use_output_space else 'N/A'}
 Look: {bake_cmd_data.looks if bake_cmd_data.use_looks else 'N/A'}
-
+{cube_size_line}
 LUT Location: {bake_cmd_data.lut_filename}
 
 Executed command: {' '.join(ociobakelut_cmd)}
---------------------------------------------"""
+{log_section}--------------------------------------------"""
@@ -0,0 +1,315 @@
+# pylint: disable=no-name-in-module
+"""bake_queue submodule of the core module, bakes queued in the main window
+
+"Add to Queue" snapshots the form into a row of the queue table, an "auto"
+cube size is searched in the background before the row is queued. Running the
+queue starts the queued rows in ociobakelut processes, a few at a time, driven
+by the event loop, so the window stays responsive while they bake. Rows that
+are not running can be reordered, removed once resolved, failed rows retried.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field, replace
+from functools import partial
+
+from PySide2.QtCore import (
+    QObject,
+    QProcess,
+    QProcessEnvironment,
+    QRunnable,
+    QThreadPool,
+    Signal,
+)
+from PySide2.QtWidgets import QMainWindow, QTableWidgetItem
+
+from ocio_lut_prescription import core
+from ocio_lut_prescription.core import batch, engine, metrics, resources, stream, ui
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+RESOLVING = "Resolving"
+QUEUED = "Queued"
+RUNNING = "Running"
+DONE = "Done"
+FAILED = "Failed"
+QUEUE_COLUMNS = ("Status", "Transform", "Format", "Duration", "Output")
+
+
+@dataclass(eq=False)
+class QueueRow:  # pylint: disable=too-many-instance-attributes
+    """A bake of the queue, the form as it was when it was added. Rows compare
+    by identity, the same bake can be queued twice"""
+
+    bake_cmd_data: BakeCmdData
+    ociobakelut_cmd: list
+    cube_size_note: str = ""
+    status: str = QUEUED
+    duration: float | None = None
+    log: str = ""
+    start: float = 0.0
+    process: QProcess | None = field(default=None, repr=False)
+    cube_size_worker: CubeSizeWorker | None = field(default=None, repr=False)
+
+    @property
+    def transform(self) -> str:
+        bake_cmd_data = self.bake_cmd_data
+        if bake_cmd_data.use_looks:
+            return f"{bake_cmd_data.input_space} + {bake_cmd_data.looks}"
+        return f"{bake_cmd_data.input_space} -> {bake_cmd_data.output_space}"
+
+
+def get_queue_row(bake_cmd_data: BakeCmdData, cube_size_note: str = "") -> QueueRow:
+    """Queued row of a bake whose cube size is resolved, with its file name, as
+    the bake button does"""
+    bake_cmd_data = replace(
+        bake_cmd_data, lut_filename=core.get_lut_filename(bake_cmd_data)
+    )
+    return QueueRow(
+        bake_cmd_data, core.get_ociobakelut_cmd(bake_cmd_data), cube_size_note
+    )
+
+
+class CubeSizeSignals(QObject):
+    """Signals of CubeSizeWorker, a QRunnable cannot emit them itself"""
+
+    resolved = Signal(object, str)
+
+
+class CubeSizeWorker(QRunnable):
+    """Resolve an "auto" cube size off the UI thread, its search evaluates the
+    transform at several sizes"""
+
+    def __init__(self, bake_cmd_data: BakeCmdData):
+        super().__init__()
+        self.bake_cmd_data = bake_cmd_data
+        self.signals = CubeSizeSignals()
+
+    def run(self):
+        self.signals.resolved.emit(*engine.resolve_cube_size(self.bake_cmd_data))
+
+
+def initialize_bake_queue(main_window: QMainWindow, workers: int | None = None):
+    main_window.bake_queue = []
+    main_window.bake_queue_running = False
+    main_window.bake_queue_workers = workers or resources.get_cpu_count()
+    table = main_window.queueTableWidget
+    table.setColumnCount(len(QUEUE_COLUMNS))
+    table.setHorizontalHeaderLabels(QUEUE_COLUMNS)
+
+    main_window.addToQueuePushButton.clicked.connect(
+        partial(add_form_to_queue, main_window)
+    )
+    main_window.runQueuePushButton.clicked.connect(partial(run_queue, main_window))
+    main_window.moveUpQueuePushButton.clicked.connect(
+        partial(move_selected_rows, main_window, -1)
+    )
+    main_window.moveDownQueuePushButton.clicked.connect(
+        partial(move_selected_rows, main_window, 1)
+    )
+    main_window.retryQueuePushButton.clicked.connect(
+        partial(retry_failed_rows, main_window)
+    )
+    main_window.removeQueuePushButton.clicked.connect(
+        partial(remove_selected_rows, main_window)
+    )
+    table.cellDoubleClicked.connect(partial(show_row_report, main_window))
+
+
+def add_form_to_queue(main_window: QMainWindow):
+    add_to_queue(main_window, BakeCmdData(*ui.get_bake_cmd_data(main_window)))
+
+
+def add_to_queue(main_window: QMainWindow, bake_cmd_data: BakeCmdData):
+    if not engine.is_auto_cube_size(bake_cmd_data):
+        main_window.bake_queue.append(get_queue_row(bake_cmd_data))
+        refresh_queue_table(main_window)
+        start_queued_rows(main_window)
+        return
+
+    row = QueueRow(bake_cmd_data, [], status=RESOLVING)
+    row.cube_size_worker = CubeSizeWorker(bake_cmd_data)
+    row.cube_size_worker.signals.resolved.connect(
+        partial(resolve_row, main_window, row)
+    )
+    main_window.bake_queue.append(row)
+    refresh_queue_table(main_window)
+    QThreadPool.globalInstance().start(row.cube_size_worker)
+
+
+def resolve_row(
+    main_window: QMainWindow,
+    row: QueueRow,
+    bake_cmd_data: BakeCmdData,
+    cube_size_note: str,
+):
+    """Queue a row once its cube size is resolved"""
+    resolved_row = get_queue_row(bake_cmd_data, cube_size_note)
+    row.bake_cmd_data = resolved_row.bake_cmd_data
+    row.ociobakelut_cmd = resolved_row.ociobakelut_cmd
+    row.cube_size_note = cube_size_note
+    row.status = QUEUED
+    row.cube_size_worker = None
+    update_queue_row(main_window, row)
+    start_queued_rows(main_window)
+
+
+def run_queue(main_window: QMainWindow):
+    main_window.bake_queue_running = True
+    start_queued_rows(main_window)
+
+
+def start_queued_rows(main_window: QMainWindow):
+    """Start queued rows, in table order, while fewer than the queue workers
+    run"""
+    if not main_window.bake_queue_running:
+        return
+    for row in main_window.bake_queue:
+        statuses = [queue_row.status for queue_row in main_window.bake_queue]
+        if statuses.count(RUNNING) >= main_window.bake_queue_workers:
+            return
+        if row.status == QUEUED:
+            start_row(main_window, row)
+    # rows still resolving start once resolved
+    if all(row.status not in (RUNNING, RESOLVING) for row in main_window.bake_queue):
+        main_window.bake_queue_running = False
+
+
+def start_row(main_window: QMainWindow, row: QueueRow):
+    process = QProcess(main_window)
+    process.setProcessChannelMode(QProcess.MergedChannels)
+    environment = QProcessEnvironment()
+    for name, value in batch.get_bake_env(row.bake_cmd_data).items():
+        environment.insert(name, value)
+    process.setProcessEnvironment(environment)
+    # PySide2 connects a partial to the finished(int) overload otherwise
+    process.finished[int, QProcess.ExitStatus].connect(
+        partial(finish_row, main_window, row)
+    )
+    process.errorOccurred.connect(partial(fail_to_start_row, main_window, row))
+
+    row.process = process
+    row.status = RUNNING
+    row.duration = None
+    row.log = ""
+    row.start = time.perf_counter()
+    update_queue_row(main_window, row)
+    process.start(row.ociobakelut_cmd[0], row.ociobakelut_cmd[1:])
+
+
+def finish_row(
+    main_window: QMainWindow,
+    row: QueueRow,
+    exit_code: int,
+    exit_status: QProcess.ExitStatus,
+):
+    output = bytes(row.process.readAll()).decode("utf-8", errors="replace")
+    ok = not exit_code and exit_status == QProcess.NormalExit
+    end_row(main_window, row, ok, output)
+
+
+def fail_to_start_row(main_window: QMainWindow, row: QueueRow, error):
+    # a process that started reports its errors when it finishes
+    if error == QProcess.FailedToStart and row.status == RUNNING:
+        end_row(main_window, row, False, row.process.errorString())
+
+
+def end_row(main_window: QMainWindow, row: QueueRow, ok: bool, output: str):
+    row.duration = time.perf_counter() - row.start
+    row.status = DONE if ok else FAILED
+    row.log = "\n".join(output.splitlines()[-stream.LOG_TAIL_LINES :])
+    row.process.deleteLater()
+    row.process = None
+    metrics.export_bake(row.bake_cmd_data, ok, row.duration)
+    update_queue_row(main_window, row)
+    start_queued_rows(main_window)
+
+
+def get_selected_indices(main_window: QMainWindow) -> list:
+    return sorted(
+        {index.row() for index in main_window.queueTableWidget.selectedIndexes()}
+    )
+
+
+def move_selected_rows(main_window: QMainWindow, offset: int):
+    """Move the selected rows one place up or down, running rows stay in place"""
+    queue = main_window.bake_queue
+    selected = get_selected_indices(main_window)
+    moved = []
+    for index in selected if offset < 0 else reversed(selected):
+        target = index + offset
+        if (
+            0 <= target < len(queue)
+            and target not in moved
+            and RUNNING not in (queue[index].status, queue[target].status)
+        ):
+            queue[index], queue[target] = queue[target], queue[index]
+            moved.append(target)
+        else:
+            moved.append(index)
+    refresh_queue_table(main_window)
+    select_rows(main_window, moved)
+
+
+def remove_selected_rows(main_window: QMainWindow):
+    selected = set(get_selected_indices(main_window))
+    main_window.bake_queue = [
+        row
+        for index, row in enumerate(main_window.bake_queue)
+        if index not in selected or row.status in (RUNNING, RESOLVING)
+    ]
+    refresh_queue_table(main_window)
+
+
+def retry_failed_rows(main_window: QMainWindow):
+    for row in main_window.bake_queue:
+        if row.status == FAILED:
+            row.status = QUEUED
+            update_queue_row(main_window, row)
+    run_queue(main_window)
+
+
+def show_row_report(main_window: QMainWindow, index: int, _column: int):
+    row = main_window.bake_queue[index]
+    if row.status == DONE:
+        main_window.resultLineEdit.setText(row.bake_cmd_data.lut_filename)
+        main_window.resultLogTextEdit.setText(
+            core.ocio_report(
+                row.bake_cmd_data, row.ociobakelut_cmd, row.log, row.cube_size_note
+            )
+        )
+    elif row.status == FAILED:
+        main_window.resultLineEdit.setText("Error")
+        main_window.resultLogTextEdit.setText(row.log)
+
+
+def get_row_texts(row: QueueRow) -> tuple:
+    return (
+        row.status,
+        row.transform,
+        row.bake_cmd_data.lut_format,
+        "" if row.duration is None else f"{row.duration:.2f}s",
+        row.bake_cmd_data.lut_filename,
+    )
+
+
+def update_queue_row(main_window: QMainWindow, row: QueueRow):
+    """Update the cells of a row, the table keeps its selection"""
+    if row not in main_window.bake_queue:
+        return
+    index = main_window.bake_queue.index(row)
+    for column, text in enumerate(get_row_texts(row)):
+        main_window.queueTableWidget.setItem(index, column, QTableWidgetItem(text))
+
+
+def refresh_queue_table(main_window: QMainWindow):
+    main_window.queueTableWidget.clearSelection()
+    main_window.queueTableWidget.setRowCount(len(main_window.bake_queue))
+    for row in main_window.bake_queue:
+        update_queue_row(main_window, row)
+
+
+def select_rows(main_window: QMainWindow, indices: list):
+    table = main_window.queueTableWidget
+    for index in indices:
+        for column in range(table.columnCount()):
+            table.item(index, column).setSelected(True)
@@ -0,0 +1,599 @@
+"""batch submodule of the core module, bakes prescription manifests
+
+A manifest is a json list of BakeCmdData records. Missing fields fall back to
+MANIFEST_DEFAULTS, and a missing "use_*" flag is enabled when the record sets
+the field it guards. A record listing several "lut_formats" stands for one
+job per format.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields, replace
+from functools import partial
+
+from ocio_lut_prescription import core
+from ocio_lut_prescription.core import (
+    engine,
+    journal,
+    memory,
+    metrics,
+    prefetch,
+    resources,
+    shared_lattice,
+    stream,
+)
+from ocio_lut_prescription.core.preflight import PreflightError, run_preflight
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+LUT_FORMAT_EXTENSIONS = {
+    "cinespace": "csp",
+    "flame": "3dl",
+    "houdini": "lut",
+    "icc": "icc",
+    "iridas_cube": "cube",
+    "iridas_itx": "itx",
+    "lustre": "3dl",
+    "resolve_cube": "cube",
+    "spi1d": "spi1d",
+    "spi3d": "spi3d",
+    "truelight": "cub",
+}
+MANIFEST_DEFAULTS = {
+    "ociobakelut_bin": "ociobakelut",
+    "ocio_config": "",
+    "env_seq": "",
+    "env_shot": "",
+    "input_space": "",
+    "shaper_space": "",
+    "output_space": "",
+    "looks": "",
+    "cube_size": "33",
+    "shaper_size": "33",
+    "lut_format": "cinespace",
+    "lut_ext": "",
+    "icc_white_point": "",
+    "icc_displays": "",
+    "icc_description": "",
+    "icc_copyright": "",
+    "output_dir": "",
+    "override_lut_filename": "",
+    "lut_filename": "",
+}
+# fields passed verbatim on the ociobakelut command line
+STRING_FIELDS = ("cube_size", "shaper_size", "icc_white_point")
+
+# cost model, in evaluated lattice points
+DEFAULT_CUBE_SIZE = 33
+DEFAULT_SHAPER_SIZE = 1024
+PROCESS_COST = 20000  # process startup and config parsing
+FORMAT_COST_FACTORS = {"icc": 4.0}
+# exit code of a bake whose ociobakelut process could not start, as a shell
+# reports a command it cannot run
+SPAWN_ERROR_RETURNCODE = 127
+
+
+@dataclass
+class BakeResult:
+    """Outcome of a single bake of a batch"""
+
+    key: str
+    lut_filename: str
+    returncode: int
+    duration: float
+    log: str
+    resumed: bool = False
+    peak_rss: int = 0
+    cpu_time: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+@dataclass
+class ConfigBakeSummary:
+    """Outcome of the bake of a whole prescription set with a single config"""
+
+    ocio_config: str
+    label: str
+    output_dir: str
+    duration: float
+    results: list
+    error: str = ""
+
+    @property
+    def failed(self) -> int:
+        return sum(not result.ok for result in self.results)
+
+
+def bake_cmd_data_from_dict(record: dict) -> BakeCmdData:
+    """Build a complete BakeCmdData from a, possibly partial, manifest record"""
+    values = {**MANIFEST_DEFAULTS, "ocio_config": os.environ.get("OCIO", "")}
+    values.update(record)
+
+    for field in fields(BakeCmdData):
+        if field.name.startswith("use_") and field.name not in record:
+            values[field.name] = bool(record.get(field.name[len("use_") :]))
+    for field_name in STRING_FIELDS:
+        values[field_name] = str(values[field_name])
+    if not values["lut_ext"]:
+        values["lut_ext"] = LUT_FORMAT_EXTENSIONS[values["lut_format"]]
+    # the jobs of a manifest repeat most values, e.g. their config and output
+    # directory: one string per distinct value rather than one per job
+    for name, value in values.items():
+        if isinstance(value, str):
+            values[name] = sys.intern(value)
+
+    bake_cmd_data = BakeCmdData(
+        **{field.name: values[field.name] for field in fields(BakeCmdData)}
+    )
+    if not bake_cmd_data.lut_filename:
+        bake_cmd_data = replace(
+            bake_cmd_data, lut_filename=core.get_lut_filename(bake_cmd_data)
+        )
+    return bake_cmd_data
+
+
+def expand_lut_formats(record: dict) -> list[dict]:
+    """One record per format of a record listing several "lut_formats", each
+    with the extension and file name of its format"""
+    if "lut_formats" not in record:
+        return [record]
+    record = dict(record)
+    lut_formats = record.pop("lut_formats")
+    return [
+        {**record, "lut_format": lut_format, "lut_ext": ""}
+        for lut_format in lut_formats
+    ]
+
+
+def load_manifest(manifest_path: str) -> list[BakeCmdData]:
+    with memory.stage("load_manifest"), open(
+        manifest_path, encoding="utf-8"
+    ) as manifest_file:
+        # the records are released once converted, the stage keeps the jobs
+        jobs = [
+            bake_cmd_data_from_dict(expanded_record)
+            for record in json.load(manifest_file)
+            for expanded_record in expand_lut_formats(record)
+        ]
+    return jobs
+
+
+def write_manifest(manifest_path: str, jobs: list[BakeCmdData]):
+    with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+        json.dump([asdict(job) for job in jobs], manifest_file, indent=2)
+
+
+def get_job_key(bake_cmd_data: BakeCmdData) -> str:
+    """Stable identifier of a job, derived from all its fields"""
+    payload = json.dumps(asdict(bake_cmd_data), sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_bake_cost(bake_cmd_data: BakeCmdData) -> float:
+    """Relative cost of a bake, dominated by the size of the 3D lattice"""
+    cube_size = (
+        int(bake_cmd_data.cube_size)
+        if bake_cmd_data.use_cube_size and bake_cmd_data.cube_size.isdigit()
+        else DEFAULT_CUBE_SIZE
+    )
+    if bake_cmd_data.use_shaper_size and bake_cmd_data.shaper_size.isdigit():
+        shaper_size = int(bake_cmd_data.shaper_size)
+    else:
+        shaper_size = DEFAULT_SHAPER_SIZE if bake_cmd_data.use_shaper_space else 0
+
+    format_factor = FORMAT_COST_FACTORS.get(bake_cmd_data.lut_format, 1.0)
+    return PROCESS_COST + cube_size**3 * format_factor + shaper_size
+
+
+def get_bake_env(bake_cmd_data: BakeCmdData) -> dict:
+    """Process environment of a bake, with the job SEQ/SHOT context"""
+    env = dict(os.environ)
+    if bake_cmd_data.env_seq:
+        env["SEQ"] = bake_cmd_data.env_seq
+    if bake_cmd_data.env_shot:
+        env["SHOT"] = bake_cmd_data.env_shot
+    return env
+
+
+def bake(
+    bake_cmd_data: BakeCmdData,
+    limiter: resources.AdaptiveLimiter | None = None,
+    on_line: Callable[[str, str], None] | None = None,
+    cube_size_note: str = "",
+) -> BakeResult:
+    """Run ociobakelut for a single job, once the limiter admits it. Its output
+    lines are streamed to on_line, and its memory and cpu usage are sampled
+    while it runs"""
+    token = limiter.acquire(estimate_bake_cost(bake_cmd_data)) if limiter else None
+    ociobakelut_cmd = core.get_ociobakelut_cmd(bake_cmd_data)
+    sampler = resources.ProcessSampler(limiter, token)
+    start = time.perf_counter()
+    try:
+        returncode, log_tail = stream.run_streamed(
+            ociobakelut_cmd,
+            env=get_bake_env(bake_cmd_data),
+            on_line=on_line,
+            on_poll=sampler,
+        )
+    except OSError as err:
+        # e.g. ociobakelut missing from the PATH, the job fails, not the batch
+        returncode = SPAWN_ERROR_RETURNCODE
+        log_tail = [f"Cannot run {ociobakelut_cmd[0]}: {err}"]
+    finally:
+        duration = time.perf_counter() - start
+        if limiter:
+            limiter.release(token, sampler.peak_rss, sampler.cpu_time / duration)
+
+    log = (
+        "\n".join(log_tail)
+        if returncode
+        else core.ocio_report(
+            bake_cmd_data, ociobakelut_cmd, "\n".join(log_tail), cube_size_note
+        )
+    )
+    return BakeResult(
+        get_job_key(bake_cmd_data),
+        bake_cmd_data.lut_filename,
+        returncode,
+        duration,
+        log,
+        peak_rss=sampler.peak_rss,
+        cpu_time=sampler.cpu_time,
+    )
+
+
+def write_report(report_path: str, results: list[BakeResult]):
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump([asdict(result) for result in results], report_file, indent=2)
+
+
+def read_report(report_path: str) -> list[BakeResult]:
+    with open(report_path, encoding="utf-8") as report_file:
+        return [BakeResult(**record) for record in json.load(report_file)]
+
+
+def bake_and_record(
+    bake_cmd_data: BakeCmdData,
+    limiter: resources.AdaptiveLimiter,
+    bake_journal: journal.Journal | None,
+    on_line: Callable[[str, str], None] | None = None,
+    cube_size_notes: dict | None = None,
+) -> BakeResult:
+    result = bake(
+        bake_cmd_data,
+        limiter,
+        partial(on_line, bake_cmd_data.lut_filename) if on_line else None,
+        (cube_size_notes or {}).get(get_job_key(bake_cmd_data), ""),
+    )
+    if bake_journal:
+        bake_journal.record(result.key, result.lut_filename, result.ok, result.duration)
+    return result
+
+
+def bake_in_process(
+    jobs: list[BakeCmdData],
+    limiter: resources.AdaptiveLimiter,
+    bake_journal: journal.Journal | None,
+    resample_tolerance: float | None = None,
+    share_input: bool = False,
+    cube_size_notes: dict | None = None,
+    shaper_cache: engine.ShaperCache | None = None,
+    lattice_pool: shared_lattice.LatticePool | None = None,
+) -> list[BakeResult]:
+    """Bake jobs sharing an input without ociobakelut, each lattice is
+    evaluated, or resampled, once and written to every job LUT file, each
+    shaper is taken from shaper_cache. Large lattices are evaluated by the
+    processes of lattice_pool"""
+    token = limiter.acquire(max(estimate_bake_cost(job) for job in jobs))
+    start = time.perf_counter()
+    try:
+        notes = engine.bake_input_group(
+            jobs, resample_tolerance, share_input, shaper_cache, lattice_pool
+        )
+        error = ""
+    except Exception as err:  # pylint: disable=broad-except
+        # e.g. OCIO errors, a worker of the lattice pool that died: the jobs
+        # of the group fail, the other groups of the batch are baked
+        notes, error = {}, f"{type(err).__name__}: {err}"
+    finally:
+        duration = time.perf_counter() - start
+        limiter.release(token)
+
+    results = []
+    for job in jobs:
+        log = error or core.ocio_report(
+            job,
+            core.get_ociobakelut_cmd(job),
+            "baked in process, "
+            f"{notes[engine.get_lattice_key(job), engine.get_cube_size(job)]}",
+            (cube_size_notes or {}).get(get_job_key(job), ""),
+        )
+        result = BakeResult(
+            get_job_key(job), job.lut_filename, int(bool(error)), duration, log
+        )
+        if bake_journal:
+            bake_journal.record(
+                result.key, result.lut_filename, result.ok, result.duration
+            )
+        results.append(result)
+    return results
+
+
+def resolve_cube_sizes(
+    jobs: list[BakeCmdData], tolerance: float | None = None
+) -> tuple:
+    """Jobs with their "auto" cube size searched, generated file names follow
+    the size, and the notes of the searches by job key"""
+    resolved_jobs, cube_size_notes = [], {}
+    for job in jobs:
+        resolved_job, note = engine.resolve_cube_size(job, tolerance)
+        if note:
+            if job.lut_filename == core.get_lut_filename(job):
+                resolved_job = replace(
+                    resolved_job, lut_filename=core.get_lut_filename(resolved_job)
+                )
+            cube_size_notes[get_job_key(resolved_job)] = note
+        resolved_jobs.append(resolved_job)
+    return resolved_jobs, cube_size_notes
+
+
+def run_batch(  # pylint: disable=too-many-arguments,too-many-locals
+    jobs: list[BakeCmdData],
+    workers: int | None = None,
+    preflight: bool = True,
+    journal_path: str | None = None,
+    resume: bool = False,
+    on_line: Callable[[str, str, str], None] | None = None,
+    in_process: bool = False,
+    resample_tolerance: float | None = None,
+    on_prefetch: Callable[[prefetch.PrefetchReport], None] | None = None,
+    share_input: bool = False,
+    auto_cube_tolerance: float | None = None,
+    lattice_processes: int | None = None,
+) -> list[BakeResult]:
+    """Bake all the jobs, ociobakelut processes run concurrently. The number of
+    concurrent bakes adapts to the memory and cpu they use, up to workers.
+
+    In process, jobs sharing a transform and a cube size, e.g. the same
+    prescription in several formats, evaluate it once. With a resample
+    tolerance, smaller cube sizes of a transform are resampled from its largest
+    one. With share_input, jobs sharing an input and a cube size evaluate the
+    input to reference half of their transforms once, each output half is then
+    applied to it. Each distinct shaper is evaluated once for the whole batch,
+    the shapers reused are counted in the metrics. Jobs the engine cannot bake
+    still run ociobakelut.
+
+    Each finished bake is recorded in the journal, when resuming, jobs whose
+    journaled output still exists unchanged are not baked again.
+    With on_prefetch, the files of the jobs are read ahead of the preflight and
+    the bakes, and the prefetch report is passed to it. The bakes are counted
+    in the metrics of the process.
+    "auto" cube sizes are searched first, within auto_cube_tolerance.
+    With lattice_processes, large lattices baked in process are evaluated by
+    that many worker processes, in shared memory.
+    Output lines are streamed to on_line(lut_filename, stream_name, line)"""
+    with memory.stage("plan"):
+        jobs, cube_size_notes = resolve_cube_sizes(jobs, auto_cube_tolerance)
+        journaled = (
+            journal.read_journal(journal_path) if journal_path and resume else {}
+        )
+        keys = [get_job_key(job) for job in jobs]
+        pending_jobs = [
+            job
+            for job, key in zip(jobs, keys)
+            if not journal.is_completed(journaled.get(key))
+        ]
+
+    if on_prefetch and pending_jobs:
+        with memory.stage("prefetch"):
+            on_prefetch(prefetch.prefetch_jobs(pending_jobs))
+    if preflight and pending_jobs:
+        with memory.stage("preflight"):
+            run_preflight(pending_jobs)
+
+    for output_dir in {job.output_dir for job in pending_jobs}:
+        os.makedirs(output_dir, exist_ok=True)
+
+    get_group_key = engine.get_input_key if share_input else engine.get_transform_key
+    transform_groups, ociobakelut_jobs = {}, []
+    for job in pending_jobs:
+        if in_process and engine.can_bake_in_process(job):
+            transform_groups.setdefault(get_group_key(job), []).append(job)
+        else:
+            ociobakelut_jobs.append(job)
+
+    limiter = resources.AdaptiveLimiter(workers)
+    bake_journal = journal.Journal(journal_path) if journal_path else None
+    shaper_cache = engine.ShaperCache()
+    with contextlib.ExitStack() as pools:
+        pools.enter_context(memory.stage("bake"))
+        lattice_pool = (
+            pools.enter_context(shared_lattice.LatticePool(lattice_processes))
+            if lattice_processes and transform_groups
+            else None
+        )
+        executor = pools.enter_context(
+            ThreadPoolExecutor(max_workers=limiter.max_workers)
+        )
+        group_futures = [
+            executor.submit(
+                bake_in_process,
+                group,
+                limiter,
+                bake_journal,
+                resample_tolerance,
+                share_input,
+                cube_size_notes,
+                shaper_cache,
+                lattice_pool,
+            )
+            for group in transform_groups.values()
+        ]
+        results = {
+            result.key: result
+            for result in executor.map(
+                partial(
+                    bake_and_record,
+                    limiter=limiter,
+                    bake_journal=bake_journal,
+                    on_line=on_line,
+                    cube_size_notes=cube_size_notes,
+                ),
+                ociobakelut_jobs,
+            )
+        }
+        for future in group_futures:
+            results.update((result.key, result) for result in future.result())
+
+    results = [
+        results.get(key)
+        or BakeResult(
+            key, job.lut_filename, 0, 0.0, "resumed from journal", resumed=True
+        )
+        for job, key in zip(jobs, keys)
+    ]
+    metrics.record_batch(jobs, results)
+    return results
+
+
+def get_config_labels(ocio_config_paths: list) -> list:
+    """Short, unique, directory names of configs, e.g. v001_config for
+    /show/v001/config.ocio compared against /show/v002/config.ocio. Labels
+    still equal, e.g. of /show/v1/config.ocio and /show/v1_config.ocio, get a
+    numeric suffix"""
+    abs_paths = [os.path.abspath(path) for path in ocio_config_paths]
+    common_path = os.path.commonpath(abs_paths)
+    labels = []
+    for path in abs_paths:
+        relative_path = os.path.relpath(path, common_path)
+        if relative_path == os.curdir:
+            # a single config, or the same config given several times
+            relative_path = os.path.basename(path)
+        label = (
+            os.path.splitext(relative_path)[0].replace(os.sep, "_").replace(" ", "_")
+        )
+        unique_label, number = label, 2
+        while unique_label in labels:
+            unique_label = f"{label}_{number}"
+            number += 1
+        labels.append(unique_label)
+    return labels
+
+
+def get_duplicate_lut_names(jobs: list[BakeCmdData]) -> list:
+    """LUT file names shared by jobs baking into different directories, they
+    would overwrite each other once gathered in a single directory"""
+    directories = {}
+    for job in jobs:
+        directories.setdefault(os.path.basename(job.lut_filename), set()).add(
+            os.path.dirname(os.path.abspath(job.lut_filename))
+        )
+    return sorted(name for name, dirs in directories.items() if len(dirs) > 1)
+
+
+def retarget_job(
+    bake_cmd_data: BakeCmdData, ocio_config: str, output_dir: str
+) -> BakeCmdData:
+    """Copy of a job baked with another config, into another directory"""
+    return replace(
+        bake_cmd_data,
+        ocio_config=ocio_config,
+        output_dir=output_dir,
+        lut_filename=os.path.join(
+            output_dir, os.path.basename(bake_cmd_data.lut_filename)
+        ),
+    )
+
+
+def bake_config(  # pylint: disable=too-many-arguments
+    jobs: list[BakeCmdData],
+    ocio_config: str,
+    label: str,
+    output_dir: str,
+    workers: int | None,
+) -> ConfigBakeSummary:
+    """Bake a prescription set with a single config, run in a worker process"""
+    start = time.perf_counter()
+    try:
+        results = run_batch(
+            [retarget_job(job, ocio_config, output_dir) for job in jobs],
+            workers=workers,
+        )
+    except PreflightError as err:
+        return ConfigBakeSummary(
+            ocio_config, label, output_dir, time.perf_counter() - start, [], str(err)
+        )
+    return ConfigBakeSummary(
+        ocio_config, label, output_dir, time.perf_counter() - start, results
+    )
+
+
+def run_multi_config(
+    jobs: list[BakeCmdData],
+    ocio_configs: list,
+    output_root: str,
+    workers: int | None = None,
+) -> list[ConfigBakeSummary]:
+    """Bake the same prescriptions with several configs, each config in its own
+    process, into one output directory per config. A config given several
+    times is baked once. Raise ValueError when LUTs of different directories
+    share a file name"""
+    duplicate_lut_names = get_duplicate_lut_names(jobs)
+    if duplicate_lut_names:
+        raise ValueError(
+            "LUT file names shared by several output directories: "
+            + ", ".join(duplicate_lut_names)
+        )
+    ocio_configs = list(
+        {
+            os.path.abspath(ocio_config): ocio_config for ocio_config in ocio_configs
+        }.values()
+    )
+    labels = get_config_labels(ocio_configs)
+    with ProcessPoolExecutor(max_workers=len(ocio_configs)) as executor:
+        futures = [
+            executor.submit(
+                bake_config,
+                jobs,
+                ocio_config,
+                label,
+                os.path.join(output_root, label),
+                workers,
+            )
+            for ocio_config, label in zip(ocio_configs, labels)
+        ]
+        summaries = [future.result() for future in futures]
+
+    write_multi_config_summary(os.path.join(output_root, "summary.json"), summaries)
+    return summaries
+
+
+def write_multi_config_summary(summary_path: str, summaries: list):
+    os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as summary_file:
+        json.dump(
+            [
+                {
+                    "ocio_config": summary.ocio_config,
+                    "label": summary.label,
+                    "output_dir": summary.output_dir,
+                    "duration": summary.duration,
+                    "jobs": len(summary.results),
+                    "failed": summary.failed,
+                    "error": summary.error,
+                    "results": [asdict(result) for result in summary.results],
+                }
+                for summary in summaries
+            ],
+            summary_file,
+            indent=2,
+        )
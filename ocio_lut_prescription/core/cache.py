@@ -0,0 +1,74 @@
+"""on-disk cache submodule of the core module
+
+Entries are small json documents stored under a namespace directory and keyed
+by a content hash, so a stale entry is never read back for a changed input.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+
+from ocio_lut_prescription.core import metrics
+
+CACHE_DIR_ENV = "OCIO_LUT_PRESCRIPTION_CACHE"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_cache_dir() -> str:
+    """Root directory of the cache, overridable through the environment"""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir:
+        return cache_dir
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(xdg_cache_home, "ocio-lut-prescription")
+
+
+def get_file_hash(file_path: str, *extra: str) -> str:
+    """sha256 of a file content, salted with any extra strings"""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    for value in extra:
+        file_hash.update(b"\0")
+        file_hash.update(value.encode("utf-8"))
+    return file_hash.hexdigest()
+
+
+def get_cache_path(namespace: str, key: str) -> str:
+    return os.path.join(get_cache_dir(), namespace, f"{key}.json")
+
+
+def read_cache(namespace: str, key: str) -> dict | None:
+    """Return the cached entry, or None when missing or unreadable"""
+    try:
+        with open(get_cache_path(namespace, key), encoding="utf-8") as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        metrics.CACHE_MISSES.inc(cache=namespace)
+        return None
+    metrics.CACHE_HITS.inc(cache=namespace)
+    return entry
+
+
+def write_cache(namespace: str, key: str, data: dict):
+    """Atomically write an entry, a failure to write is never fatal"""
+    cache_path = get_cache_path(namespace, key)
+    tmp_path = ""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # unique to each writer, threads of a process may write the same key
+        tmp_fd, tmp_path = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(cache_path)
+        )
+        with open(tmp_fd, "w", encoding="utf-8") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
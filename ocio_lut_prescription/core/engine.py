@@ -0,0 +1,673 @@
+# pylint: disable=c-extension-no-member
+"""engine submodule of the core module, bakes LUTs in process
+
+Jobs sharing a transform and a cube size share a single lattice evaluation,
+which is then written to every requested format. Smaller cube sizes of a
+transform can be resampled from its largest lattice, when the resampling error
+measured against the transform stays within a tolerance.
+Transforms sharing an input can also be split at the reference space, the
+input half of the lattice is then evaluated once for all of them.
+An "auto" cube size is searched for, the smallest size whose interpolation
+stays within a tolerance of the transform.
+Shapers are evaluated once per batch and reused by every LUT indexed through
+them, their lattices are evaluated from the shaper space.
+Large lattices can be evaluated by a pool of processes, in shared memory, see
+shared_lattice.
+"""
+from __future__ import annotations
+
+import contextlib
+import copy
+import itertools
+import threading
+from dataclasses import replace
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+import PyOpenColorIO as OCIO
+
+from ocio_lut_prescription.core import lut_formats, metrics, ocio
+from ocio_lut_prescription.core.ui import AUTO_CUBE_SIZE, BakeCmdData
+
+if TYPE_CHECKING:
+    from ocio_lut_prescription.core.shared_lattice import LatticePool
+
+# half a code value of the 12 bit integer formats
+DEFAULT_RESAMPLE_TOLERANCE = 0.5 / lut_formats.OUTPUT_BIT_DEPTH
+# lattice nodes per axis evaluated to measure the resampling error, larger
+# lattices are measured on a subset of their nodes
+ERROR_SAMPLES_PER_AXIS = 9
+# largest difference allowed between a lattice split at the reference space
+# and the transform
+SPLIT_TOLERANCE = DEFAULT_RESAMPLE_TOLERANCE
+# largest interpolation error of an "auto" cube size
+DEFAULT_AUTO_CUBE_TOLERANCE = DEFAULT_RESAMPLE_TOLERANCE
+# a lattice needs two nodes per axis, ociobakelut reports smaller sizes
+MIN_LATTICE_SIZE = 2
+AUTO_CUBE_SIZES = tuple(range(MIN_LATTICE_SIZE, 66))
+# random points the interpolation error of a cube size is measured on
+AUTO_CUBE_SAMPLES = 1 << 16
+# colorspaces without transforms, added to split transforms at the reference
+REFERENCE_SPACE_NAMES = {
+    OCIO.REFERENCE_SPACE_SCENE: "ocio_lut_prescription_scene_reference",
+    OCIO.REFERENCE_SPACE_DISPLAY: "ocio_lut_prescription_display_reference",
+}
+
+
+def can_bake_in_process(bake_cmd_data: BakeCmdData) -> bool:
+    """ICC profiles, shapers of formats without a shaper writer, and the 1D
+    LUTs ociobakelut writes for transforms without channel crosstalk, are left
+    to ociobakelut, as are transforms that cannot be evaluated"""
+    writers = (
+        lut_formats.SHAPER_WRITERS
+        if bake_cmd_data.use_shaper_space
+        else lut_formats.WRITERS
+    )
+    if bake_cmd_data.lut_format not in writers or get_size_errors(bake_cmd_data):
+        return False
+    if bake_cmd_data.lut_format not in lut_formats.CROSSTALK_ONLY_FORMATS:
+        return True
+    try:
+        processor = ocio.get_cached_processor(*get_transform_key(bake_cmd_data))
+    except (OCIO.Exception, OCIO.ExceptionMissingFile):
+        return False
+    return processor.getOptimizedCPUProcessor(
+        OCIO.OPTIMIZATION_LOSSLESS
+    ).hasChannelCrosstalk()
+
+
+def get_size_errors(bake_cmd_data: BakeCmdData) -> list:
+    """Cube and shaper sizes set, once "auto" is resolved, that no lattice can
+    be evaluated at"""
+    sizes = []
+    if bake_cmd_data.use_cube_size:
+        sizes.append(("cube size", bake_cmd_data.cube_size))
+    if bake_cmd_data.use_shaper_space and bake_cmd_data.use_shaper_size:
+        sizes.append(("shaper size", bake_cmd_data.shaper_size))
+    return [
+        f"invalid {name}: {size}, at least {MIN_LATTICE_SIZE} expected"
+        for name, size in sizes
+        if size and not (size.isdigit() and int(size) >= MIN_LATTICE_SIZE)
+    ]
+
+
+def get_cube_size(bake_cmd_data: BakeCmdData) -> int:
+    if bake_cmd_data.use_cube_size and bake_cmd_data.cube_size:
+        return int(bake_cmd_data.cube_size)
+    return lut_formats.DEFAULT_CUBE_SIZES[bake_cmd_data.lut_format]
+
+
+def get_transform_key(bake_cmd_data: BakeCmdData) -> tuple:
+    """Jobs with the same key bake the same transform"""
+    return (
+        bake_cmd_data.ocio_config,
+        bake_cmd_data.input_space,
+        bake_cmd_data.output_space if bake_cmd_data.use_output_space else "",
+        bake_cmd_data.looks if bake_cmd_data.use_looks else "",
+        bake_cmd_data.env_seq,
+        bake_cmd_data.env_shot,
+    )
+
+
+def get_shaper_size(bake_cmd_data: BakeCmdData) -> int:
+    if bake_cmd_data.use_shaper_size and bake_cmd_data.shaper_size:
+        return int(bake_cmd_data.shaper_size)
+    return lut_formats.DEFAULT_SHAPER_SIZES[bake_cmd_data.lut_format]
+
+
+def get_lattice_key(bake_cmd_data: BakeCmdData) -> tuple:
+    """Jobs with the same key bake the same lattices, a shaper space changes
+    the lattice of a transform"""
+    return get_transform_key(bake_cmd_data) + (
+        bake_cmd_data.shaper_space if bake_cmd_data.use_shaper_space else "",
+    )
+
+
+def get_shaper_key(bake_cmd_data: BakeCmdData) -> tuple:
+    """Jobs with the same key use the same shaper"""
+    return (
+        bake_cmd_data.ocio_config,
+        bake_cmd_data.input_space,
+        bake_cmd_data.shaper_space,
+        get_shaper_size(bake_cmd_data),
+        bake_cmd_data.env_seq,
+        bake_cmd_data.env_shot,
+    )
+
+
+def get_input_key(bake_cmd_data: BakeCmdData) -> tuple:
+    """Jobs with the same key start from the same input transform"""
+    return (
+        bake_cmd_data.ocio_config,
+        bake_cmd_data.input_space,
+        bake_cmd_data.shaper_space if bake_cmd_data.use_shaper_space else "",
+        bake_cmd_data.env_seq,
+        bake_cmd_data.env_shot,
+    )
+
+
+def load_split_config(ocio_config_path: str) -> OCIO.Config:
+    """Copy of a config with a colorspace for each reference space, copied
+    again once the config file changed"""
+    return load_hashed_split_config(
+        ocio_config_path, ocio.get_config_hash(ocio_config_path)
+    )
+
+
+@lru_cache(maxsize=16)
+def load_hashed_split_config(ocio_config_path: str, config_hash: str) -> OCIO.Config:
+    """Split config of a config content, the hash is the cache key"""
+    ocio_config_obj = copy.deepcopy(
+        ocio.load_hashed_config(ocio_config_path, config_hash)
+    )
+    for reference_space_type, name in REFERENCE_SPACE_NAMES.items():
+        ocio_config_obj.addColorSpace(
+            OCIO.ColorSpace(referenceSpace=reference_space_type, name=name)
+        )
+    return ocio_config_obj
+
+
+def get_identity_lattice(cube_size: int) -> np.ndarray:
+    """Identity lattice, red varying fastest, computed as OCIO does so the
+    baked values match ociobakelut to the bit"""
+    ramp = np.arange(cube_size, dtype=np.float32) * np.float32(1.0 / (cube_size - 1))
+    blue, green, red = np.meshgrid(ramp, ramp, ramp, indexing="ij")
+    return np.stack([red, green, blue], axis=-1).reshape(-1, 3)
+
+
+class ChainedCPUProcessor:
+    """CPU processors applied one after the other, as ociobakelut applies them,
+    a single processor of the whole transform could round differently"""
+
+    def __init__(self, *cpu_processors: OCIO.CPUProcessor):
+        self.cpu_processors = cpu_processors
+
+    def applyRGB(self, pixel_data: np.ndarray):  # pylint: disable=invalid-name
+        for cpu_processor in self.cpu_processors:
+            cpu_processor.applyRGB(pixel_data)
+
+
+def get_shaper_cpu_processors(bake_cmd_data: BakeCmdData) -> tuple:
+    """Processors of the input to shaper and shaper to input transforms,
+    refusing the shaper spaces ociobakelut refuses"""
+    processors = [
+        ocio.get_cached_processor(
+            bake_cmd_data.ocio_config,
+            source_space,
+            target_space,
+            "",
+            bake_cmd_data.env_seq,
+            bake_cmd_data.env_shot,
+        )
+        for source_space, target_space in (
+            (bake_cmd_data.input_space, bake_cmd_data.shaper_space),
+            (bake_cmd_data.shaper_space, bake_cmd_data.input_space),
+        )
+    ]
+    cpu_processors = tuple(
+        processor.getOptimizedCPUProcessor(OCIO.OPTIMIZATION_LOSSLESS)
+        for processor in processors
+    )
+    # optimized, e.g. the matrices between ACEScg and ACEScct cancel out
+    if cpu_processors[0].hasChannelCrosstalk():
+        raise OCIO.Exception(
+            f"The specified shaper space, '{bake_cmd_data.shaper_space}' has "
+            "channel crosstalk, which is not appropriate for shapers. Please "
+            "select an alternate shaper space or omit this option."
+        )
+    return cpu_processors
+
+
+def get_cpu_processor(bake_cmd_data: BakeCmdData) -> OCIO.CPUProcessor:
+    """Processor of the lattice of a job, from the shaper space when it has
+    one"""
+    processor = ocio.get_cached_processor(*get_transform_key(bake_cmd_data))
+    cpu_processor = processor.getOptimizedCPUProcessor(OCIO.OPTIMIZATION_LOSSLESS)
+    if not bake_cmd_data.use_shaper_space:
+        return cpu_processor
+    _, shaper_to_input = get_shaper_cpu_processors(bake_cmd_data)
+    return ChainedCPUProcessor(shaper_to_input, cpu_processor)
+
+
+def evaluate_lattice(cpu_processor: OCIO.CPUProcessor, cube_size: int) -> np.ndarray:
+    lattice = get_identity_lattice(cube_size)
+    cpu_processor.applyRGB(lattice)
+    return lattice
+
+
+def evaluate_shaper(bake_cmd_data: BakeCmdData) -> lut_formats.Shaper:
+    """Shaper of a job, its input range is the input of the [0, 1] shaper
+    range, values are computed as OCIO does to match ociobakelut to the bit"""
+    input_to_shaper, shaper_to_input = get_shaper_cpu_processors(bake_cmd_data)
+    shaper_size = get_shaper_size(bake_cmd_data)
+    bounds = np.float32([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]])
+    shaper_to_input.applyRGB(bounds)
+    start, end = np.float32(bounds[0].min()), np.float32(bounds[1].max())
+
+    steps = (np.arange(shaper_size, dtype=np.float64) / (shaper_size - 1)).astype(
+        np.float32
+    )
+    values = np.repeat(((end - start) * steps + start)[:, None], 3, axis=1)
+    input_to_shaper.applyRGB(values)
+
+    ramp = np.arange(shaper_size, dtype=np.float32) * np.float32(
+        1.0 / (shaper_size - 1)
+    )
+    ramp_inputs = np.repeat(ramp[:, None], 3, axis=1)
+    shaper_to_input.applyRGB(ramp_inputs)
+    return lut_formats.Shaper((start, end), values, ramp, ramp_inputs)
+
+
+class ShaperCache:
+    """Shapers of a batch by get_shaper_key, each evaluated once and reused by
+    every LUT that needs it. Shapers are small, they are evaluated under the
+    lock so that concurrent groups never evaluate one twice"""
+
+    def __init__(self):
+        self._shapers = {}
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.reuses = 0
+
+    def get(self, bake_cmd_data: BakeCmdData) -> lut_formats.Shaper:
+        shaper_key = get_shaper_key(bake_cmd_data)
+        with self._lock:
+            shaper = self._shapers.get(shaper_key)
+            if shaper is not None:
+                self.reuses += 1
+                metrics.CACHE_HITS.inc(cache="shaper")
+                return shaper
+            shaper = evaluate_shaper(bake_cmd_data)
+            self._shapers[shaper_key] = shaper
+            self.evaluations += 1
+            metrics.CACHE_MISSES.inc(cache="shaper")
+        return shaper
+
+
+def get_reference_space_name(bake_cmd_data: BakeCmdData) -> str:
+    """Reference colorspace the transform of a job goes through, empty when its
+    spaces are not colorspaces or are data"""
+    ocio_config_obj = ocio.load_config(bake_cmd_data.ocio_config)
+    input_colorspace = ocio_config_obj.getColorSpace(bake_cmd_data.input_space)
+    output_colorspace = ocio_config_obj.getColorSpace(
+        bake_cmd_data.output_space
+        if bake_cmd_data.use_output_space
+        else bake_cmd_data.input_space
+    )
+    if input_colorspace is None or output_colorspace is None:
+        return ""
+    if input_colorspace.isData() or output_colorspace.isData():
+        return ""
+    # display referred inputs reach display referred outputs without a view
+    # transform, splitting at the scene reference would add one
+    return REFERENCE_SPACE_NAMES[input_colorspace.getReferenceSpaceType()]
+
+
+def get_split_cpu_processors(bake_cmd_data: BakeCmdData) -> tuple:
+    """Processors of the input to reference and of the reference to output
+    halves of a job transform, looks included in the latter"""
+    ocio_config_obj = load_split_config(bake_cmd_data.ocio_config)
+    reference_space = get_reference_space_name(bake_cmd_data)
+    input_processor = ocio.get_processor(
+        ocio_config_obj,
+        bake_cmd_data.input_space,
+        reference_space,
+        "",
+        bake_cmd_data.env_seq,
+        bake_cmd_data.env_shot,
+    )
+    output_processor = ocio.get_processor(
+        ocio_config_obj,
+        reference_space,
+        bake_cmd_data.output_space
+        if bake_cmd_data.use_output_space
+        else bake_cmd_data.input_space,
+        bake_cmd_data.looks if bake_cmd_data.use_looks else "",
+        bake_cmd_data.env_seq,
+        bake_cmd_data.env_shot,
+    )
+    return tuple(
+        processor.getOptimizedCPUProcessor(OCIO.OPTIMIZATION_LOSSLESS)
+        for processor in (input_processor, output_processor)
+    )
+
+
+def evaluate_split_lattice(
+    input_processor: OCIO.CPUProcessor,
+    output_processor: OCIO.CPUProcessor,
+    input_lattices: dict,
+    cube_size: int,
+) -> np.ndarray:
+    """Apply the output half of a transform to the input half lattice, which
+    is evaluated once per cube size and shared through input_lattices"""
+    if cube_size not in input_lattices:
+        input_lattices[cube_size] = evaluate_lattice(input_processor, cube_size)
+    lattice = input_lattices[cube_size].copy()
+    output_processor.applyRGB(lattice)
+    return lattice
+
+
+def resample_lattice(
+    lattice: np.ndarray, cube_size: int, new_cube_size: int
+) -> np.ndarray:
+    """Trilinear resampling of a lattice to another cube size, computed one
+    axis at a time as trilinear interpolation is separable. Nodes shared by
+    both sizes, e.g. from 65 to 33 or 17, keep their values"""
+    positions = np.arange(new_cube_size) * ((cube_size - 1) / (new_cube_size - 1))
+    lower = np.minimum(np.floor(positions).astype(int), cube_size - 2)
+    weights = positions - lower
+
+    resampled = lattice.reshape(cube_size, cube_size, cube_size, 3).astype(np.float64)
+    for axis in range(3):
+        shape = [1, 1, 1, 1]
+        shape[axis] = new_cube_size
+        axis_weights = weights.reshape(shape)
+        resampled = (
+            np.take(resampled, lower, axis=axis) * (1.0 - axis_weights)
+            + np.take(resampled, lower + 1, axis=axis) * axis_weights
+        )
+    return resampled.astype(np.float32).reshape(-1, 3)
+
+
+def get_error_sample_indices(cube_size: int) -> np.ndarray:
+    """Flat indices of a regular subset of the lattice nodes, corners included"""
+    axis = np.unique(
+        np.linspace(0, cube_size - 1, min(cube_size, ERROR_SAMPLES_PER_AXIS))
+        .round()
+        .astype(int)
+    )
+    blue, green, red = np.meshgrid(axis, axis, axis, indexing="ij")
+    return ((blue * cube_size + green) * cube_size + red).reshape(-1)
+
+
+def get_error_label(cube_size: int) -> str:
+    """Name of the error measure_lattice_error returns for a cube size, sampled
+    when its nodes are not all evaluated"""
+    if cube_size <= ERROR_SAMPLES_PER_AXIS:
+        return "max error"
+    return f"max error on {ERROR_SAMPLES_PER_AXIS}^3 sampled nodes"
+
+
+def measure_lattice_error(
+    cpu_processor: OCIO.CPUProcessor, lattice: np.ndarray, cube_size: int
+) -> float:
+    """Largest difference between a resampled, or split, lattice and the
+    transform, evaluated on at most ERROR_SAMPLES_PER_AXIS nodes per axis, see
+    get_error_label, infinite when either is not finite"""
+    indices = get_error_sample_indices(cube_size)
+    samples = np.ascontiguousarray(get_identity_lattice(cube_size)[indices])
+    cpu_processor.applyRGB(samples)
+    error = float(np.max(np.abs(lattice[indices] - samples)))
+    return error if np.isfinite(error) else np.inf
+
+
+def interpolate_lattice(
+    lattice: np.ndarray, cube_size: int, points: np.ndarray
+) -> np.ndarray:
+    """Trilinear interpolation of a lattice at points of the unit cube"""
+    grid = lattice.reshape(cube_size, cube_size, cube_size, 3)
+    scaled = np.clip(points, 0.0, 1.0).astype(np.float64) * (cube_size - 1)
+    lower = np.minimum(np.floor(scaled).astype(int), cube_size - 2)
+    weights = scaled - lower
+
+    values = np.zeros(points.shape, dtype=np.float64)
+    # corners as red, green, blue offsets, the grid is indexed blue first
+    for corner in itertools.product((0, 1), repeat=3):
+        corner_weights = np.prod(
+            [
+                weights[:, axis] if offset else 1.0 - weights[:, axis]
+                for axis, offset in enumerate(corner)
+            ],
+            axis=0,
+        )
+        values += (
+            corner_weights[:, None]
+            * grid[
+                lower[:, 2] + corner[2],
+                lower[:, 1] + corner[1],
+                lower[:, 0] + corner[0],
+            ]
+        )
+    return values
+
+
+def measure_interpolation_error(
+    cpu_processor: OCIO.CPUProcessor,
+    cube_size: int,
+    points: np.ndarray,
+    expected: np.ndarray,
+) -> float:
+    """Largest difference between the transform of points and their
+    interpolation in its lattice, infinite when either is not finite"""
+    lattice = evaluate_lattice(cpu_processor, cube_size)
+    error = float(
+        np.max(np.abs(interpolate_lattice(lattice, cube_size, points) - expected))
+    )
+    return error if np.isfinite(error) else np.inf
+
+
+def search_cube_size(transform_key: tuple, tolerance: float) -> tuple:
+    """One of AUTO_CUBE_SIZES whose interpolation error stays within the
+    tolerance, and its error. Sizes are bisected, the size returned is the
+    smallest one only when the error decreases with the size, a transform may
+    have a smaller size within the tolerance. When none is within it, the
+    largest size is returned. Searched again once the config file changed"""
+    return _search_cube_size(
+        transform_key, ocio.get_config_hash(transform_key[0]), tolerance
+    )
+
+
+@lru_cache(maxsize=64)
+def _search_cube_size(
+    transform_key: tuple,
+    config_hash: str,  # pylint: disable=unused-argument
+    tolerance: float,
+) -> tuple:
+    """Size searched for a config content, the hash is the cache key"""
+    cpu_processor = ocio.get_cached_processor(*transform_key).getOptimizedCPUProcessor(
+        OCIO.OPTIMIZATION_LOSSLESS
+    )
+    # seeded, a job always gets the same size
+    points = np.random.default_rng(0).random((AUTO_CUBE_SAMPLES, 3), dtype=np.float32)
+    expected = points.copy()
+    cpu_processor.applyRGB(expected)
+
+    errors = dict.fromkeys(range(len(AUTO_CUBE_SIZES)))
+
+    def get_error(index: int) -> float:
+        if errors[index] is None:
+            errors[index] = measure_interpolation_error(
+                cpu_processor, AUTO_CUBE_SIZES[index], points, expected
+            )
+        return errors[index]
+
+    low, high = 0, len(AUTO_CUBE_SIZES) - 1
+    if get_error(high) > tolerance:
+        return AUTO_CUBE_SIZES[high], get_error(high)
+    while low < high:
+        middle = (low + high) // 2
+        if get_error(middle) <= tolerance:
+            high = middle
+        else:
+            low = middle + 1
+    return AUTO_CUBE_SIZES[low], get_error(low)
+
+
+def is_auto_cube_size(bake_cmd_data: BakeCmdData) -> bool:
+    return bake_cmd_data.use_cube_size and bake_cmd_data.cube_size == AUTO_CUBE_SIZE
+
+
+def resolve_cube_size(
+    bake_cmd_data: BakeCmdData, tolerance: float | None = None
+) -> tuple:
+    """Job with its "auto" cube size replaced by the searched size, and a note
+    of the search for the report. Shaper jobs, and jobs whose transform cannot
+    be evaluated, fall back to the default size of ociobakelut"""
+    if not is_auto_cube_size(bake_cmd_data):
+        return bake_cmd_data, ""
+    tolerance = DEFAULT_AUTO_CUBE_TOLERANCE if tolerance is None else tolerance
+    if bake_cmd_data.use_shaper_space:
+        return (
+            replace(bake_cmd_data, use_cube_size=False),
+            "auto, not searched with a shaper space, default size",
+        )
+    try:
+        cube_size, error = search_cube_size(get_transform_key(bake_cmd_data), tolerance)
+    except (OCIO.Exception, OCIO.ExceptionMissingFile) as err:
+        return (
+            replace(bake_cmd_data, use_cube_size=False),
+            f"auto, search failed, default size: {err}",
+        )
+
+    verdict = "within" if error <= tolerance else "exceeds"
+    return (
+        replace(bake_cmd_data, cube_size=str(cube_size)),
+        f"auto, max interpolation error {error:.3g} {verdict} {tolerance:.3g}",
+    )
+
+
+def evaluate_checked_split_lattice(
+    cpu_processor: OCIO.CPUProcessor,
+    split_processors: tuple,
+    input_lattices: dict,
+    cube_size: int,
+) -> tuple:
+    """Lattice evaluated from the shared input lattice, None when it differs
+    from the transform by more than SPLIT_TOLERANCE, e.g. where a power
+    function amplifies the rounding of the reference values, and a note"""
+    lattice = evaluate_split_lattice(*split_processors, input_lattices, cube_size)
+    error = measure_lattice_error(cpu_processor, lattice, cube_size)
+    error_label = get_error_label(cube_size)
+    if error <= SPLIT_TOLERANCE:
+        return lattice, f", from the shared input lattice, {error_label} {error:.3g}"
+    return None, (
+        f", evaluated whole, split at the reference {error_label} {error:.3g} "
+        f"exceeds {SPLIT_TOLERANCE:.3g}"
+    )
+
+
+def bake_transform_group(  # pylint: disable=too-many-locals
+    jobs: list[BakeCmdData],
+    resample_tolerance: float | None = None,
+    input_lattices: dict | None = None,
+    shaper_cache: ShaperCache | None = None,
+    lattice_pool: LatticePool | None = None,
+) -> dict:
+    """Write the LUT files of jobs sharing a lattice, each cube size is
+    evaluated once. With a tolerance, smaller sizes are resampled from the
+    largest lattice, unless their resampling error exceeds it. With
+    input_lattices, lattices are evaluated from the shared input half.
+    Shapers are taken from shaper_cache, a cache of the group otherwise.
+    With lattice_pool, large lattices are evaluated whole by its processes.
+    Return a description of how each cube size was baked"""
+    shaper_cache = ShaperCache() if shaper_cache is None else shaper_cache
+    cpu_processor = get_cpu_processor(jobs[0])
+    split_processors = (
+        get_split_cpu_processors(jobs[0]) if input_lattices is not None else ()
+    )
+    size_jobs = {}
+    for job in jobs:
+        size_jobs.setdefault(get_cube_size(job), []).append(job)
+
+    notes = {}
+    largest_size, largest_lattice = 0, None
+    # shared lattices are closed with the group, the largest one may be resampled
+    with contextlib.ExitStack() as shared_lattices:
+        for cube_size in sorted(size_jobs, reverse=True):
+            lattice = None
+            note = f"lattice shared by {len(size_jobs[cube_size])} LUTs"
+            if resample_tolerance is not None and largest_lattice is not None:
+                resampled = resample_lattice(largest_lattice, largest_size, cube_size)
+                error = measure_lattice_error(cpu_processor, resampled, cube_size)
+                error_label = get_error_label(cube_size)
+                if error <= resample_tolerance:
+                    lattice = resampled
+                    note += (
+                        f", resampled from {largest_size}, {error_label} {error:.3g}"
+                    )
+                else:
+                    note += (
+                        f", evaluated, resampling from {largest_size} {error_label} "
+                        f"{error:.3g} exceeds {resample_tolerance:.3g}"
+                    )
+            if lattice is None and split_processors:
+                lattice, split_note = evaluate_checked_split_lattice(
+                    cpu_processor, split_processors, input_lattices, cube_size
+                )
+                note += split_note
+            if (
+                lattice is None
+                and lattice_pool is not None
+                and lattice_pool.can_split(cube_size)
+            ):
+                lattice = shared_lattices.enter_context(
+                    lattice_pool.evaluate(jobs[0], cube_size)
+                ).array
+                note += (
+                    f", evaluated by {len(lattice_pool.get_slab_bounds(cube_size))} "
+                    "processes in shared memory"
+                )
+            if lattice is None:
+                lattice = evaluate_lattice(cpu_processor, cube_size)
+            if largest_lattice is None:
+                largest_size, largest_lattice = cube_size, lattice
+
+            for job in size_jobs[cube_size]:
+                lut_formats.write_lut(
+                    job.lut_filename,
+                    job.lut_format,
+                    lattice,
+                    cube_size,
+                    shaper_cache.get(job) if job.use_shaper_space else None,
+                )
+            if jobs[0].use_shaper_space:
+                note += ", shapers evaluated once per batch"
+            notes[cube_size] = note
+        # no view of the shared lattices is left, their blocks are unmapped
+        del lattice, largest_lattice
+    return notes
+
+
+def bake_input_group(
+    jobs: list[BakeCmdData],
+    resample_tolerance: float | None = None,
+    share_input: bool = False,
+    shaper_cache: ShaperCache | None = None,
+    lattice_pool: LatticePool | None = None,
+) -> dict:
+    """Write the LUT files of jobs sharing an input, one lattice at a time.
+    With share_input, transforms that can be split at the reference space
+    share the evaluation of the input half of their lattices, lattices of a
+    shaper space are evaluated whole. With lattice_pool, lattices evaluated
+    whole are evaluated by its processes when large.
+    Return a description of how each lattice and cube size was baked"""
+    lattice_jobs = {}
+    for job in jobs:
+        lattice_jobs.setdefault(get_lattice_key(job), []).append(job)
+    split_keys = {
+        lattice_key
+        for lattice_key, group in lattice_jobs.items()
+        if share_input
+        and not group[0].use_shaper_space
+        and get_reference_space_name(group[0])
+    }
+    input_lattices = {}
+    shaper_cache = ShaperCache() if shaper_cache is None else shaper_cache
+
+    notes = {}
+    for lattice_key, group in lattice_jobs.items():
+        group_notes = bake_transform_group(
+            group,
+            resample_tolerance,
+            # a single transform evaluated whole is exact, and as fast
+            input_lattices
+            if len(split_keys) > 1 and lattice_key in split_keys
+            else None,
+            shaper_cache,
+            lattice_pool,
+        )
+        notes.update(
+            ((lattice_key, cube_size), note) for cube_size, note in group_notes.items()
+        )
+    return notes
@@ -0,0 +1,83 @@
+"""journal submodule of the core module, lets an interrupted batch resume
+
+The journal is an append-only json lines file, one record per finished bake,
+flushed to disk before the next record. A truncated last line, left by a
+crash, is ignored when reading it back, and ended before the next record is
+appended.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+from ocio_lut_prescription.core import cache
+
+
+class Journal:
+    """Append-only record of the bakes of a batch"""
+
+    def __init__(self, journal_path: str):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+
+    def record(self, key: str, lut_filename: str, ok: bool, duration: float):
+        checksum = get_checksum(lut_filename) if ok else ""
+        line = json.dumps(
+            {
+                "key": key,
+                "lut_filename": lut_filename,
+                "checksum": checksum,
+                "status": "ok" if ok else "error",
+                "duration": duration,
+                "time": time.time(),
+            }
+        )
+        with self._lock, open(self.journal_path, "a+b") as journal:
+            # a line truncated by a crash is ended first, the record appended
+            # to it would be lost with it
+            if journal.seek(0, os.SEEK_END) and not is_line_ended(journal):
+                line = "\n" + line
+            journal.write((line + "\n").encode("utf-8"))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+
+def is_line_ended(journal) -> bool:
+    """Whether a non-empty journal, opened in binary, ends with a newline"""
+    journal.seek(-1, os.SEEK_END)
+    return journal.read(1) == b"\n"
+
+
+def get_checksum(file_path: str) -> str:
+    try:
+        return cache.get_file_hash(file_path)
+    except OSError:
+        return ""
+
+
+def read_journal(journal_path: str) -> dict:
+    """Last record of each job key, an empty dict without journal"""
+    records = {}
+    try:
+        with open(journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["key"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def is_completed(record: dict | None) -> bool:
+    """A job is completed if its output still exists, unchanged"""
+    return bool(
+        record
+        and record["status"] == "ok"
+        and os.path.isfile(record["lut_filename"])
+        and get_checksum(record["lut_filename"]) == record["checksum"]
+    )
@@ -0,0 +1,214 @@
+"""lut_diff submodule of the core module, numeric diff of two LUT directories
+
+LUTs are paired by file name, the name core.get_lut_filename gives to a
+prescription, e.g. the outputs of a manifest baked before and after a config
+update. Pairs are compared in a process pool: identical files are skipped, the
+others are parsed, all their values at once with numpy, and the absolute
+differences of their values summarized by their max, mean and 99th percentile.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from ocio_lut_prescription.core import batch, lut_formats, resources
+
+UNCHANGED = "unchanged"
+CHANGED = "changed"
+ADDED = "added"
+REMOVED = "removed"
+# a LUT given by name, e.g. of a manifest, in neither directory
+MISSING = "missing"
+RESIZED = "resized"
+UNREADABLE = "unreadable"
+# the statuses of pairs without deltas, always significant
+STRUCTURAL_STATUSES = (ADDED, REMOVED, MISSING, RESIZED, UNREADABLE)
+# half a code value of the 12 bit integer formats
+DEFAULT_THRESHOLD = 0.5 / lut_formats.OUTPUT_BIT_DEPTH
+PERCENTILE = 99
+NUMBER = rb"[-+]?(?:(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?|nan|inf)"
+# text lines not starting with a number, e.g. LUT_3D_SIZE, 3D or braces, hold
+# no values
+HEADER_LINE = re.compile(
+    rb"^(?![ \t]*" + NUMBER + rb"(?:[ \t\r]|$))[^\n]*", re.MULTILINE
+)
+SPI3D_HEADER_VALUES = 5
+BINARY_EXTENSIONS = ("icc",)
+
+
+@dataclass
+class LutDiff:
+    """Differences of the values of the two LUTs sharing a file name"""
+
+    name: str
+    status: str
+    max_delta: float = 0.0
+    mean_delta: float = 0.0
+    p99_delta: float = 0.0
+    values: int = 0
+    error: str = ""
+
+    def is_significant(self, threshold: float) -> bool:
+        return self.status in STRUCTURAL_STATUSES or self.max_delta > threshold
+
+
+def parse_values(data: bytes) -> np.ndarray:
+    """Values of a text LUT, header lines excluded, in file order"""
+    return np.array(HEADER_LINE.sub(b"", data).split(), dtype=np.float64)
+
+
+def parse_spi3d(data: bytes) -> np.ndarray:
+    """Output values of a spi3d LUT, its node indices excluded"""
+    values = parse_values(data)[SPI3D_HEADER_VALUES:]
+    return values.reshape(-1, 6)[:, 3:].reshape(-1)
+
+
+def parse_3dl(data: bytes) -> np.ndarray:
+    """Output values of a 3dl LUT, its input mesh excluded, scaled to [0, 1]"""
+    stripped = HEADER_LINE.sub(b"", data).lstrip()
+    _, _, codes = stripped.partition(b"\n")
+    return parse_values(codes) / lut_formats.OUTPUT_BIT_DEPTH
+
+
+# other text LUTs are compared on all their values, sizes included
+PARSERS = {"spi3d": parse_spi3d, "3dl": parse_3dl}
+
+
+def parse_lut(lut_path: str, data: bytes) -> np.ndarray:
+    extension = os.path.splitext(lut_path)[1][1:].lower()
+    return PARSERS.get(extension, parse_values)(data)
+
+
+def get_deltas(values: np.ndarray, other_values: np.ndarray) -> np.ndarray:
+    """Absolute differences, nan values only equal to nan values"""
+    deltas = np.abs(values - other_values)
+    both_nan = np.isnan(values) & np.isnan(other_values)
+    deltas[both_nan] = 0.0
+    deltas[np.isnan(deltas)] = np.inf
+    return deltas
+
+
+def diff_luts(name: str, lut_path: str, other_lut_path: str) -> LutDiff:
+    """Differences of a LUT and the LUT of the same name, run in a worker
+    process"""
+    try:
+        with open(lut_path, "rb") as lut_file, open(other_lut_path, "rb") as other:
+            data, other_data = lut_file.read(), other.read()
+        if data == other_data:
+            return LutDiff(name, UNCHANGED)
+        if os.path.splitext(name)[1][1:].lower() in BINARY_EXTENSIONS:
+            return LutDiff(name, UNREADABLE, error="binary files differ")
+        values = parse_lut(lut_path, data)
+        other_values = parse_lut(other_lut_path, other_data)
+    except (OSError, ValueError) as err:
+        return LutDiff(name, UNREADABLE, error=str(err))
+
+    if values.shape != other_values.shape:
+        return LutDiff(
+            name,
+            RESIZED,
+            values=len(other_values),
+            error=f"{len(values)} values, then {len(other_values)}",
+        )
+    if not values.size:
+        return LutDiff(name, UNCHANGED)
+    deltas = get_deltas(values, other_values)
+    max_delta = float(deltas.max())
+    return LutDiff(
+        name,
+        CHANGED if max_delta else UNCHANGED,
+        max_delta,
+        float(deltas.mean()),
+        float(np.percentile(deltas, PERCENTILE)),
+        len(values),
+    )
+
+
+def list_luts(lut_dir: str) -> set:
+    """File names of the LUTs of a directory"""
+    extensions = {f".{extension}" for extension in batch.LUT_FORMAT_EXTENSIONS.values()}
+    return {
+        name
+        for name in os.listdir(lut_dir)
+        if os.path.splitext(name)[1].lower() in extensions
+        and os.path.isfile(os.path.join(lut_dir, name))
+    }
+
+
+def diff_directories(
+    lut_dir: str,
+    other_lut_dir: str,
+    names: list | None = None,
+    workers: int | None = None,
+) -> list[LutDiff]:
+    """Differences of the LUTs of two directories, by file name, of the names
+    given or of every LUT found in either directory"""
+    names = set(names) if names else list_luts(lut_dir) | list_luts(other_lut_dir)
+    diffs, pairs = [], []
+    for name in sorted(names):
+        lut_path = os.path.join(lut_dir, name)
+        other_lut_path = os.path.join(other_lut_dir, name)
+        exists, other_exists = os.path.isfile(lut_path), os.path.isfile(other_lut_path)
+        if exists and other_exists:
+            pairs.append((name, lut_path, other_lut_path))
+        elif exists:
+            diffs.append(LutDiff(name, REMOVED))
+        elif other_exists:
+            diffs.append(LutDiff(name, ADDED))
+        else:
+            diffs.append(LutDiff(name, MISSING))
+
+    if not pairs:
+        return diffs
+    workers = workers or resources.get_cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        diffs.extend(
+            executor.map(
+                diff_luts,
+                *zip(*pairs),
+                # thousands of small LUTs are sent to the workers in chunks
+                chunksize=max(1, len(pairs) // (workers * 4)),
+            )
+        )
+    return diffs
+
+
+def sort_diffs(diffs: list[LutDiff]) -> list[LutDiff]:
+    """Structural changes first, then the largest differences"""
+    return sorted(
+        diffs,
+        key=lambda diff: (
+            diff.status not in STRUCTURAL_STATUSES,
+            -diff.max_delta,
+            -diff.p99_delta,
+            diff.name,
+        ),
+    )
+
+
+def write_diff_report(
+    report_path: str, diffs: list[LutDiff], threshold: float = DEFAULT_THRESHOLD
+) -> list[LutDiff]:
+    """Write the counts of each status and the significant changes, sorted,
+    return the latter"""
+    significant = sort_diffs([diff for diff in diffs if diff.is_significant(threshold)])
+    counts = {}
+    for diff in diffs:
+        counts[diff.status] = counts.get(diff.status, 0) + 1
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(
+            {
+                "threshold": threshold,
+                "luts": len(diffs),
+                "statuses": counts,
+                "significant": [asdict(diff) for diff in significant],
+            },
+            report_file,
+            indent=2,
+        )
+    return significant
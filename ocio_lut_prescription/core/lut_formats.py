@@ -0,0 +1,332 @@
+"""lut_formats submodule of the core module, writes baked lattices to LUT files
+
+Writers take a float32 lattice of shape (cube_size**3, 3), red varying
+fastest, as OCIO bakes it, and reproduce the files written by ociobakelut.
+Shaper writers also take the 1D shaper the lattice is indexed through.
+Lines are formatted a whole table at a time: the digits of every value are
+computed with numpy, then the padding characters are dropped.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+# cube size ociobakelut uses when none is given
+DEFAULT_CUBE_SIZES = {
+    "cinespace": 32,
+    "flame": 17,
+    "houdini": 64,
+    "iridas_cube": 32,
+    "iridas_itx": 64,
+    "lustre": 33,
+    "resolve_cube": 64,
+    "spi3d": 32,
+    "truelight": 32,
+}
+# shaper size ociobakelut uses when none is given
+DEFAULT_SHAPER_SIZES = {
+    "cinespace": 1024,
+    "houdini": 1024,
+    "resolve_cube": 4096,
+}
+# formats ociobakelut writes as 1D LUTs for transforms without channel crosstalk
+CROSSTALK_ONLY_FORMATS = {"houdini", "resolve_cube"}
+TRUELIGHT_INPUT_LUT_LENGTH = 1024
+MESH_BIT_DEPTH = 1023
+OUTPUT_BIT_DEPTH = 4095
+WRITE_BUFFER_SIZE = 1 << 22
+# values formatted as "%.6f" are computed as integers of millionths
+FRACTION_DIGITS = 6
+FRACTION_SCALE = 10**FRACTION_DIGITS
+# beyond, the millionths of a float32 value may overflow an int64
+MAX_FIXED_POINT_VALUE = 2.0**32
+DIGIT_TRIPLETS = np.array(
+    [list(f"{value:03d}".encode("ascii")) for value in range(1000)], dtype=np.uint8
+)
+
+
+@dataclass
+class Shaper:
+    """1D shaper of a 3D LUT, sampled both ways as the formats store it: the
+    shaper values of inputs regularly spaced over the input range, and the
+    inputs of shaper values regularly spaced over [0, 1], the ramp"""
+
+    input_range: tuple
+    values: np.ndarray
+    ramp: np.ndarray
+    ramp_inputs: np.ndarray
+
+
+def get_fixed_point_parts(values: np.ndarray) -> tuple:
+    """Sign bits, integer parts and millionths of float32 values, rounded half
+    to even from their exact binary value, as printf rounds them"""
+    bits = values.view(np.uint32).astype(np.int64)
+    exponent_bits = (bits >> 23) & 0xFF
+    mantissa = bits & 0x7FFFFF
+    # value = mantissa * 2**exponent, subnormals have no implicit leading bit
+    mantissa = np.where(exponent_bits > 0, mantissa | 0x800000, mantissa)
+    exponent = np.where(exponent_bits > 0, exponent_bits - 150, -149)
+
+    millionths = mantissa * FRACTION_SCALE
+    shift = np.clip(-exponent, 0, 62)
+    rounded = millionths >> shift
+    remainder = millionths - (rounded << shift)
+    half = np.int64(1) << np.maximum(shift - 1, 0)
+    rounded += (shift > 0) & (
+        (remainder > half) | ((remainder == half) & (rounded & 1 == 1))
+    )
+    rounded = np.where(exponent > 0, millionths << np.clip(exponent, 0, 62), rounded)
+    return bits >> 31, rounded // FRACTION_SCALE, rounded % FRACTION_SCALE
+
+
+def get_constant_chars(rows: int, text: str) -> tuple:
+    chars = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    return np.broadcast_to(chars, (rows, len(chars))), np.ones(
+        (rows, len(chars)), dtype=bool
+    )
+
+
+def get_integer_chars(values: np.ndarray) -> tuple:
+    """Digits of non negative integers, right aligned, and the mask of the
+    digits to keep, leading zeros excluded"""
+    width = len(str(int(values.max()))) if values.size else 1
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    chars = ((values[:, None] // powers) % 10).astype(np.uint8) + ord("0")
+    return chars, (values[:, None] >= powers) | (powers == 1)
+
+
+def get_fixed_point_chars(values: np.ndarray) -> list:
+    """Characters of float32 values formatted as "%.6f", and their masks"""
+    signs, integer_parts, millionths = get_fixed_point_parts(values)
+    rows = len(values)
+    fraction_chars = np.concatenate(
+        [DIGIT_TRIPLETS[millionths // 1000], DIGIT_TRIPLETS[millionths % 1000]],
+        axis=1,
+    )
+    return [
+        (np.full((rows, 1), ord("-"), dtype=np.uint8), (signs == 1)[:, None]),
+        get_integer_chars(integer_parts),
+        get_constant_chars(rows, "."),
+        (fraction_chars, np.ones((rows, FRACTION_DIGITS), dtype=bool)),
+    ]
+
+
+def can_format_at_once(column: np.ndarray) -> bool:
+    """Infinite, nan, huge and negative integer values are formatted one by one"""
+    if not column.size:
+        return True
+    if column.dtype == np.float32:
+        return bool(np.isfinite(column).all()) and bool(
+            np.abs(column).max() < MAX_FIXED_POINT_VALUE
+        )
+    return column.dtype.kind in "iu" and column.min() >= 0
+
+
+def format_table(columns: list, prefix: str = "") -> str:
+    """Lines of space separated columns, integer columns formatted as "%d" and
+    float32 columns as "%.6f", e.g. "0 0 1 0.000000 0.000000 0.250000\n" """
+    if not all(can_format_at_once(column) for column in columns):
+        line = prefix + " ".join(
+            "{:.6f}" if column.dtype == np.float32 else "{}" for column in columns
+        )
+        return "".join(
+            f"{line}\n".format(*row)
+            for row in zip(*(column.tolist() for column in columns))
+        )
+
+    rows = len(columns[0])
+    pieces = [get_constant_chars(rows, prefix)] if prefix else []
+    for index, column in enumerate(columns):
+        if column.dtype == np.float32:
+            pieces.extend(get_fixed_point_chars(column))
+        else:
+            pieces.append(get_integer_chars(column.astype(np.int64)))
+        pieces.append(
+            get_constant_chars(rows, " " if index < len(columns) - 1 else "\n")
+        )
+    chars = np.concatenate([chars for chars, _ in pieces], axis=1)
+    mask = np.concatenate([mask for _, mask in pieces], axis=1)
+    return chars[mask].tobytes().decode("ascii")
+
+
+def to_blue_fastest(lattice: np.ndarray, cube_size: int) -> np.ndarray:
+    return (
+        lattice.reshape(cube_size, cube_size, cube_size, 3)
+        .transpose(2, 1, 0, 3)
+        .reshape(-1, 3)
+    )
+
+
+def format_rgb_lines(lattice: np.ndarray, prefix: str = "") -> str:
+    lattice = np.asarray(lattice, dtype=np.float32)
+    return format_table([lattice[:, 0], lattice[:, 1], lattice[:, 2]], prefix)
+
+
+def write_cinespace(file_obj, lattice: np.ndarray, cube_size: int):
+    file_obj.write("CSPLUTV100\n3D\n\nBEGIN METADATA\nEND METADATA\n\n")
+    file_obj.write("2\n0.000000 1.000000\n0.000000 1.000000\n" * 3)
+    file_obj.write(f"\n{cube_size} {cube_size} {cube_size}\n")
+    file_obj.write(format_rgb_lines(lattice))
+    file_obj.write("\n")
+
+
+def write_cinespace_shaper(
+    file_obj, lattice: np.ndarray, cube_size: int, shaper: Shaper
+):
+    file_obj.write("CSPLUTV100\n3D\n\nBEGIN METADATA\nEND METADATA\n\n")
+    ramp_line = format_table([shaper.ramp]).replace("\n", " ")[:-1]
+    for channel in range(3):
+        file_obj.write(f"{len(shaper.ramp)}\n")
+        file_obj.write(
+            format_table([shaper.ramp_inputs[:, channel]]).replace("\n", " ")[:-1]
+        )
+        file_obj.write(f"\n{ramp_line}\n")
+    file_obj.write(f"\n{cube_size} {cube_size} {cube_size}\n")
+    file_obj.write(format_rgb_lines(lattice))
+    file_obj.write("\n")
+
+
+def write_3dl(file_obj, lattice: np.ndarray, cube_size: int):
+    mesh = [
+        int(math.floor(index * MESH_BIT_DEPTH / (cube_size - 1) + 0.5))
+        for index in range(cube_size)
+    ]
+    file_obj.write(" ".join(str(value) for value in mesh) + "\n")
+
+    scaled = np.clip(lattice, 0.0, 1.0) * np.float32(OUTPUT_BIT_DEPTH)
+    codes = to_blue_fastest(
+        np.floor(scaled + np.float32(0.5)).astype(np.int32), cube_size
+    )
+    file_obj.write(format_table([codes[:, 0], codes[:, 1], codes[:, 2]]))
+    file_obj.write("\n")
+
+
+def write_flame(file_obj, lattice: np.ndarray, cube_size: int):
+    write_3dl(file_obj, lattice, cube_size)
+
+
+def write_lustre(file_obj, lattice: np.ndarray, cube_size: int):
+    mesh_depth = int(math.log2(cube_size - 1))
+    file_obj.write(f"3DMESH\nMesh {mesh_depth} 12\n")
+    write_3dl(file_obj, lattice, cube_size)
+    file_obj.write("LUT8\ngamma 1.0\n")
+
+
+def write_houdini(file_obj, lattice: np.ndarray, cube_size: int):
+    file_obj.write(
+        "Version\t\t2\nFormat\t\tany\nType\t\t3D\n"
+        "From\t\t0.000000 1.000000\nTo\t\t0.000000 1.000000\n"
+        "Black\t\t0.000000\nWhite\t\t1.000000\n"
+        f"Length\t\t{cube_size}\nLUT:\n {{\n"
+    )
+    file_obj.write(format_rgb_lines(lattice, prefix="\t"))
+    file_obj.write(" }\n")
+
+
+def write_houdini_shaper(file_obj, lattice: np.ndarray, cube_size: int, shaper: Shaper):
+    start, end = shaper.input_range
+    file_obj.write(
+        "Version\t\t3\nFormat\t\tany\nType\t\t3D+1D\n"
+        f"From\t\t{start:.6f} {end:.6f}\nTo\t\t0.000000 1.000000\n"
+        "Black\t\t0.000000\nWhite\t\t1.000000\n"
+        f"Length\t\t{cube_size} {len(shaper.values)}\nLUT:\nPre {{\n"
+    )
+    file_obj.write(format_table([shaper.values[:, 0]], prefix="\t"))
+    file_obj.write("}\n3D {\n")
+    file_obj.write(format_rgb_lines(lattice, prefix="\t"))
+    file_obj.write(" }\n")
+
+
+def write_iridas_itx(file_obj, lattice: np.ndarray, cube_size: int):
+    file_obj.write(f"LUT_3D_SIZE {cube_size}\n")
+    file_obj.write(format_rgb_lines(lattice))
+    file_obj.write("\n")
+
+
+def write_cube(file_obj, lattice: np.ndarray, cube_size: int):
+    file_obj.write(f"LUT_3D_SIZE {cube_size}\n")
+    file_obj.write(format_rgb_lines(lattice))
+
+
+def write_cube_shaper(file_obj, lattice: np.ndarray, cube_size: int, shaper: Shaper):
+    start, end = shaper.input_range
+    file_obj.write(
+        f"LUT_1D_SIZE {len(shaper.values)}\n"
+        f"LUT_1D_INPUT_RANGE {start:.6f} {end:.6f}\n"
+        f"LUT_3D_SIZE {cube_size}\n"
+    )
+    file_obj.write(format_rgb_lines(shaper.values))
+    file_obj.write(format_rgb_lines(lattice))
+
+
+def write_spi3d(file_obj, lattice: np.ndarray, cube_size: int):
+    file_obj.write(f"SPILUT 1.0\n3 3\n{cube_size} {cube_size} {cube_size}\n")
+    blue_fastest = to_blue_fastest(lattice, cube_size).astype(np.float32)
+    indices = np.indices((cube_size,) * 3).reshape(3, -1)
+    file_obj.write(
+        format_table(
+            list(indices) + [blue_fastest[:, 0], blue_fastest[:, 1], blue_fastest[:, 2]]
+        )
+    )
+
+
+def write_truelight(file_obj, lattice: np.ndarray, cube_size: int):
+    length = TRUELIGHT_INPUT_LUT_LENGTH
+    file_obj.write(
+        "# Truelight Cube v2.0\n"
+        f"# lutLength {length}\n"
+        "# iDims     3\n# oDims     3\n"
+        f"# width     {cube_size} {cube_size} {cube_size}\n\n# InputLUT\n"
+    )
+    # the input lut maps [0, 1] to cube indices
+    ramp = (
+        np.arange(length, dtype=np.float32)
+        / np.float32(length - 1)
+        * np.float32(cube_size - 1)
+    )
+    file_obj.write(format_rgb_lines(np.repeat(ramp[:, None], 3, axis=1)))
+    file_obj.write("\n# Cube\n")
+    file_obj.write(format_rgb_lines(lattice))
+    file_obj.write("# end\n")
+
+
+WRITERS = {
+    "cinespace": write_cinespace,
+    "flame": write_flame,
+    "houdini": write_houdini,
+    "iridas_cube": write_cube,
+    "iridas_itx": write_iridas_itx,
+    "lustre": write_lustre,
+    "resolve_cube": write_cube,
+    "spi3d": write_spi3d,
+    "truelight": write_truelight,
+}
+
+
+SHAPER_WRITERS = {
+    "cinespace": write_cinespace_shaper,
+    "houdini": write_houdini_shaper,
+    "resolve_cube": write_cube_shaper,
+}
+
+
+def write_lut(
+    lut_filename: str,
+    lut_format: str,
+    lattice: np.ndarray,
+    cube_size: int,
+    shaper: Shaper | None = None,
+):
+    with open(
+        lut_filename,
+        "w",
+        encoding="utf-8",
+        newline="\n",
+        buffering=WRITE_BUFFER_SIZE,
+    ) as file_obj:
+        if shaper is None:
+            WRITERS[lut_format](file_obj, lattice, cube_size)
+        else:
+            SHAPER_WRITERS[lut_format](file_obj, lattice, cube_size, shaper)
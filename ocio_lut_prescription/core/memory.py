@@ -0,0 +1,175 @@
+"""memory submodule of the core module, memory accounting of the stages of a
+process
+
+Turned on, each stage, e.g. a config parsing or the planning of a batch,
+records the python memory it allocated, measured by tracemalloc, with the
+lines that allocated the most, and the growth of the resident memory of the
+process, which also holds the memory of OpenColorIO and Qt, out of reach of
+tracemalloc. Turned off, the default, a stage costs a function call.
+
+Stages nest, e.g. the config parsings of a batch preflight; the memory of a
+stage includes the memory of its inner stages and of the other threads running
+at the same time.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+from ocio_lut_prescription.core import resources
+
+MEMORY_REPORT_ENV = "OCIO_LUT_PRESCRIPTION_MEMORY"
+# lines listed per stage, by memory allocated
+TOP_ALLOCATIONS = 10
+# stages kept, the oldest are dropped, e.g. in a long UI session
+MAX_STAGES = 1000
+
+
+@dataclass
+class StageMemory:  # pylint: disable=too-many-instance-attributes
+    """Memory of a stage, in bytes. The heap growth is the python memory the
+    stage allocated and kept, its peak the most it held at once"""
+
+    name: str
+    duration: float = 0.0
+    heap_growth: int = 0
+    heap_peak: int = 0
+    rss_growth: int = 0
+    rss: int = 0
+    top_allocations: list = field(default_factory=list)
+
+
+class MemoryAccounting:
+    """Stages of a process, recorded while turned on"""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = deque(maxlen=MAX_STAGES)
+        # highest traced memory seen by each running stage, by stage id
+        self._running_peaks = {}
+        self._started_tracing = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Trace the python memory allocated from now on"""
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """Stop tracing, unless tracing was started by someone else, e.g. the
+        -X tracemalloc option"""
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def clear(self):
+        with self._lock:
+            self.stages.clear()
+
+    def get_stages(self, name: str) -> list[StageMemory]:
+        with self._lock:
+            return [stage for stage in self.stages if stage.name == name]
+
+    def _reset_peak(self):
+        """Fold the traced peak so far into the running stages, then start a
+        new peak from the current traced memory"""
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        for stage_id, running_peak in self._running_peaks.items():
+            self._running_peaks[stage_id] = max(running_peak, traced_peak)
+        # python 3.8 has no reset_peak, the peaks of its stages are the peak
+        # of the process so far
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record the memory of the code run in the context"""
+        if not self.enabled or not tracemalloc.is_tracing():
+            yield None
+            return
+        stage_memory = StageMemory(name)
+        snapshot = tracemalloc.take_snapshot()
+        rss = resources.get_process_usage(os.getpid())[0]
+        with self._lock:
+            self._reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+            self._running_peaks[id(stage_memory)] = traced
+        start = time.perf_counter()
+        try:
+            yield stage_memory
+        finally:
+            stage_memory.duration = time.perf_counter() - start
+            with self._lock:
+                self._reset_peak()
+                stage_memory.heap_peak = (
+                    self._running_peaks.pop(id(stage_memory)) - traced
+                )
+                stage_memory.heap_growth = tracemalloc.get_traced_memory()[0] - traced
+            stage_memory.top_allocations = [
+                {
+                    "line": str(statistic.traceback[0]),
+                    "size": statistic.size_diff,
+                    "count": statistic.count_diff,
+                }
+                for statistic in tracemalloc.take_snapshot().compare_to(
+                    snapshot, "lineno"
+                )[:TOP_ALLOCATIONS]
+                if statistic.size_diff > 0
+            ]
+            stage_memory.rss = resources.get_process_usage(os.getpid())[0]
+            stage_memory.rss_growth = stage_memory.rss - rss
+            with self._lock:
+                self.stages.append(stage_memory)
+
+    def get_report(self) -> dict:
+        with self._lock:
+            stages = list(self.stages)
+        return {
+            "rss": resources.get_process_usage(os.getpid())[0],
+            "stages": [asdict(stage) for stage in stages],
+        }
+
+
+ACCOUNTING = MemoryAccounting()
+
+
+def stage(name: str):
+    """Record the memory of the code run in the context, when turned on"""
+    return ACCOUNTING.stage(name)
+
+
+def get_memory_report_path() -> str:
+    return os.environ.get(MEMORY_REPORT_ENV, "")
+
+
+def start_from_env() -> str:
+    """Turn the accounting on when a report path is set in the environment,
+    return the path"""
+    memory_report_path = get_memory_report_path()
+    if memory_report_path:
+        ACCOUNTING.start()
+    return memory_report_path
+
+
+def write_memory_report(
+    memory_report_path: str, accounting: MemoryAccounting = ACCOUNTING
+):
+    """Write the stages recorded as json. Nothing is written without a path, a
+    failure to write is never fatal"""
+    if not memory_report_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(memory_report_path)), exist_ok=True)
+        with open(memory_report_path, "w", encoding="utf-8") as report_file:
+            json.dump(accounting.get_report(), report_file, indent=2)
+    except OSError:
+        return
@@ -0,0 +1,289 @@
+"""metrics submodule of the core module, bake statistics for node monitoring
+
+Counters, gauges and histograms of the process, rendered in the OpenMetrics
+text format and written atomically, e.g. to the directory read by the
+node_exporter textfile collector. Counters start from zero in every process,
+the file of a node holds the statistics of its last batch.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ocio_lut_prescription.core.ui import BakeCmdData
+
+METRICS_PATH_ENV = "OCIO_LUT_PRESCRIPTION_METRICS"
+PREFIX = "ocio_lut_prescription"
+BAKE_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+CONFIG_LOAD_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Family of samples sharing a name, one value per label set"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), unit=""):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.unit = unit
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get_key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get_value(self, **labels):
+        with self._lock:
+            return self._values.get(self.get_key(labels))
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def get_samples(self, key: tuple, value) -> list:
+        return [("", dict(zip(self.labelnames, key)), value)]
+
+    def render(self) -> list:
+        lines = [f"# TYPE {self.name} {self.metric_type}"]
+        if self.unit:
+            lines.append(f"# UNIT {self.name} {self.unit}")
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.extend(
+                f"{self.name}{suffix}{format_labels(labels)} {format_value(sample)}"
+                for suffix, labels, sample in self.get_samples(key, value)
+            )
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: int | float = 1, **labels):
+        key = self.get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, total: int | float, **labels):
+        """Mirror a count kept elsewhere, e.g. by functools.lru_cache"""
+        key = self.get_key(labels)
+        with self._lock:
+            self._values[key] = total
+
+    def get_samples(self, key: tuple, value) -> list:
+        return [("_total", dict(zip(self.labelnames, key)), value)]
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value: int | float, **labels):
+        key = self.get_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        unit="",
+        buckets: tuple = BAKE_DURATION_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames, unit)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self.get_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts = [
+                count + (value <= bound) for count, bound in zip(counts, self.buckets)
+            ]
+            self._values[key] = (counts, total + value)
+
+    def get_samples(self, key: tuple, value) -> list:
+        counts, total = value
+        labels = dict(zip(self.labelnames, key))
+        samples = [
+            ("_bucket", {**labels, "le": format_value(float(bound))}, count)
+            for bound, count in zip(self.buckets, counts)
+        ]
+        samples.append(("_count", labels, counts[-1]))
+        samples.append(("_sum", labels, float(total)))
+        return samples
+
+
+class Registry:
+    """Metrics of the process, collectors refresh the metrics mirroring
+    counts kept elsewhere right before rendering"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = [line for metric in self.metrics for line in metric.render()]
+        return "\n".join(lines + ["# EOF"]) + "\n"
+
+
+REGISTRY = Registry()
+BAKES = REGISTRY.add(
+    Counter(
+        f"{PREFIX}_bakes",
+        "LUT bakes by format and status, ok, error or resumed from a journal.",
+        ("lut_format", "status"),
+    )
+)
+BAKE_DURATION = REGISTRY.add(
+    Histogram(
+        f"{PREFIX}_bake_duration_seconds",
+        "Duration of the LUT bakes, resumed bakes excluded.",
+        ("lut_format",),
+        unit="seconds",
+    )
+)
+BYTES_WRITTEN = REGISTRY.add(
+    Counter(
+        f"{PREFIX}_written_bytes",
+        "Size of the LUT files baked.",
+        ("lut_format",),
+        unit="bytes",
+    )
+)
+CONFIG_LOAD_DURATION = REGISTRY.add(
+    Histogram(
+        f"{PREFIX}_config_load_duration_seconds",
+        "Duration of the ocio config parsing.",
+        unit="seconds",
+        buckets=CONFIG_LOAD_BUCKETS,
+    )
+)
+CACHE_HITS = REGISTRY.add(
+    Counter(f"{PREFIX}_cache_hits", "Lookups served from a cache.", ("cache",))
+)
+CACHE_MISSES = REGISTRY.add(
+    Counter(f"{PREFIX}_cache_misses", "Lookups missing a cache.", ("cache",))
+)
+LAST_BATCH = REGISTRY.add(
+    Gauge(
+        f"{PREFIX}_last_batch_timestamp_seconds",
+        "Unix time of the end of the last batch.",
+        unit="seconds",
+    )
+)
+LAST_BATCH_JOBS = REGISTRY.add(
+    Gauge(
+        f"{PREFIX}_last_batch_jobs", "Jobs of the last batch, by status.", ("status",)
+    )
+)
+
+
+def add_lru_cache(name: str, cached_function: Callable):
+    """Report the hits and misses of a functools.lru_cache decorated function,
+    or of an object with the same cache_info method"""
+
+    def collect():
+        cache_info = cached_function.cache_info()
+        CACHE_HITS.set_total(cache_info.hits, cache=name)
+        CACHE_MISSES.set_total(cache_info.misses, cache=name)
+
+    REGISTRY.add_collector(collect)
+
+
+def record_bake(
+    bake_cmd_data: BakeCmdData, ok: bool, duration: float, resumed: bool = False
+):
+    """Count a bake, the size of its LUT file once baked"""
+    if resumed:
+        BAKES.inc(lut_format=bake_cmd_data.lut_format, status="resumed")
+        return
+    BAKES.inc(lut_format=bake_cmd_data.lut_format, status="ok" if ok else "error")
+    BAKE_DURATION.observe(duration, lut_format=bake_cmd_data.lut_format)
+    if ok:
+        try:
+            size = os.path.getsize(bake_cmd_data.lut_filename)
+        except OSError:
+            return
+        BYTES_WRITTEN.inc(size, lut_format=bake_cmd_data.lut_format)
+
+
+def export_bake(bake_cmd_data: BakeCmdData, ok: bool, duration: float):
+    """Count a single bake, e.g. of the UI, and write the metrics to the file
+    set in the environment"""
+    record_bake(bake_cmd_data, ok, duration)
+    write_metrics(get_metrics_path())
+
+
+def record_batch(jobs: list[BakeCmdData], results: list):
+    """Count the bakes of a batch, its batch.BakeResult list"""
+    statuses = {"ok": 0, "error": 0, "resumed": 0}
+    for job, result in zip(jobs, results):
+        record_bake(job, result.ok, result.duration, result.resumed)
+        status = "resumed" if result.resumed else "ok" if result.ok else "error"
+        statuses[status] += 1
+    for status, count in statuses.items():
+        LAST_BATCH_JOBS.set(count, status=status)
+    LAST_BATCH.set(time.time())
+
+
+def get_metrics_path() -> str:
+    return os.environ.get(METRICS_PATH_ENV, "")
+
+
+def write_metrics(metrics_path: str, registry: Registry = REGISTRY):
+    """Atomically replace the metrics file, the collector never reads a partial
+    file. Nothing is written without a path, a failure to write is never fatal"""
+    if not metrics_path:
+        return
+    tmp_path = f"{metrics_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(registry.render())
+        os.replace(tmp_path, metrics_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,21 +1,64 @@
 # pylint: disable=c-extension-no-member
 """ocio python module of ocio_lut_prescription
 """
-from typing import Any
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import Generator
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
 
 import PyOpenColorIO as OCIO
 
+from ocio_lut_prescription.core import cache, memory, metrics
+
+CONFIG_METADATA_NAMESPACE = "config_metadata"
+# environment variables changing what a config exposes, part of its cache key
+CONFIG_ENV_VARS = (
+    "OCIO_ACTIVE_DISPLAYS",
+    "OCIO_ACTIVE_VIEWS",
+    "OCIO_INACTIVE_COLORSPACES",
+)
+PROCESSOR_CACHE_SIZE = 64
+# content hashes of the config files, by path, with the stat they were read at
+CONFIG_HASHES = {}
+
 
 def create_ocio_config_object(ocio_config_path: str) -> OCIO.Config:
     """create an ocio config object"""
+    start = time.perf_counter()
     try:
-        ocio_config_obj = OCIO.Config.CreateFromFile(ocio_config_path)
+        with memory.stage("config_parse"):
+            ocio_config_obj = OCIO.Config.CreateFromFile(ocio_config_path)
     except OCIO.Exception as err:
         raise err
+    metrics.CONFIG_LOAD_DURATION.observe(time.perf_counter() - start)
     return ocio_config_obj
 
 
+@lru_cache(maxsize=16)
+def load_hashed_config(
+    ocio_config_path: str, config_hash: str  # pylint: disable=unused-argument
+) -> OCIO.Config:
+    """Config object of a config content, the hash is the cache key, see
+    get_config_hash"""
+    return create_ocio_config_object(ocio_config_path)
+
+
+metrics.add_lru_cache("config", load_hashed_config)
+
+
+def load_config(ocio_config_path: str) -> OCIO.Config:
+    """Config object shared by the bakes, previews and checks of a process,
+    parsed again once the config file changed"""
+    return load_hashed_config(ocio_config_path, get_config_hash(ocio_config_path))
+
+
 def get_colorspaces_names_list(
     ocio_config_obj: OCIO.Config,
 ) -> Generator[Any, Any, None]:
@@ -31,3 +74,173 @@ def get_looks_names_list(ocio_config_obj: OCIO.Config) -> Generator[Any, Any, No
 def get_displays_list(ocio_config_obj: OCIO.Config) -> Generator[Any, Any, None]:
     """Retrieve the display names from the OCIO configuration object"""
     return (display for display in ocio_config_obj.getDisplays())
+
+
+def get_config_metadata(ocio_config_obj: OCIO.Config) -> dict:
+    """Extract everything the UI needs from the config, as plain lists"""
+    return {
+        "colorspaces": list(get_colorspaces_names_list(ocio_config_obj)),
+        "looks": list(get_looks_names_list(ocio_config_obj)),
+        "displays": list(get_displays_list(ocio_config_obj)),
+    }
+
+
+def get_config_hash(ocio_config_path: str) -> str:
+    """Content hash of a config, salted with the OCIO version and environment.
+    A file is hashed again only when its stat changed"""
+    salt = [OCIO.__version__] + [os.environ.get(var, "") for var in CONFIG_ENV_VARS]
+    if os.path.isfile(ocio_config_path):
+        stat = os.stat(ocio_config_path)
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns, *salt)
+        hashed = CONFIG_HASHES.get(ocio_config_path)
+        if hashed is None or hashed[0] != signature:
+            hashed = (signature, cache.get_file_hash(ocio_config_path, *salt))
+            CONFIG_HASHES[ocio_config_path] = hashed
+        return hashed[1]
+    # builtin configs (ocio://...) have no file to hash
+    return hashlib.sha256("\0".join([ocio_config_path, *salt]).encode()).hexdigest()
+
+
+def read_cached_config_metadata(ocio_config_path: str) -> dict | None:
+    """Return the cached metadata of a config, None if it was never parsed"""
+    try:
+        config_hash = get_config_hash(ocio_config_path)
+    except OSError:
+        return None
+    return cache.read_cache(CONFIG_METADATA_NAMESPACE, config_hash)
+
+
+def refresh_config_metadata(ocio_config_path: str) -> dict:
+    """Parse the config and store its metadata in the cache"""
+    config_hash = get_config_hash(ocio_config_path)
+    metadata = get_config_metadata(create_ocio_config_object(ocio_config_path))
+    cache.write_cache(CONFIG_METADATA_NAMESPACE, config_hash, metadata)
+    return metadata
+
+
+def get_context(
+    ocio_config_obj: OCIO.Config, env_seq: str = "", env_shot: str = ""
+) -> OCIO.Context:
+    """Copy of the config current context, with the SEQ/SHOT overrides applied"""
+    current_context = ocio_config_obj.getCurrentContext()
+    context = OCIO.Context(
+        workingDir=current_context.getWorkingDir(),
+        searchPaths=list(current_context.getSearchPaths()),
+        stringVars=dict(current_context.getStringVars()),
+        environmentMode=current_context.getEnvironmentMode(),
+    )
+    if env_seq:
+        context.setStringVar("SEQ", env_seq)
+    if env_shot:
+        context.setStringVar("SHOT", env_shot)
+    return context
+
+
+def get_processor(  # pylint: disable=too-many-arguments
+    ocio_config_obj: OCIO.Config,
+    input_space: str,
+    output_space: str = "",
+    looks: str = "",
+    env_seq: str = "",
+    env_shot: str = "",
+) -> OCIO.Processor:
+    """Resolve the processor of an input to output transform, with optional looks.
+    Without an output colorspace, the looks are applied in the input colorspace"""
+    output_space = output_space or input_space
+    if looks:
+        transform = OCIO.LookTransform(src=input_space, dst=output_space, looks=looks)
+    else:
+        transform = OCIO.ColorSpaceTransform(src=input_space, dst=output_space)
+    context = get_context(ocio_config_obj, env_seq, env_shot)
+    return ocio_config_obj.getProcessor(context, transform, OCIO.TRANSFORM_DIR_FORWARD)
+
+
+@dataclass
+class ProcessorCacheInfo:
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class ProcessorCache:
+    """LRU cache of the processors of the configs loaded by load_config, keyed
+    on the get_processor arguments with the config path in place of the config,
+    and the config content hash, so an edited config gets new processors. A
+    processor keeps the CPU processors it compiled, a cached processor is
+    ready to bake or preview at once"""
+
+    def __init__(self, maxsize: int = PROCESSOR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._processors = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, processor_key: tuple) -> OCIO.Processor:
+        ocio_config_path, *processor_args = processor_key
+        config_hash = get_config_hash(ocio_config_path)
+        cache_key = (*processor_key, config_hash)
+        with self._lock:
+            processor = self._processors.get(cache_key)
+            if processor is not None:
+                self._processors.move_to_end(cache_key)
+                self.hits += 1
+                return processor
+            self.misses += 1
+
+        # built outside of the lock, a slow transform does not block the others
+        processor = get_processor(
+            load_hashed_config(ocio_config_path, config_hash), *processor_args
+        )
+        with self._lock:
+            self._processors[cache_key] = processor
+            self._processors.move_to_end(cache_key)
+            while len(self._processors) > self.maxsize:
+                self._processors.popitem(last=False)
+                self.evictions += 1
+        return processor
+
+    def cache_info(self) -> ProcessorCacheInfo:
+        with self._lock:
+            return ProcessorCacheInfo(
+                self.hits,
+                self.misses,
+                self.evictions,
+                self.maxsize,
+                len(self._processors),
+            )
+
+    def cache_clear(self):
+        with self._lock:
+            self._processors.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+PROCESSOR_CACHE = ProcessorCache()
+metrics.add_lru_cache("processor", PROCESSOR_CACHE)
+
+
+def get_cached_processor(  # pylint: disable=too-many-arguments
+    ocio_config_path: str,
+    input_space: str,
+    output_space: str = "",
+    looks: str = "",
+    env_seq: str = "",
+    env_shot: str = "",
+) -> OCIO.Processor:
+    """get_processor of a config path, from the processor cache. Failures are
+    not cached"""
+    return PROCESSOR_CACHE.get(
+        (ocio_config_path, input_space, output_space, looks, env_seq, env_shot)
+    )
+
+
+def prewarm_processor(processor_key: tuple):
+    """Build a processor and compile the CPU processors the bakes and the
+    previews use"""
+    processor = PROCESSOR_CACHE.get(processor_key)
+    processor.getOptimizedCPUProcessor(OCIO.OPTIMIZATION_LOSSLESS)
+    processor.getDefaultCPUProcessor()
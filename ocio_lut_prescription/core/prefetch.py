@@ -0,0 +1,192 @@
+# pylint: disable=c-extension-no-member
+"""prefetch submodule of the core module, warms up the files of a batch
+
+Configs reference LUT and CDL files through their search paths, and OCIO reads
+them one at a time when a processor is first built. The files the jobs about
+to run may use are resolved in each job context and read concurrently
+beforehand, so the bakes find them in the page cache.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import PyOpenColorIO as OCIO
+
+from ocio_lut_prescription.core import engine, ocio
+from ocio_lut_prescription.core.preflight import get_look_names
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+PREFETCH_WORKERS = 16
+READ_CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class PrefetchReport:
+    """Files read ahead of a batch. duration is the time reading them took,
+    read_time adds up the time spent reading each file, what reading them one
+    by one would have cost"""
+
+    files: int = 0
+    bytes_read: int = 0
+    duration: float = 0.0
+    read_time: float = 0.0
+    missing: list = field(default_factory=list)
+
+    @property
+    def time_saved(self) -> float:
+        return max(0.0, self.read_time - self.duration)
+
+
+class TransformWalker:
+    """Collect the file names referenced by colorspaces, looks and the
+    transforms they reference, each visited once"""
+
+    def __init__(self, ocio_config_obj: OCIO.Config):
+        self.config = ocio_config_obj
+        self.file_names = set()
+        self._visited = set()
+
+    def add_colorspace(self, name: str):
+        if not name or ("colorspace", name) in self._visited:
+            return
+        self._visited.add(("colorspace", name))
+
+        colorspace = self.config.getColorSpace(name)
+        if colorspace is None:
+            named_transform = self.config.getNamedTransform(name)
+            if named_transform is not None:
+                for direction in (
+                    OCIO.TRANSFORM_DIR_FORWARD,
+                    OCIO.TRANSFORM_DIR_INVERSE,
+                ):
+                    self.add_transform(named_transform.getTransform(direction))
+            return
+
+        for direction in (
+            OCIO.COLORSPACE_DIR_TO_REFERENCE,
+            OCIO.COLORSPACE_DIR_FROM_REFERENCE,
+        ):
+            self.add_transform(colorspace.getTransform(direction))
+        if colorspace.getReferenceSpaceType() == OCIO.REFERENCE_SPACE_DISPLAY:
+            # display colorspaces reach the scene reference through a view transform
+            for view_transform_name in self.config.getViewTransformNames():
+                self.add_view_transform(view_transform_name)
+
+    def add_view_transform(self, name: str):
+        if not name or ("view_transform", name) in self._visited:
+            return
+        self._visited.add(("view_transform", name))
+        view_transform = self.config.getViewTransform(name)
+        for direction in (
+            OCIO.VIEWTRANSFORM_DIR_TO_REFERENCE,
+            OCIO.VIEWTRANSFORM_DIR_FROM_REFERENCE,
+        ):
+            self.add_transform(view_transform.getTransform(direction))
+
+    def add_looks(self, looks: str):
+        for name in get_look_names(looks):
+            if ("look", name) in self._visited:
+                continue
+            self._visited.add(("look", name))
+            look = self.config.getLook(name)
+            if look is None:
+                continue
+            self.add_colorspace(look.getProcessSpace())
+            self.add_transform(look.getTransform())
+            self.add_transform(look.getInverseTransform())
+
+    def add_transform(self, transform: OCIO.Transform | None):
+        if transform is None:
+            return
+        if isinstance(transform, OCIO.GroupTransform):
+            for child_transform in transform:
+                self.add_transform(child_transform)
+        elif isinstance(transform, OCIO.FileTransform):
+            self.file_names.add(transform.getSrc())
+        elif isinstance(transform, OCIO.ColorSpaceTransform):
+            self.add_colorspace(transform.getSrc())
+            self.add_colorspace(transform.getDst())
+        elif isinstance(transform, OCIO.LookTransform):
+            self.add_colorspace(transform.getSrc())
+            self.add_colorspace(transform.getDst())
+            self.add_looks(transform.getLooks())
+        elif isinstance(transform, OCIO.DisplayViewTransform):
+            display, view = transform.getDisplay(), transform.getView()
+            self.add_colorspace(transform.getSrc())
+            self.add_colorspace(self.config.getDisplayViewColorSpaceName(display, view))
+            self.add_view_transform(
+                self.config.getDisplayViewTransformName(display, view)
+            )
+            self.add_looks(self.config.getDisplayViewLooks(display, view))
+
+
+def get_job_files(ocio_config_obj: OCIO.Config, bake_cmd_data: BakeCmdData) -> tuple:
+    """Paths of the files a job may read, resolved in its context, and the file
+    names that could not be resolved"""
+    walker = TransformWalker(ocio_config_obj)
+    walker.add_colorspace(bake_cmd_data.input_space)
+    if bake_cmd_data.use_shaper_space:
+        walker.add_colorspace(bake_cmd_data.shaper_space)
+    if bake_cmd_data.use_output_space:
+        walker.add_colorspace(bake_cmd_data.output_space)
+    if bake_cmd_data.use_looks:
+        walker.add_looks(bake_cmd_data.looks)
+
+    context = ocio.get_context(
+        ocio_config_obj, bake_cmd_data.env_seq, bake_cmd_data.env_shot
+    )
+    paths, missing = set(), set()
+    for file_name in walker.file_names:
+        try:
+            paths.add(context.resolveFileLocation(file_name))
+        except (OCIO.Exception, OCIO.ExceptionMissingFile):
+            missing.add(file_name)
+    return paths, missing
+
+
+def read_file(path: str) -> tuple:
+    """Read a file to warm up the page cache, return its size and read time"""
+    start = time.perf_counter()
+    size = 0
+    try:
+        with open(path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(READ_CHUNK_SIZE), b""):
+                size += len(chunk)
+    except OSError:
+        pass
+    return size, time.perf_counter() - start
+
+
+def prefetch_jobs(
+    jobs: list[BakeCmdData], workers: int = PREFETCH_WORKERS
+) -> PrefetchReport:
+    """Read the files of every job concurrently. Configs that cannot be read
+    are skipped, the preflight reports them"""
+    paths, missing, walked = set(), set(), set()
+    for job in jobs:
+        walk_key = engine.get_lattice_key(job)
+        if walk_key in walked:
+            continue
+        walked.add(walk_key)
+        try:
+            job_paths, job_missing = get_job_files(
+                ocio.load_config(job.ocio_config), job
+            )
+        except (OCIO.Exception, OCIO.ExceptionMissingFile):
+            continue
+        paths |= job_paths
+        missing |= job_missing
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reads = list(executor.map(read_file, sorted(paths)))
+
+    return PrefetchReport(
+        files=len(paths),
+        bytes_read=sum(size for size, _ in reads),
+        duration=time.perf_counter() - start,
+        read_time=sum(read_time for _, read_time in reads),
+        missing=sorted(missing),
+    )
@@ -0,0 +1,187 @@
+# pylint: disable=c-extension-no-member
+"""preflight submodule of the core module
+
+Validates the configs of a batch, and resolves the processors of every job
+against them, before the first ociobakelut call. Only successful checks are
+cached, by config content hash, so a fixed config or job is always re-checked.
+"""
+from __future__ import annotations
+
+import json
+import re
+from collections import defaultdict
+
+import PyOpenColorIO as OCIO
+
+from ocio_lut_prescription.core import cache, engine, ocio
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+PREFLIGHT_NAMESPACE = "preflight"
+LOOKS_SEPARATOR_REGEX = re.compile(r"[,:]")
+
+
+class PreflightError(Exception):
+    """Raised when a config, or a job, of a batch cannot be baked"""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        super().__init__(
+            "\n".join(
+                f"{ocio_config}: {error}"
+                for ocio_config, config_errors in errors.items()
+                for error in config_errors
+            )
+        )
+
+
+def get_job_signature(bake_cmd_data: BakeCmdData) -> str:
+    """Fields of a job which can make its processor fail to resolve"""
+    return json.dumps(
+        [
+            bake_cmd_data.input_space,
+            bake_cmd_data.shaper_space if bake_cmd_data.use_shaper_space else "",
+            bake_cmd_data.output_space if bake_cmd_data.use_output_space else "",
+            bake_cmd_data.looks if bake_cmd_data.use_looks else "",
+            bake_cmd_data.icc_displays
+            if bake_cmd_data.lut_ext == "icc" and bake_cmd_data.use_icc_displays
+            else "",
+            bake_cmd_data.env_seq,
+            bake_cmd_data.env_shot,
+        ]
+    )
+
+
+def get_look_names(looks: str) -> list:
+    """Look names of an OCIO looks string, e.g. "+grade, -neutral" """
+    return [
+        look.strip().lstrip("+-")
+        for look in LOOKS_SEPARATOR_REGEX.split(looks)
+        if look.strip()
+    ]
+
+
+def check_config(ocio_config_obj: OCIO.Config) -> list:
+    try:
+        ocio_config_obj.validate()
+    except (OCIO.Exception, OCIO.ExceptionMissingFile) as err:
+        return [f"invalid config: {err}"]
+    return []
+
+
+def check_job(ocio_config_obj: OCIO.Config, bake_cmd_data: BakeCmdData) -> list:
+    """Check the names used by a job exist, then resolve its processors, cached
+    for the bake"""
+    colorspaces = [bake_cmd_data.input_space]
+    if bake_cmd_data.use_shaper_space:
+        colorspaces.append(bake_cmd_data.shaper_space)
+    if bake_cmd_data.use_output_space:
+        colorspaces.append(bake_cmd_data.output_space)
+    looks = bake_cmd_data.looks if bake_cmd_data.use_looks else ""
+
+    errors = [
+        f"unknown colorspace: {colorspace}"
+        for colorspace in colorspaces
+        if ocio_config_obj.getColorSpace(colorspace) is None
+    ]
+    errors.extend(
+        f"unknown look: {look}"
+        for look in get_look_names(looks)
+        if ocio_config_obj.getLook(look) is None
+    )
+    if (
+        bake_cmd_data.lut_ext == "icc"
+        and bake_cmd_data.use_icc_displays
+        and bake_cmd_data.icc_displays not in ocio_config_obj.getDisplays()
+    ):
+        errors.append(f"unknown display: {bake_cmd_data.icc_displays}")
+    if errors:
+        return errors
+
+    try:
+        ocio.get_cached_processor(
+            bake_cmd_data.ocio_config,
+            bake_cmd_data.input_space,
+            bake_cmd_data.output_space if bake_cmd_data.use_output_space else "",
+            looks,
+            bake_cmd_data.env_seq,
+            bake_cmd_data.env_shot,
+        )
+        if bake_cmd_data.use_shaper_space:
+            ocio.get_cached_processor(
+                bake_cmd_data.ocio_config,
+                bake_cmd_data.input_space,
+                bake_cmd_data.shaper_space,
+                env_seq=bake_cmd_data.env_seq,
+                env_shot=bake_cmd_data.env_shot,
+            )
+    except (OCIO.Exception, OCIO.ExceptionMissingFile) as err:
+        return [f"{bake_cmd_data.lut_filename}: {err}"]
+    return []
+
+
+def preflight_config(ocio_config_path: str, jobs: list[BakeCmdData]) -> list:
+    """Check a config and the jobs baked with it, skipping cached successes"""
+    try:
+        config_hash = ocio.get_config_hash(ocio_config_path)
+    except OSError as err:
+        return [str(err)]
+
+    # sizes are not part of the job signatures cached, always checked
+    size_errors = [
+        f"{job.lut_filename}: {error}"
+        for job in jobs
+        for error in engine.get_size_errors(job)
+    ]
+    cached = cache.read_cache(PREFLIGHT_NAMESPACE, config_hash) or {}
+    validated_signatures = set(cached.get("jobs", []))
+    pending_jobs = {}
+    for job in jobs:
+        signature = get_job_signature(job)
+        if signature not in validated_signatures:
+            pending_jobs.setdefault(signature, job)
+
+    if cached.get("valid") and not pending_jobs:
+        return size_errors
+
+    # parsed, not shared, a config edited since its last bake is checked as is
+    try:
+        ocio_config_obj = ocio.create_ocio_config_object(ocio_config_path)
+    except (OCIO.Exception, OCIO.ExceptionMissingFile) as err:
+        return [f"cannot load config: {err}"]
+
+    if not cached.get("valid"):
+        errors = check_config(ocio_config_obj)
+        if errors:
+            return errors
+
+    errors = size_errors
+    for signature, job in pending_jobs.items():
+        job_errors = check_job(ocio_config_obj, job)
+        if job_errors:
+            errors.extend(job_errors)
+        else:
+            validated_signatures.add(signature)
+
+    cache.write_cache(
+        PREFLIGHT_NAMESPACE,
+        config_hash,
+        {"valid": True, "jobs": sorted(validated_signatures)},
+    )
+    # jobs sharing a typo report it once
+    return list(dict.fromkeys(errors))
+
+
+def run_preflight(jobs: list[BakeCmdData]):
+    """Check every config and job of a batch, raise PreflightError on failure"""
+    jobs_per_config = defaultdict(list)
+    for job in jobs:
+        jobs_per_config[job.ocio_config].append(job)
+
+    errors = {}
+    for ocio_config_path, config_jobs in jobs_per_config.items():
+        config_errors = preflight_config(ocio_config_path, config_jobs)
+        if config_errors:
+            errors[ocio_config_path] = config_errors
+
+    if errors:
+        raise PreflightError(errors)
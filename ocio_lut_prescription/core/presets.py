@@ -0,0 +1,155 @@
+"""presets submodule of the core module, a library of named prescriptions
+
+Presets are complete BakeCmdData records, stored in a single SQLite file and
+indexed by show, config and output space, so listing a show or a config stays
+fast with thousands of presets.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+
+from ocio_lut_prescription.core import batch
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+PRESETS_PATH_ENV = "OCIO_LUT_PRESCRIPTION_PRESETS"
+SHOW_ENV = "SHOW"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS presets (
+    show TEXT NOT NULL,
+    name TEXT NOT NULL,
+    ocio_config TEXT NOT NULL,
+    output_space TEXT NOT NULL,
+    record TEXT NOT NULL,
+    modified REAL NOT NULL,
+    PRIMARY KEY (show, name)
+);
+CREATE INDEX IF NOT EXISTS presets_show_config
+    ON presets (show, ocio_config, output_space);
+CREATE INDEX IF NOT EXISTS presets_config ON presets (ocio_config, output_space);
+CREATE INDEX IF NOT EXISTS presets_output_space ON presets (output_space);
+"""
+
+
+@dataclass
+class Preset:
+    """Listing entry of a preset, its record is read by PresetStore.load"""
+
+    show: str
+    name: str
+    ocio_config: str
+    output_space: str
+    modified: float
+
+
+def get_presets_path() -> str:
+    """Path of the preset library, overridable through the environment"""
+    presets_path = os.environ.get(PRESETS_PATH_ENV)
+    if presets_path:
+        return presets_path
+
+    xdg_data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(xdg_data_home, "ocio-lut-prescription", "presets.sqlite")
+
+
+def get_default_show() -> str:
+    return os.environ.get(SHOW_ENV, "")
+
+
+class PresetStore:
+    """Named prescriptions, per show"""
+
+    def __init__(self, presets_path: str | None = None):
+        self.presets_path = presets_path or get_presets_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.presets_path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.presets_path)
+        # readers, e.g. a batch, do not block an artist saving a preset
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def save(self, name: str, bake_cmd_data: BakeCmdData, show: str = ""):
+        self.save_many([(name, bake_cmd_data)], show)
+
+    def exists(self, name: str, show: str = "") -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM presets WHERE show = ? AND name = ?", (show, name)
+        ).fetchone()
+        return row is not None
+
+    def save_many(self, presets: Iterable[tuple], show: str = ""):
+        """Save (name, bake_cmd_data) pairs in a single transaction, replacing
+        the presets of the same names"""
+        modified = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO presets VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        show,
+                        name,
+                        bake_cmd_data.ocio_config,
+                        bake_cmd_data.output_space,
+                        json.dumps(asdict(bake_cmd_data)),
+                        modified,
+                    )
+                    for name, bake_cmd_data in presets
+                ),
+            )
+
+    def load(self, name: str, show: str = "") -> BakeCmdData | None:
+        """The prescription of a preset, None if there is no such preset"""
+        row = self.connection.execute(
+            "SELECT record FROM presets WHERE show = ? AND name = ?", (show, name)
+        ).fetchone()
+        if row is None:
+            return None
+        # records saved by an older version may lack newer fields
+        return batch.bake_cmd_data_from_dict(json.loads(row[0]))
+
+    def delete(self, name: str, show: str = ""):
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM presets WHERE show = ? AND name = ?", (show, name)
+            )
+
+    def list(
+        self,
+        show: str | None = None,
+        ocio_config: str | None = None,
+        output_space: str | None = None,
+        limit: int = -1,
+    ) -> list[Preset]:
+        """Presets matching every given filter, sorted by show and name"""
+        filters = {
+            "show": show,
+            "ocio_config": ocio_config,
+            "output_space": output_space,
+        }
+        conditions = [
+            f"{column} = ?" for column, value in filters.items() if value is not None
+        ]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            "SELECT show, name, ocio_config, output_space, modified FROM presets "
+            f"{where} ORDER BY show, name LIMIT ?",
+            [value for value in filters.values() if value is not None] + [limit],
+        )
+        return [Preset(*row) for row in rows]
+
+
+def open_preset_store(presets_path: str | None = None) -> PresetStore | None:
+    """The preset library, None when it cannot be opened, e.g. in a read only
+    home directory"""
+    try:
+        return PresetStore(presets_path)
+    except (sqlite3.Error, OSError):
+        return None
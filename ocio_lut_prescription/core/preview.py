@@ -0,0 +1,174 @@
+# pylint: disable=no-name-in-module,c-extension-no-member
+"""preview submodule of the core module, applies a prescription to an image
+
+Previews are rendered off the UI thread on a small proxy of the reference
+image, with the processors of ocio.PROCESSOR_CACHE, so a new selection renders
+in milliseconds.
+"""
+from __future__ import annotations
+
+from functools import partial
+
+import numpy as np
+import PyOpenColorIO as OCIO
+from PySide2.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide2.QtGui import QImage, QPixmap
+from PySide2.QtWidgets import QFileDialog, QMainWindow
+
+from ocio_lut_prescription.core import engine, ocio, ui
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+PROXY_WIDTH = 256
+PROXY_HEIGHT = 144
+# exposure range of the reference chart, in stops around mid grey
+CHART_STOPS = (4.0, -6.0)
+MID_GREY = 0.18
+
+
+def get_reference_image(
+    width: int = PROXY_WIDTH, height: int = PROXY_HEIGHT
+) -> np.ndarray:
+    """Scene linear chart, a hue sweep over an exposure ramp, above a grey
+    ramp over the same exposures"""
+    hue = np.linspace(0.0, 1.0, width, dtype=np.float32) * 6.0
+    hues = np.stack(
+        [
+            np.clip(np.abs(hue - 3.0) - 1.0, 0.0, 1.0),
+            np.clip(2.0 - np.abs(hue - 2.0), 0.0, 1.0),
+            np.clip(2.0 - np.abs(hue - 4.0), 0.0, 1.0),
+        ],
+        axis=-1,
+    )
+    chart_height = height * 3 // 4
+    exposures = MID_GREY * 2.0 ** np.linspace(*CHART_STOPS, chart_height)
+    chart = exposures[:, None, None] * hues[None]
+
+    greys = MID_GREY * 2.0 ** np.linspace(CHART_STOPS[1], CHART_STOPS[0], width)
+    grey_ramp = np.broadcast_to(greys[None, :, None], (height - chart_height, width, 3))
+    return np.concatenate([chart, grey_ramp]).astype(np.float32)
+
+
+def get_proxy(image: np.ndarray, width: int = PROXY_WIDTH) -> np.ndarray:
+    """Downsample an image to the proxy width, keeping its aspect ratio"""
+    height = max(1, round(image.shape[0] * width / image.shape[1]))
+    rows = np.linspace(0, image.shape[0] - 1, height).round().astype(int)
+    columns = np.linspace(0, image.shape[1] - 1, width).round().astype(int)
+    return np.ascontiguousarray(image[rows][:, columns, :3], dtype=np.float32)
+
+
+def render_preview(bake_cmd_data: BakeCmdData, proxy: np.ndarray) -> np.ndarray:
+    """8 bit rendering of the proxy through the prescription transform"""
+    cpu_processor = ocio.get_cached_processor(
+        *engine.get_transform_key(bake_cmd_data)
+    ).getDefaultCPUProcessor()
+    pixels = proxy.reshape(-1, 3).copy()
+    cpu_processor.applyRGB(pixels)
+    pixels = np.clip(np.nan_to_num(pixels), 0.0, 1.0) * 255.0 + 0.5
+    return pixels.astype(np.uint8).reshape(proxy.shape)
+
+
+class PreviewSignals(QObject):
+    """Signals of PreviewWorker, a QRunnable cannot emit them itself"""
+
+    rendered = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class PreviewWorker(QRunnable):
+    """Render a preview off the UI thread"""
+
+    def __init__(self, generation: int, bake_cmd_data: BakeCmdData, proxy):
+        super().__init__()
+        self.generation = generation
+        self.bake_cmd_data = bake_cmd_data
+        self.proxy = proxy
+        self.signals = PreviewSignals()
+
+    def run(self):
+        try:
+            pixels = render_preview(self.bake_cmd_data, self.proxy)
+        except (OSError, OCIO.Exception, OCIO.ExceptionMissingFile) as err:
+            self.signals.failed.emit(self.generation, str(err))
+            return
+        self.signals.rendered.emit(self.generation, pixels)
+
+
+def initialize_preview(main_window: QMainWindow):
+    """Show the reference chart, updated whenever the transform changes"""
+    main_window.preview_proxy = get_reference_image()
+    main_window.preview_generation = 0
+    main_window.preview_worker = None
+    # a single thread, a selection change replaces the pending render
+    main_window.preview_thread_pool = QThreadPool(main_window)
+    main_window.preview_thread_pool.setMaxThreadCount(1)
+    main_window.previewLabel.setFixedSize(PROXY_WIDTH, PROXY_HEIGHT)
+
+    for preview_signal in (
+        main_window.inputColorSpacesComboBox.currentIndexChanged,
+        main_window.outputColorSpacesComboBox.currentIndexChanged,
+        main_window.looksComboBox.currentIndexChanged,
+        main_window.looksRadioButton.toggled,
+        main_window.ocioSeqLineEdit.editingFinished,
+        main_window.ocioShotLineEdit.editingFinished,
+        main_window.previewGroupBox.toggled,
+    ):
+        preview_signal.connect(partial(update_preview, main_window))
+    main_window.previewImagePushButton.clicked.connect(
+        partial(browse_for_preview_image, main_window)
+    )
+
+
+def update_preview(main_window: QMainWindow):
+    """Render the current prescription, results of older selections are
+    dropped"""
+    if not main_window.previewGroupBox.isChecked():
+        return
+    bake_cmd_data = BakeCmdData(*ui.get_bake_cmd_data(main_window))
+    if not bake_cmd_data.ocio_config or not bake_cmd_data.input_space:
+        return
+
+    main_window.preview_generation += 1
+    worker = PreviewWorker(
+        main_window.preview_generation, bake_cmd_data, main_window.preview_proxy
+    )
+    worker.signals.rendered.connect(partial(show_preview, main_window))
+    worker.signals.failed.connect(partial(show_preview_error, main_window))
+    main_window.preview_worker = worker
+    main_window.preview_thread_pool.clear()
+    main_window.preview_thread_pool.start(worker)
+
+
+def show_preview(main_window: QMainWindow, generation: int, pixels: np.ndarray):
+    if generation != main_window.preview_generation:
+        return
+    height, width = pixels.shape[:2]
+    image = QImage(pixels.data, width, height, 3 * width, QImage.Format_RGB888)
+    # the image does not own the pixels, copy them before they are released
+    main_window.previewLabel.setPixmap(QPixmap.fromImage(image.copy()))
+
+
+def show_preview_error(main_window: QMainWindow, generation: int, error: str):
+    if generation != main_window.preview_generation:
+        return
+    main_window.previewLabel.setText(error)
+
+
+def browse_for_preview_image(main_window: QMainWindow):
+    image_path = QFileDialog.getOpenFileName(
+        caption="Select Reference Image",
+        filter="Images (*.png *.jpg *.jpeg *.tif *.tiff)",
+    )[0]
+    if not image_path:
+        return
+    image = QImage(image_path).convertToFormat(QImage.Format_RGB888)
+    if image.isNull():
+        return
+    # scan lines are padded to 4 bytes
+    array = np.frombuffer(image.constBits(), np.uint8, image.sizeInBytes()).reshape(
+        image.height(), image.bytesPerLine()
+    )[:, : 3 * image.width()]
+    main_window.preview_proxy = get_proxy(
+        array.reshape(image.height(), image.width(), 3) / np.float32(255.0)
+    )
+    main_window.previewLabel.setFixedSize(*main_window.preview_proxy.shape[1::-1])
+    update_preview(main_window)
@@ -0,0 +1,156 @@
+"""resources submodule of the core module, sizes the concurrency of bakes
+
+Memory and cpu usage are read from /proc, on other platforms the limiter only
+caps the number of concurrent bakes.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+
+MEMINFO_PATH = "/proc/meminfo"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# keep that share of the memory free, swapping starts well before it runs out
+MEMORY_RESERVE_RATIO = 0.1
+MEMORY_RESERVE_MIN = 256 * 1024**2
+# first guess of the memory used per unit of batch.estimate_bake_cost
+INITIAL_BYTES_PER_COST = 256.0
+# weight of a new measurement in the running averages
+SMOOTHING = 0.3
+POLL_INTERVAL = 0.25
+
+
+def get_cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def read_meminfo() -> dict:
+    """/proc/meminfo values in bytes, empty when not available"""
+    meminfo = {}
+    try:
+        with open(MEMINFO_PATH, encoding="utf-8") as meminfo_file:
+            for line in meminfo_file:
+                name, value = line.split(":", 1)
+                meminfo[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return {}
+    return meminfo
+
+
+def get_process_usage(pid: int) -> tuple:
+    """Resident memory in bytes and cpu time in seconds of a running process,
+    (0, 0.0) once the process is gone"""
+    try:
+        with open(f"/proc/{pid}/statm", encoding="utf-8") as statm_file:
+            rss = int(statm_file.read().split()[1]) * PAGE_SIZE
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as stat_file:
+            # the command name may hold spaces, fields are counted after it
+            stat_fields = stat_file.read().rsplit(")", 1)[1].split()
+        cpu_time = (int(stat_fields[11]) + int(stat_fields[12])) / CLOCK_TICKS
+    except (OSError, ValueError, IndexError):
+        return 0, 0.0
+    return rss, cpu_time
+
+
+class AdaptiveLimiter:
+    """Admit bakes while the memory they are expected to use fits in the
+    available memory, and while the cpus are not saturated.
+
+    The memory and cpu used per unit of estimated cost are learnt from the
+    usage reported by the running bakes. A bake is always admitted when
+    nothing else runs, so a batch makes progress whatever its job sizes.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or 2 * get_cpu_count()
+        self.cpu_count = get_cpu_count()
+        self.bytes_per_cost = INITIAL_BYTES_PER_COST
+        self.cpu_ratio = 1.0
+        self.peak_concurrency = 0
+        self._running = {}
+        self._tokens = itertools.count()
+        self._condition = threading.Condition()
+
+    def estimate_memory(self, cost: float) -> float:
+        return cost * self.bytes_per_cost
+
+    def get_memory_headroom(self) -> float | None:
+        """Memory left for new bakes, None when it cannot be measured"""
+        meminfo = read_meminfo()
+        if "MemAvailable" not in meminfo:
+            return None
+        reserve = max(
+            meminfo.get("MemTotal", 0) * MEMORY_RESERVE_RATIO, MEMORY_RESERVE_MIN
+        )
+        # running bakes have not reached their peak usage yet
+        growth = sum(
+            max(0.0, self.estimate_memory(cost) - rss)
+            for cost, rss in self._running.values()
+        )
+        return meminfo["MemAvailable"] - reserve - growth
+
+    def can_start(self, cost: float) -> bool:
+        running = len(self._running)
+        if not running:
+            return True
+        if running >= self.max_workers:
+            return False
+        if (running + 1) * self.cpu_ratio > self.cpu_count:
+            return False
+        headroom = self.get_memory_headroom()
+        return headroom is None or self.estimate_memory(cost) <= headroom
+
+    def acquire(self, cost: float) -> int:
+        """Block until a bake of that cost can start, return its token"""
+        with self._condition:
+            while not self.can_start(cost):
+                # memory is also freed by processes outside of this batch
+                self._condition.wait(POLL_INTERVAL)
+            token = next(self._tokens)
+            self._running[token] = (cost, 0)
+            self.peak_concurrency = max(self.peak_concurrency, len(self._running))
+            return token
+
+    def update(self, token: int, rss: int):
+        """Report the current resident memory of a running bake"""
+        with self._condition:
+            cost, peak_rss = self._running[token]
+            self._running[token] = (cost, max(peak_rss, rss))
+
+    def release(self, token: int, peak_rss: int = 0, cpu_ratio: float = 0.0):
+        """Learn from a finished bake usage, and let the next ones start"""
+        with self._condition:
+            cost, _ = self._running.pop(token)
+            if peak_rss:
+                self.bytes_per_cost += SMOOTHING * (
+                    peak_rss / cost - self.bytes_per_cost
+                )
+            if cpu_ratio:
+                self.cpu_ratio += SMOOTHING * (cpu_ratio - self.cpu_ratio)
+            self._condition.notify_all()
+
+
+class ProcessSampler:
+    """Polling callback keeping the peak memory and the cpu time of a process,
+    and reporting its memory to the limiter admitting it"""
+
+    def __init__(self, limiter: AdaptiveLimiter | None = None, token: int = 0):
+        self.limiter = limiter
+        self.token = token
+        self.peak_rss = 0
+        self.cpu_time = 0.0
+
+    def __call__(self, pid: int):
+        rss, cpu_time = get_process_usage(pid)
+        if not rss:
+            return
+        self.peak_rss = max(self.peak_rss, rss)
+        self.cpu_time = cpu_time
+        if self.limiter:
+            self.limiter.update(self.token, rss)
@@ -0,0 +1,139 @@
+"""shard submodule of the core module, splits manifests across render nodes
+
+Each shard is a directory holding a manifest baking into the shard's own
+output directory, and a shard.json mapping those outputs back to the
+destinations of the original manifest. Nodes bake their shard with
+"ocio-lut-prescription-batch bake <shard>/manifest.json --report
+<shard>/report.json", and the merge step copies the LUTs to their destinations
+and combines the reports.
+"""
+from __future__ import annotations
+
+import glob
+import heapq
+import json
+import os
+import shutil
+from dataclasses import asdict
+
+from ocio_lut_prescription.core import batch
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+SHARD_INFO_FILENAME = "shard.json"
+MANIFEST_FILENAME = "manifest.json"
+REPORT_FILENAME = "report.json"
+
+
+def split_jobs(jobs: list[BakeCmdData], shard_count: int) -> list:
+    """Greedily assign the costliest jobs first to the least loaded shard.
+    Ties are broken by job key and shard index, so a split is reproducible"""
+    costed_jobs = sorted(
+        ((batch.estimate_bake_cost(job), batch.get_job_key(job), job) for job in jobs),
+        key=lambda costed_job: (-costed_job[0], costed_job[1]),
+    )
+    shards = [[] for _ in range(shard_count)]
+    loads = [(0.0, index) for index in range(shard_count)]
+    for cost, _, job in costed_jobs:
+        load, index = heapq.heappop(loads)
+        shards[index].append(job)
+        heapq.heappush(loads, (load + cost, index))
+    return shards
+
+
+def get_shard_dir(shards_dir: str, index: int) -> str:
+    return os.path.join(shards_dir, f"shard_{index:03d}")
+
+
+def remove_shards(shards_dir: str) -> list:
+    """Remove the shards of a previous split, return their directories"""
+    shard_dirs = sorted(
+        os.path.dirname(shard_info_path)
+        for shard_info_path in glob.glob(
+            os.path.join(glob.escape(shards_dir), "shard_*", SHARD_INFO_FILENAME)
+        )
+    )
+    for shard_dir in shard_dirs:
+        shutil.rmtree(shard_dir)
+    return shard_dirs
+
+
+def write_shards(jobs: list[BakeCmdData], shard_count: int, shards_dir: str) -> list:
+    """Write one manifest per shard, return the shard directories. The shards
+    of a previous split are removed, a merge would gather them too. The shard
+    outputs are absolute, nodes may bake from any directory"""
+    shards_dir = os.path.abspath(shards_dir)
+    remove_shards(shards_dir)
+    destinations = sorted({job.output_dir for job in jobs})
+    shard_dirs = []
+    for index, shard_jobs in enumerate(split_jobs(jobs, shard_count)):
+        shard_dir = get_shard_dir(shards_dir, index)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        local_outputs = {
+            destination: os.path.join(shard_dir, "output", f"{number:03d}")
+            for number, destination in enumerate(destinations)
+        }
+        shard_jobs = [
+            batch.retarget_job(job, job.ocio_config, local_outputs[job.output_dir])
+            for job in shard_jobs
+        ]
+        batch.write_manifest(os.path.join(shard_dir, MANIFEST_FILENAME), shard_jobs)
+
+        shard_info = {
+            "index": index,
+            "shard_count": shard_count,
+            "jobs": len(shard_jobs),
+            "cost": sum(batch.estimate_bake_cost(job) for job in shard_jobs),
+            "destinations": {
+                local_output: destination
+                for destination, local_output in local_outputs.items()
+            },
+        }
+        with open(
+            os.path.join(shard_dir, SHARD_INFO_FILENAME), "w", encoding="utf-8"
+        ) as shard_info_file:
+            json.dump(shard_info, shard_info_file, indent=2)
+        shard_dirs.append(shard_dir)
+    return shard_dirs
+
+
+def merge_shards(shard_dirs: list, report_path: str) -> tuple:
+    """Copy the LUTs baked by every shard to their destination, and write the
+    combined report. Return the merged results and the shards without report"""
+    merged_results = []
+    missing_shards = []
+    for shard_dir in sorted(shard_dirs):
+        with open(
+            os.path.join(shard_dir, SHARD_INFO_FILENAME), encoding="utf-8"
+        ) as shard_info_file:
+            destinations = json.load(shard_info_file)["destinations"]
+
+        shard_report_path = os.path.join(shard_dir, REPORT_FILENAME)
+        if not os.path.exists(shard_report_path):
+            missing_shards.append(shard_dir)
+            continue
+
+        for result in batch.read_report(shard_report_path):
+            destination = destinations[os.path.dirname(result.lut_filename)]
+            lut_filename = os.path.join(
+                destination, os.path.basename(result.lut_filename)
+            )
+            if result.ok:
+                os.makedirs(destination, exist_ok=True)
+                shutil.copy2(result.lut_filename, lut_filename)
+            result.log = result.log.replace(result.lut_filename, lut_filename)
+            result.lut_filename = lut_filename
+            merged_results.append(result)
+
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(
+            {
+                "jobs": len(merged_results),
+                "failed": sum(not result.ok for result in merged_results),
+                "missing_shards": missing_shards,
+                "results": [asdict(result) for result in merged_results],
+            },
+            report_file,
+            indent=2,
+        )
+    return merged_results, missing_shards
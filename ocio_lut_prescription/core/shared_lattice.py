@@ -0,0 +1,207 @@
+"""shared_lattice submodule of the core module, lattices evaluated by processes
+
+Large lattices are split in slabs of nodes, evaluated concurrently by a pool of
+worker processes. The coordinator allocates each lattice in a
+multiprocessing.shared_memory block, the workers map the block and evaluate
+their slab in place: only the block name and the slab bounds are pickled, no
+array is sent to a worker or back.
+
+The coordinator owns the blocks, a block is unlinked when its lattice is
+closed, workers only map it. Blocks are named after the coordinator process:
+when a coordinator dies, the resource tracker of multiprocessing unlinks its
+blocks, and a block that survived both is unlinked by the next pool started.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from ocio_lut_prescription.core import engine, resources
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+BLOCK_PREFIX = "olp_lattice_"
+# POSIX shared memory of Linux, where orphaned blocks are looked for
+SHARED_MEMORY_DIR = "/dev/shm"
+# fewer nodes are not worth a process, e.g. cube sizes up to 33 stay in process
+MIN_SLAB_NODES = 1 << 15
+# blocks unlinked while a view of their lattice was left, unmapped at a later
+# close, e.g. once the traceback of a failed bake holding the view is gone
+VIEWED_BLOCKS = []
+VIEWED_BLOCKS_LOCK = threading.Lock()
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # a process of another user
+        return True
+    return True
+
+
+def release_viewed_blocks():
+    with VIEWED_BLOCKS_LOCK:
+        for block in list(VIEWED_BLOCKS):
+            try:
+                block.close()
+            except BufferError:
+                continue
+            VIEWED_BLOCKS.remove(block)
+
+
+def remove_orphaned_blocks() -> list:
+    """Unlink the blocks of coordinators no longer running, return their
+    names"""
+    try:
+        names = os.listdir(SHARED_MEMORY_DIR)
+    except OSError:
+        return []
+    removed = []
+    for name in names:
+        if not name.startswith(BLOCK_PREFIX):
+            continue
+        pid = name[len(BLOCK_PREFIX) :].split("_", 1)[0]
+        if not pid.isdigit() or is_process_alive(int(pid)):
+            continue
+        try:
+            os.remove(os.path.join(SHARED_MEMORY_DIR, name))
+        except FileNotFoundError:
+            # removed by another coordinator
+            continue
+        removed.append(name)
+    return removed
+
+
+class SharedLattice:
+    """Lattice of a cube size in a shared memory block, unlinked on close"""
+
+    def __init__(self, cube_size: int):
+        self.cube_size = cube_size
+        nodes = cube_size**3
+        self.block = shared_memory.SharedMemory(
+            name=f"{BLOCK_PREFIX}{os.getpid()}_{uuid.uuid4().hex[:8]}",
+            create=True,
+            size=nodes * 3 * np.dtype(np.float32).itemsize,
+        )
+        self.array = np.ndarray((nodes, 3), dtype=np.float32, buffer=self.block.buf)
+
+    @property
+    def name(self) -> str:
+        return self.block.name
+
+    def close(self):
+        """Unlink the block, and unmap it once no view of the lattice is left"""
+        if self.array is None:
+            return
+        self.array = None
+        self.block.unlink()
+        with VIEWED_BLOCKS_LOCK:
+            VIEWED_BLOCKS.append(self.block)
+        release_viewed_blocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def get_identity_nodes(cube_size: int, start: int, stop: int) -> np.ndarray:
+    """Nodes start to stop of engine.get_identity_lattice, to the bit"""
+    ramp = np.arange(cube_size, dtype=np.float32) * np.float32(1.0 / (cube_size - 1))
+    indices = np.arange(start, stop)
+    return np.stack(
+        [
+            ramp[indices % cube_size],
+            ramp[indices // cube_size % cube_size],
+            ramp[indices // cube_size**2],
+        ],
+        axis=-1,
+    )
+
+
+def evaluate_slab(
+    block_name: str, cube_size: int, start: int, stop: int, bake_cmd_data: BakeCmdData
+):
+    """Evaluate nodes start to stop of the lattice of a job, in the block of
+    the coordinator, run in a worker process"""
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        slab = np.ndarray((cube_size**3, 3), dtype=np.float32, buffer=block.buf)[
+            start:stop
+        ]
+        slab[:] = get_identity_nodes(cube_size, start, stop)
+        engine.get_cpu_processor(bake_cmd_data).applyRGB(slab)
+        del slab
+    finally:
+        block.close()
+
+
+class LatticePool:
+    """Worker processes evaluating the slabs of large lattices. Processes are
+    spawned, the bakes of the coordinator run in threads"""
+
+    def __init__(self, processes: int | None = None):
+        self.processes = processes or resources.get_cpu_count()
+        remove_orphaned_blocks()
+        self._lock = threading.Lock()
+        self._executor = self._start_executor()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=get_context("spawn")
+        )
+
+    def can_split(self, cube_size: int) -> bool:
+        return cube_size**3 >= 2 * MIN_SLAB_NODES
+
+    def get_slab_bounds(self, cube_size: int) -> list:
+        nodes = cube_size**3
+        slabs = max(1, min(self.processes, nodes // MIN_SLAB_NODES))
+        bounds = np.linspace(0, nodes, slabs + 1).astype(int).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def evaluate(self, bake_cmd_data: BakeCmdData, cube_size: int) -> SharedLattice:
+        """Lattice of a job, to close once written. A worker that died fails
+        the lattice, the next one is evaluated by new workers"""
+        executor = self._executor
+        lattice = SharedLattice(cube_size)
+        try:
+            futures = [
+                executor.submit(
+                    evaluate_slab, lattice.name, cube_size, start, stop, bake_cmd_data
+                )
+                for start, stop in self.get_slab_bounds(cube_size)
+            ]
+            for future in futures:
+                future.result()
+        except BrokenProcessPool:
+            lattice.close()
+            with self._lock:
+                # once, for all the lattices the dead worker failed
+                if self._executor is executor:
+                    executor.shutdown(wait=False)
+                    self._executor = self._start_executor()
+            raise
+        except BaseException:
+            lattice.close()
+            raise
+        return lattice
+
+    def close(self):
+        self._executor.shutdown()
+        release_viewed_blocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,66 @@
+"""stream submodule of the core module, runs a process with bounded output
+
+stdout and stderr are read line by line while the process runs, each line is
+handed to a callback and only the last lines are kept, however verbose the
+process is.
+"""
+from __future__ import annotations
+
+import subprocess
+import threading
+from collections import deque
+from collections.abc import Callable
+
+LOG_TAIL_LINES = 200
+# longer lines are split, a line without newline cannot grow unbounded
+MAX_LINE_LENGTH = 4096
+POLL_INTERVAL = 0.05
+
+
+def read_lines(pipe, name: str, tail: deque, lock: threading.Lock, on_line):
+    with pipe:
+        for raw_line in iter(lambda: pipe.readline(MAX_LINE_LENGTH), b""):
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\n")
+            with lock:
+                tail.append(line)
+            if on_line:
+                on_line(name, line)
+
+
+def run_streamed(
+    cmd: list,
+    env: dict | None = None,
+    on_line: Callable[[str, str], None] | None = None,
+    on_poll: Callable[[int], None] | None = None,
+    max_lines: int = LOG_TAIL_LINES,
+) -> tuple:
+    """Run a command, calling on_line(stream_name, line) for each line of
+    output and on_poll(pid) periodically while it runs.
+    Return its exit code, and its last lines of output, stdout and stderr
+    interleaved as they arrived"""
+    tail = deque(maxlen=max_lines)
+    lock = threading.Lock()
+    with subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+    ) as process:
+        readers = [
+            threading.Thread(
+                target=read_lines, args=(pipe, name, tail, lock, on_line), daemon=True
+            )
+            for pipe, name in ((process.stdout, "stdout"), (process.stderr, "stderr"))
+        ]
+        for reader in readers:
+            reader.start()
+
+        while True:
+            try:
+                process.wait(timeout=POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if on_poll:
+                    on_poll(process.pid)
+
+        for reader in readers:
+            reader.join()
+
+    return process.returncode, list(tail)
@@ -1,18 +1,36 @@
-# pylint: disable=no-name-in-module
+# pylint: disable=no-name-in-module,c-extension-no-member
 """ui related submodule of the core module"""
+import json
 import re
 from dataclasses import dataclass
-from typing import Any
-from collections.abc import Generator
+from functools import partial
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
 
-from PySide2.QtCore import Qt, QSettings
+import PyOpenColorIO as OCIO
+from PySide2.QtCore import Qt, QObject, QRunnable, QSettings, QThreadPool, Signal
 from PySide2.QtGui import QColor, QPalette
-from PySide2.QtWidgets import QApplication, QFileDialog, QMainWindow
+from PySide2.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QInputDialog,
+    QMainWindow,
+    QMessageBox,
+)
 
-from ocio_lut_prescription.core import ocio
+from ocio_lut_prescription.core import memory, ocio
+
+if TYPE_CHECKING:
+    from ocio_lut_prescription.core.presets import PresetStore
 
 LUT_INFO_REGEX = re.compile(r"^(?P<lut_format>\w+) \(.(?P<lut_ext>\w{3})\)$")
 SIZES_LIST = [str(x) for x in range(1, 67)]
+# searched for before baking, see engine.resolve_cube_size
+AUTO_CUBE_SIZE = "auto"
+CUBE_SIZES_LIST = SIZES_LIST + [AUTO_CUBE_SIZE]
+# processors of the last selections, built in the background at startup
+RECENT_PROCESSORS_KEY = "prewarm/processors"
+RECENT_PROCESSORS_COUNT = 4
 
 
 @dataclass
@@ -50,28 +68,148 @@ class BakeCmdData:  # pylint: disable=too-many-instance-attributes
     lut_filename: str
 
 
+class ConfigMetadataSignals(QObject):
+    """Signals of ConfigMetadataWorker, a QRunnable cannot emit them itself"""
+
+    refreshed = Signal(str, object)
+
+
+class ConfigMetadataWorker(QRunnable):
+    """Re-parse an ocio config off the UI thread to revalidate its cached metadata"""
+
+    def __init__(self, ocio_config_path: str):
+        super().__init__()
+        self.ocio_config_path = ocio_config_path
+        self.signals = ConfigMetadataSignals()
+
+    def run(self):
+        try:
+            metadata = ocio.refresh_config_metadata(self.ocio_config_path)
+        except (OSError, OCIO.Exception, OCIO.ExceptionMissingFile):
+            # the cached metadata stays on screen, the next bake reports the error
+            return
+        self.signals.refreshed.emit(self.ocio_config_path, metadata)
+
+
+class ProcessorPrewarmWorker(QRunnable):
+    """Build processors off the UI thread, so the first bake or preview of a
+    session finds them compiled"""
+
+    def __init__(self, processor_keys: list):
+        super().__init__()
+        self.processor_keys = processor_keys
+
+    def run(self):
+        for processor_key in self.processor_keys:
+            try:
+                ocio.prewarm_processor(processor_key)
+            except (OSError, OCIO.Exception, OCIO.ExceptionMissingFile):
+                # a selection gone from its config, the bake reports it
+                continue
+
+
+def load_config_metadata(main_window: QMainWindow, ocio_config_path: str) -> dict:
+    """Return the config metadata from the cache when possible, revalidating it
+    in the background, otherwise parse the config right away"""
+    with memory.stage("config_metadata"):
+        metadata = ocio.read_cached_config_metadata(ocio_config_path)
+        if metadata is None:
+            return ocio.refresh_config_metadata(ocio_config_path)
+
+    worker = ConfigMetadataWorker(ocio_config_path)
+    worker.signals.refreshed.connect(
+        partial(apply_refreshed_config_metadata, main_window, metadata)
+    )
+    # keep a reference, the worker must outlive this call
+    main_window.config_metadata_worker = worker
+    QThreadPool.globalInstance().start(worker)
+    return metadata
+
+
+def apply_refreshed_config_metadata(
+    main_window: QMainWindow,
+    cached_metadata: dict,
+    ocio_config_path: str,
+    metadata: dict,
+):
+    """Update the combo boxes if the revalidated metadata differs from the cache"""
+    if ocio_config_path != main_window.ocioCfgLineEdit.text():
+        return
+    if metadata == cached_metadata:
+        return
+
+    combo_box_metadata = {
+        main_window.inputColorSpacesComboBox: metadata["colorspaces"],
+        main_window.shaperColorSpacesComboBox: metadata["colorspaces"],
+        main_window.outputColorSpacesComboBox: metadata["colorspaces"],
+        main_window.looksComboBox: metadata["looks"],
+        main_window.iccDisplaysComboBox: metadata["displays"],
+    }
+    for combo_box, names in combo_box_metadata.items():
+        update_combo_box_items(combo_box, names)
+
+
+def update_combo_box_items(combo_box, names: list):
+    """Apply the names removed from and added to the list to the items of a combo
+    box, so an unchanged config costs nothing and the current item is kept when
+    its name still exists"""
+    current_names = [combo_box.itemText(index) for index in range(combo_box.count())]
+    if current_names == names:
+        return
+    current_text = combo_box.currentText()
+    name_set = set(names)
+    kept_names = [name for name in current_names if name in name_set]
+    kept_set = set(kept_names)
+
+    combo_box.blockSignals(True)
+    if kept_names != [name for name in names if name in kept_set]:
+        # reordered or duplicated names, inserts and removes cannot express it
+        combo_box.clear()
+        combo_box.addItems(names)
+    else:
+        model = combo_box.model()
+        end = len(current_names)
+        while end > 0:
+            if current_names[end - 1] in name_set:
+                end -= 1
+                continue
+            start = end - 1
+            while start > 0 and current_names[start - 1] not in name_set:
+                start -= 1
+            model.removeRows(start, end - start)
+            end = start
+        # the kept items are in the order of the names, each run of new names
+        # goes right before the next kept one
+        start = 0
+        while start < len(names):
+            if names[start] in kept_set:
+                start += 1
+                continue
+            end = start + 1
+            while end < len(names) and names[end] not in kept_set:
+                end += 1
+            combo_box.insertItems(start, names[start:end])
+            start = end
+    if current_text in name_set and combo_box.currentText() != current_text:
+        combo_box.setCurrentIndex(combo_box.findText(current_text, Qt.MatchFixedString))
+    combo_box.blockSignals(False)
+
+
 def load_ocio_config(main_window: QMainWindow, settings: QSettings):
     ocio_config_path = main_window.ocioCfgLineEdit.text()
 
     if ocio_config_path:
-        ocio_config_obj = ocio.create_ocio_config_object(ocio_config_path)
-
-        input_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        shaper_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        output_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        looks_generator = ocio.get_looks_names_list(ocio_config_obj)
-        displays_generator = ocio.get_displays_list(ocio_config_obj)
-
-        if ocio_config_obj:
-            initialize_ui_with_config_data(
-                main_window,
-                input_colorspaces_generator,
-                shaper_colorspaces_generator,
-                output_colorspaces_generator,
-                looks_generator,
-                displays_generator,
-            )
-            save_settings(settings, main_window)
+        metadata = load_config_metadata(main_window, ocio_config_path)
+
+        initialize_ui_with_config_data(
+            main_window,
+            metadata["colorspaces"],
+            metadata["colorspaces"],
+            metadata["colorspaces"],
+            metadata["looks"],
+            metadata["displays"],
+        )
+        save_settings(settings, main_window)
 
 
 def settings_clear(app: QApplication, settings: QSettings, main_window: QMainWindow):
@@ -107,9 +245,78 @@ def save_settings(settings: QSettings, main_window: QMainWindow):
     settings.setValue("icc/displays", main_window.iccDisplaysComboBox.currentText())
     settings.setValue("icc/description", main_window.iccDescriptionLineEdit.text())
     settings.setValue("icc/copyright", main_window.iccCopyrightLineEdit.text())
+    save_recent_processors(settings, main_window)
     settings.sync()
 
 
+def get_recent_processors(settings: QSettings) -> list:
+    """ocio.get_cached_processor arguments of the last selections, most recent
+    first"""
+    try:
+        processor_keys = json.loads(settings.value(RECENT_PROCESSORS_KEY) or "[]")
+    except (TypeError, ValueError):
+        return []
+    return [
+        tuple(processor_key)
+        for processor_key in processor_keys
+        if isinstance(processor_key, list) and len(processor_key) == 6
+    ]
+
+
+def save_recent_processors(settings: QSettings, main_window: QMainWindow):
+    ocio_config_path = main_window.ocioCfgLineEdit.text()
+    input_space = main_window.inputColorSpacesComboBox.currentText()
+    if not ocio_config_path or not input_space:
+        return
+    env_seq = main_window.ocioSeqLineEdit.text()
+    env_shot = main_window.ocioShotLineEdit.text()
+    processor_keys = [
+        (
+            ocio_config_path,
+            input_space,
+            main_window.outputColorSpacesComboBox.currentText()
+            if main_window.outputColorSpacesRadioButton.isChecked()
+            else "",
+            main_window.looksComboBox.currentText()
+            if main_window.looksRadioButton.isChecked()
+            else "",
+            env_seq,
+            env_shot,
+        )
+    ]
+    shaper_processor_key = (
+        ocio_config_path,
+        input_space,
+        main_window.shaperColorSpacesComboBox.currentText(),
+        "",
+        env_seq,
+        env_shot,
+    )
+    if (
+        main_window.shaperColorSpacesCheckBox.isChecked()
+        and shaper_processor_key not in processor_keys
+    ):
+        processor_keys.append(shaper_processor_key)
+    processor_keys.extend(
+        processor_key
+        for processor_key in get_recent_processors(settings)
+        if processor_key not in processor_keys
+    )
+    settings.setValue(
+        RECENT_PROCESSORS_KEY, json.dumps(processor_keys[:RECENT_PROCESSORS_COUNT])
+    )
+
+
+def prewarm_processors(main_window: QMainWindow, settings: QSettings):
+    """Build the processors of the last selections in the background"""
+    processor_keys = get_recent_processors(settings)
+    if not processor_keys:
+        return
+    # keep a reference, the worker must outlive this call
+    main_window.processor_prewarm_worker = ProcessorPrewarmWorker(processor_keys)
+    QThreadPool.globalInstance().start(main_window.processor_prewarm_worker)
+
+
 def load_settings(app: QApplication, settings: QSettings, main_window: QMainWindow):
     combo_box_settings = {
         main_window.inputColorSpacesComboBox: "colorspaces/input",
@@ -152,24 +359,18 @@ def initialize_ui(
     ocio_config_path: str,
 ):
     main_window.ocioCfgLineEdit.setText(ocio_config_path)
-    ocio_config_obj = ocio.create_ocio_config_object(ocio_config_path)
-    if ocio_config_obj:
-        input_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        shaper_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        output_colorspaces_generator = ocio.get_colorspaces_names_list(ocio_config_obj)
-        looks_generator = ocio.get_looks_names_list(ocio_config_obj)
-        displays_generator = ocio.get_displays_list(ocio_config_obj)
-
+    metadata = load_config_metadata(main_window, ocio_config_path)
+    if metadata:
         initialize_ui_with_config_data(
             main_window,
-            input_colorspaces_generator,
-            shaper_colorspaces_generator,
-            output_colorspaces_generator,
-            looks_generator,
-            displays_generator,
+            metadata["colorspaces"],
+            metadata["colorspaces"],
+            metadata["colorspaces"],
+            metadata["looks"],
+            metadata["displays"],
         )
 
-        main_window.cubeSizeComboBox.addItems(SIZES_LIST)
+        main_window.cubeSizeComboBox.addItems(CUBE_SIZES_LIST)
         main_window.cubeSizeComboBox.setDisabled(True)
         main_window.shaperSizeComboBox.addItems(SIZES_LIST)
         main_window.shaperSizeComboBox.setDisabled(True)
@@ -250,7 +451,11 @@ def browse_for_ocio_config(main_window: QMainWindow, settings: QSettings):
     ocio_config = QFileDialog.getOpenFileName(
         caption="Select OCIO Configuration", filter="*.ocio"
     )[0]
-    main_window.ocioCfgLineEdit.setText(ocio_config)
+    if ocio_config and ocio_config == main_window.ocioCfgLineEdit.text():
+        # the text does not change, reload the config, it may have been edited
+        load_ocio_config(main_window, settings)
+    else:
+        main_window.ocioCfgLineEdit.setText(ocio_config)
     save_settings(settings, main_window)
 
 
@@ -261,6 +466,73 @@ def browse_for_lut_output_dir(main_window: QMainWindow, settings: QSettings):
     save_settings(settings, main_window)
 
 
+def get_preset_names(preset_store: "PresetStore", show: str, ocio_config: str) -> list:
+    """Names of the show presets for the loaded config, or of all its presets"""
+    presets = preset_store.list(show=show, ocio_config=ocio_config)
+    return [preset.name for preset in presets or preset_store.list(show=show)]
+
+
+def save_preset(main_window: QMainWindow, preset_store: "PresetStore", show: str):
+    name, accepted = QInputDialog.getText(main_window, "Save Preset", "Preset name:")
+    if not accepted or not name:
+        return
+    if preset_store.exists(name, show):
+        answer = QMessageBox.question(
+            main_window, "Save Preset", f"Replace the preset {name}?"
+        )
+        if answer != QMessageBox.Yes:
+            return
+    preset_store.save(name, BakeCmdData(*get_bake_cmd_data(main_window)), show)
+
+
+def load_preset(
+    main_window: QMainWindow,
+    settings: QSettings,
+    preset_store: "PresetStore",
+    show: str,
+):
+    names = get_preset_names(preset_store, show, main_window.ocioCfgLineEdit.text())
+    if not names:
+        return
+    name, accepted = QInputDialog.getItem(
+        main_window, "Load Preset", "Preset:", names, 0, False
+    )
+    if accepted:
+        apply_bake_cmd_data(main_window, settings, preset_store.load(name, show))
+
+
+def delete_preset(main_window: QMainWindow, preset_store: "PresetStore", show: str):
+    names = get_preset_names(preset_store, show, main_window.ocioCfgLineEdit.text())
+    if not names:
+        return
+    name, accepted = QInputDialog.getItem(
+        main_window, "Delete Preset", "Preset:", names, 0, False
+    )
+    if accepted:
+        preset_store.delete(name, show)
+
+
+def connect_preset_actions(
+    main_window: QMainWindow,
+    settings: QSettings,
+    preset_store: "PresetStore | None",
+    show: str,
+):
+    """Connect the Presets menu, disabled without a preset library"""
+    if preset_store is None:
+        main_window.menuPresets.setEnabled(False)
+        return
+    main_window.actionSavePreset.triggered.connect(
+        partial(save_preset, main_window, preset_store, show)
+    )
+    main_window.actionLoadPreset.triggered.connect(
+        partial(load_preset, main_window, settings, preset_store, show)
+    )
+    main_window.actionDeletePreset.triggered.connect(
+        partial(delete_preset, main_window, preset_store, show)
+    )
+
+
 def check_to_enable_baking(main_window: QMainWindow):
     radio_check = any(
         [
@@ -271,12 +543,13 @@ def check_to_enable_baking(main_window: QMainWindow):
     output_check = bool(main_window.outputDirLineEdit.text())
 
     main_window.processBakeLutPushButton.setEnabled(all([radio_check, output_check]))
+    main_window.addToQueuePushButton.setEnabled(all([radio_check, output_check]))
 
 
 def initialize_ui_default(main_window: QMainWindow):
     main_window.cubeSizeComboBox.clear()
     main_window.shaperSizeComboBox.clear()
-    main_window.cubeSizeComboBox.addItems(SIZES_LIST)
+    main_window.cubeSizeComboBox.addItems(CUBE_SIZES_LIST)
     main_window.shaperSizeComboBox.addItems(SIZES_LIST)
 
     main_window.cubeSizeComboBox.setCurrentIndex(32)
@@ -298,6 +571,7 @@ def initialize_ui_default(main_window: QMainWindow):
     main_window.outputDirLineEdit.clear()
 
     main_window.processBakeLutPushButton.setDisabled(True)
+    main_window.addToQueuePushButton.setDisabled(True)
     main_window.overrideLutNameCheckBox.setChecked(False)
     main_window.cubeSizeCheckBox.setChecked(False)
     main_window.shaperSizeCheckBox.setChecked(False)
@@ -309,31 +583,110 @@ def initialize_ui_default(main_window: QMainWindow):
 
 def initialize_ui_with_config_data(
     main_window: QMainWindow,
-    input_colorspaces_generator: Generator[Any, Any, None],
-    shaper_colorspaces_generator: Generator[Any, Any, None],
-    output_colorspaces_generator: Generator[Any, Any, None],
-    looks_generator: Generator[Any, Any, None],
-    displays_generator: Generator[Any, Any, None],
+    input_colorspaces_generator: Iterable[str],
+    shaper_colorspaces_generator: Iterable[str],
+    output_colorspaces_generator: Iterable[str],
+    looks_generator: Iterable[str],
+    displays_generator: Iterable[str],
 ):
+    """Fill the combo boxes with the names of a config. A reload only applies
+    the differences with the names already there, and keeps the selections"""
+    reload = main_window.inputColorSpacesComboBox.count() > 0
     main_window.shaperColorSpacesCheckBox.setEnabled(True)
     main_window.outputColorSpacesRadioButton.setEnabled(True)
     main_window.looksRadioButton.setEnabled(True)
 
-    main_window.inputColorSpacesComboBox.addItems(input_colorspaces_generator)
-    main_window.shaperColorSpacesComboBox.addItems(shaper_colorspaces_generator)
-    main_window.outputColorSpacesComboBox.addItems(output_colorspaces_generator)
-    main_window.looksComboBox.addItems(looks_generator)
-    main_window.iccDisplaysComboBox.addItems(displays_generator)
-
-    main_window.cubeSizeComboBox.setCurrentIndex(32)
-    main_window.shaperSizeComboBox.setCurrentIndex(32)
+    combo_box_names = {
+        main_window.inputColorSpacesComboBox: input_colorspaces_generator,
+        main_window.shaperColorSpacesComboBox: shaper_colorspaces_generator,
+        main_window.outputColorSpacesComboBox: output_colorspaces_generator,
+        main_window.looksComboBox: looks_generator,
+        main_window.iccDisplaysComboBox: displays_generator,
+    }
+    with memory.stage("fill_combo_boxes"):
+        for combo_box, names in combo_box_names.items():
+            # the combo boxes of the colorspaces share the list of the metadata
+            update_combo_box_items(
+                combo_box, names if isinstance(names, list) else list(names)
+            )
 
+    if not reload:
+        main_window.cubeSizeComboBox.setCurrentIndex(32)
+        main_window.shaperSizeComboBox.setCurrentIndex(32)
+        main_window.outputColorSpacesRadioButton.setChecked(True)
     main_window.inputColorSpacesComboBox.setEnabled(True)
-    main_window.outputColorSpacesRadioButton.setChecked(True)
 
     check_to_enable_baking(main_window)
 
 
+def set_combo_box_text(combo_box, text: str):
+    index = combo_box.findText(text, Qt.MatchFixedString)
+    if index >= 0:
+        combo_box.setCurrentIndex(index)
+
+
+def apply_bake_cmd_data(
+    main_window: QMainWindow, settings: QSettings, bake_cmd_data: BakeCmdData
+):
+    """Show a prescription, e.g. a preset, in the main window, loading its
+    config first if another one is loaded"""
+    if bake_cmd_data.ocio_config != main_window.ocioCfgLineEdit.text():
+        initialize_ui_default(main_window)
+        main_window.ocioCfgLineEdit.blockSignals(True)
+        main_window.ocioCfgLineEdit.setText(bake_cmd_data.ocio_config)
+        main_window.ocioCfgLineEdit.blockSignals(False)
+        load_ocio_config(main_window, settings)
+
+    main_window.ocioSeqLineEdit.setText(bake_cmd_data.env_seq)
+    main_window.ocioShotLineEdit.setText(bake_cmd_data.env_shot)
+
+    combo_box_values = {
+        main_window.inputColorSpacesComboBox: bake_cmd_data.input_space,
+        main_window.shaperColorSpacesComboBox: bake_cmd_data.shaper_space,
+        main_window.outputColorSpacesComboBox: bake_cmd_data.output_space,
+        main_window.looksComboBox: bake_cmd_data.looks,
+        main_window.cubeSizeComboBox: bake_cmd_data.cube_size,
+        main_window.shaperSizeComboBox: bake_cmd_data.shaper_size,
+        main_window.lutFormatComboBox: (
+            f"{bake_cmd_data.lut_format} (.{bake_cmd_data.lut_ext})"
+        ),
+        main_window.iccDisplaysComboBox: bake_cmd_data.icc_displays,
+    }
+    for combo_box, value in combo_box_values.items():
+        set_combo_box_text(combo_box, value)
+
+    line_edit_values = {
+        main_window.iccWhitePointLineEdit: bake_cmd_data.icc_white_point,
+        main_window.iccDescriptionLineEdit: bake_cmd_data.icc_description,
+        main_window.iccCopyrightLineEdit: bake_cmd_data.icc_copyright,
+        main_window.outputDirLineEdit: bake_cmd_data.output_dir,
+        main_window.overrideLutNameLineEdit: bake_cmd_data.override_lut_filename,
+    }
+    for line_edit, value in line_edit_values.items():
+        line_edit.setText(value)
+
+    check_box_values = {
+        main_window.shaperColorSpacesCheckBox: bake_cmd_data.use_shaper_space,
+        main_window.cubeSizeCheckBox: bake_cmd_data.use_cube_size,
+        main_window.shaperSizeCheckBox: bake_cmd_data.use_shaper_size,
+        main_window.iccWhitePointCheckBox: bake_cmd_data.use_icc_white_point,
+        main_window.iccDisplaysCheckBox: bake_cmd_data.use_icc_displays,
+        main_window.iccDescriptionCheckBox: bake_cmd_data.use_icc_description,
+        main_window.iccCopyrightCheckBox: bake_cmd_data.use_icc_copyright,
+        main_window.overrideLutNameCheckBox: bake_cmd_data.use_override_lut_filename,
+    }
+    for check_box, value in check_box_values.items():
+        check_box.setChecked(value)
+    if bake_cmd_data.use_looks:
+        main_window.looksRadioButton.setChecked(True)
+    else:
+        main_window.outputColorSpacesRadioButton.setChecked(True)
+
+    check_for_icc(main_window, main_window.lutFormatComboBox.currentText())
+    check_to_enable_baking(main_window)
+    save_settings(settings, main_window)
+
+
 def get_bake_cmd_data(main_window: QMainWindow) -> tuple:
     lut_field = main_window.lutFormatComboBox.currentText()
     lut_info_match = re.match(LUT_INFO_REGEX, lut_field)
@@ -0,0 +1,273 @@
+"""work_queue submodule of the core module, bakes pulled from a shared directory
+
+Unlike shards, split once ahead of the bakes, the jobs of a queue directory are
+pulled one at a time by any number of workers, processes or render nodes, so
+no node idles while another still has heavy jobs. The directory holds:
+
+    pending/<rank>_<key>.json        jobs waiting, costliest first
+    claimed/<rank>_<key>@<worker>    jobs being baked, its mtime is the lease
+    results/<key>.json               outcome of each job
+
+A worker claims a job by renaming it, only one rename of a file succeeds, and
+renews its lease while it bakes. A lease older than the lease timeout is a dead
+worker's, the next worker looking for a job renames it back to pending. Lease
+ages are measured against the clock of the shared file system.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from functools import partial
+
+from ocio_lut_prescription.core import batch, metrics, resources
+from ocio_lut_prescription.core.preflight import run_preflight
+from ocio_lut_prescription.core.ui import BakeCmdData
+
+PENDING_DIR = "pending"
+CLAIMED_DIR = "claimed"
+RESULTS_DIR = "results"
+QUEUE_INFO_FILENAME = "queue.json"
+CLOCK_FILENAME = ".clock"
+DEFAULT_LEASE_TIMEOUT = 300.0
+POLL_INTERVAL = 1.0
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def write_json(json_path: str, content):
+    """Write a file other workers only ever see complete"""
+    tmp_path = f"{json_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as json_file:
+        json.dump(content, json_file, indent=2)
+    os.replace(tmp_path, json_path)
+
+
+def read_json(json_path: str):
+    with open(json_path, encoding="utf-8") as json_file:
+        return json.load(json_file)
+
+
+def submit_jobs(
+    jobs: list[BakeCmdData],
+    queue_dir: str,
+    lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    preflight: bool = True,
+    auto_cube_tolerance: float | None = None,
+) -> int:
+    """Check the jobs once and queue them, costliest first, return the number
+    of jobs queued"""
+    jobs, cube_size_notes = batch.resolve_cube_sizes(jobs, auto_cube_tolerance)
+    if preflight and jobs:
+        run_preflight(jobs)
+    for directory in (PENDING_DIR, CLAIMED_DIR, RESULTS_DIR):
+        os.makedirs(os.path.join(queue_dir, directory), exist_ok=True)
+    write_json(
+        os.path.join(queue_dir, QUEUE_INFO_FILENAME), {"lease_timeout": lease_timeout}
+    )
+
+    jobs = sorted(jobs, key=batch.estimate_bake_cost, reverse=True)
+    for rank, job in enumerate(jobs):
+        key = batch.get_job_key(job)
+        write_json(
+            os.path.join(queue_dir, PENDING_DIR, f"{rank:06d}_{key}.json"),
+            {"job": asdict(job), "cube_size_note": cube_size_notes.get(key, "")},
+        )
+    return len(jobs)
+
+
+def get_shared_time(queue_dir: str) -> float:
+    """Current time of the file system clock, the clock of the leases"""
+    clock_path = os.path.join(queue_dir, CLOCK_FILENAME)
+    with open(clock_path, "a", encoding="utf-8"):
+        os.utime(clock_path)
+    return os.stat(clock_path).st_mtime
+
+
+def requeue_expired_leases(queue_dir: str, lease_timeout: float) -> list:
+    """Return the jobs of expired leases to the queue, return their names"""
+    claimed_dir = os.path.join(queue_dir, CLAIMED_DIR)
+    now = get_shared_time(queue_dir)
+    requeued = []
+    for claim_name in os.listdir(claimed_dir):
+        claim_path = os.path.join(claimed_dir, claim_name)
+        try:
+            expired = now - os.stat(claim_path).st_mtime > lease_timeout
+            if expired:
+                job_name = claim_name.split("@", 1)[0]
+                os.rename(claim_path, os.path.join(queue_dir, PENDING_DIR, job_name))
+                requeued.append(job_name)
+        except FileNotFoundError:
+            # finished, or requeued by another worker
+            continue
+    return requeued
+
+
+def claim_job(queue_dir: str, worker_id: str) -> str | None:
+    """Claim the costliest pending job, return its claim path"""
+    pending_dir = os.path.join(queue_dir, PENDING_DIR)
+    for job_name in sorted(os.listdir(pending_dir)):
+        if not job_name.endswith(".json"):
+            continue
+        job_path = os.path.join(pending_dir, job_name)
+        claim_path = os.path.join(queue_dir, CLAIMED_DIR, f"{job_name}@{worker_id}")
+        try:
+            # the lease starts fresh, a rename keeps the mtime
+            os.utime(job_path)
+            os.rename(job_path, claim_path)
+        except FileNotFoundError:
+            # claimed by another worker first
+            continue
+        return claim_path
+    return None
+
+
+class LeaseRenewer:
+    """Touch a claim while its job bakes, from a thread"""
+
+    def __init__(self, claim_path: str, interval: float):
+        self.claim_path = claim_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                os.utime(self.claim_path)
+            except FileNotFoundError:
+                # the lease expired, another worker may bake the job again
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        self._thread.join()
+
+
+def bake_claimed_job(
+    queue_dir: str,
+    claim_path: str,
+    lease_timeout: float,
+    limiter: resources.AdaptiveLimiter,
+    on_line: Callable[[str, str, str], None] | None = None,
+) -> tuple:
+    """Bake a claimed job and publish its result, return the job and result. A
+    bake that raises is published as failed"""
+    claim = read_json(claim_path)
+    job = batch.bake_cmd_data_from_dict(claim["job"])
+    start = time.perf_counter()
+    with LeaseRenewer(claim_path, lease_timeout / 3):
+        try:
+            os.makedirs(job.output_dir, exist_ok=True)
+            result = batch.bake(
+                job,
+                limiter,
+                partial(on_line, job.lut_filename) if on_line else None,
+                claim["cube_size_note"],
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            # e.g. an unwritable output directory: the worker goes on, and the
+            # claim is released instead of waiting for its lease to expire
+            result = batch.BakeResult(
+                batch.get_job_key(job),
+                job.lut_filename,
+                1,
+                time.perf_counter() - start,
+                f"{type(err).__name__}: {err}",
+            )
+    write_json(
+        os.path.join(queue_dir, RESULTS_DIR, f"{result.key}.json"), asdict(result)
+    )
+    try:
+        os.remove(claim_path)
+    except FileNotFoundError:
+        pass
+    return job, result
+
+
+def work(
+    queue_dir: str,
+    worker_id: str,
+    limiter: resources.AdaptiveLimiter,
+    on_line: Callable[[str, str, str], None] | None = None,
+) -> list:
+    """Bake jobs until the queue is empty and no lease is left, return the
+    (job, result) of the jobs baked"""
+    lease_timeout = read_json(os.path.join(queue_dir, QUEUE_INFO_FILENAME))[
+        "lease_timeout"
+    ]
+    baked = []
+    while True:
+        requeue_expired_leases(queue_dir, lease_timeout)
+        claim_path = claim_job(queue_dir, worker_id)
+        if claim_path:
+            baked.append(
+                bake_claimed_job(queue_dir, claim_path, lease_timeout, limiter, on_line)
+            )
+        elif os.listdir(os.path.join(queue_dir, CLAIMED_DIR)):
+            # other workers are baking, their jobs come back if they die
+            time.sleep(POLL_INTERVAL)
+        else:
+            return baked
+
+
+def run_worker(
+    queue_dir: str,
+    workers: int = 1,
+    worker_id: str | None = None,
+    on_line: Callable[[str, str, str], None] | None = None,
+) -> list:
+    """Pull and bake jobs of the queue, up to workers at a time, until none is
+    left. The bakes are counted in the metrics of the process"""
+    worker_id = worker_id or get_worker_id()
+    limiter = resources.AdaptiveLimiter(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        baked = [
+            job_result
+            for thread_baked in executor.map(
+                partial(work, queue_dir, limiter=limiter, on_line=on_line),
+                [f"{worker_id}.{index}" for index in range(workers)],
+            )
+            for job_result in thread_baked
+        ]
+    metrics.record_batch([job for job, _ in baked], [result for _, result in baked])
+    return [result for _, result in baked]
+
+
+def gather_results(queue_dir: str, report_path: str) -> tuple:
+    """Write the report of every job baked so far, return the results and the
+    names of the jobs still pending or claimed"""
+    results_dir = os.path.join(queue_dir, RESULTS_DIR)
+    results = [
+        batch.BakeResult(**read_json(os.path.join(results_dir, result_name)))
+        for result_name in sorted(os.listdir(results_dir))
+        if result_name.endswith(".json")
+    ]
+    unfinished = sorted(
+        name
+        for directory in (PENDING_DIR, CLAIMED_DIR)
+        for name in os.listdir(os.path.join(queue_dir, directory))
+        if not name.endswith(".tmp")
+    )
+    write_json(
+        report_path,
+        {
+            "jobs": len(results),
+            "failed": sum(not result.ok for result in results),
+            "unfinished": unfinished,
+            "results": [asdict(result) for result in results],
+        },
+    )
+    return results, unfinished
@@ -3,7 +3,7 @@ from setuptools import setup, find_packages
 with open('README.md') as readme_file:
     readme = readme_file.read()
 
-requirements = ['PySide2', 'opencolorio>=2', ]
+requirements = ['PySide2', 'opencolorio>=2', 'numpy', ]
 
 setup_requirements = ['pytest-runner', ]
 
@@ -30,6 +30,7 @@ setup(
     entry_points={
         'console_scripts': [
             'ocio-lut-prescription=ocio_lut_prescription.__main__:main',
+            'ocio-lut-prescription-batch=ocio_lut_prescription.cli:main',
         ],
     },
     install_requires=requirements,
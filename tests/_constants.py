@@ -1,4 +1,6 @@
-"""constants used for tests"""
+"""constants and job factory used for tests"""
+from ocio_lut_prescription.core import batch
+from ocio_lut_prescription.core.ui import BakeCmdData
 
 BAKE_TEMPLATES = {
     "default": {
@@ -324,3 +326,38 @@ Executed command: ociobakelut --iconfig /path/to/test/config.ocio --inputspace t
 --------------------------------------------""",
     },
 }
+
+# minimal valid config, a gamma 2.2 encoding of a linear colorspace
+TEST_CONFIG = """ocio_profile_version: 2
+roles:
+  default: linear
+displays:
+  monitor:
+    - !<View> {name: gamma, colorspace: gamma}
+colorspaces:
+  - !<ColorSpace>
+    name: linear
+  - !<ColorSpace>
+    name: gamma
+    from_scene_reference: !<ExponentTransform> {value: 2.2, direction: inverse}
+"""
+
+
+def make_job(tmp_path, **overrides) -> BakeCmdData:
+    """Job of the linear to gamma transform of TEST_CONFIG, written to
+    tmp_path once, baked to a 5 points spi3d in tmp_path, any manifest field
+    overridden"""
+    config_path = tmp_path / "config.ocio"
+    if not config_path.exists():
+        config_path.write_text(TEST_CONFIG)
+    return batch.bake_cmd_data_from_dict(
+        {
+            "ocio_config": str(config_path),
+            "input_space": "linear",
+            "output_space": "gamma",
+            "cube_size": 5,
+            "lut_format": "spi3d",
+            "output_dir": str(tmp_path),
+            **overrides,
+        }
+    )
@@ -0,0 +1,120 @@
+# pylint: disable=c-extension-no-member
+"""synthetic ocio configs of arbitrary size, to reproduce the load of
+production configs in tests
+
+python -m tests._synthetic_config <directory> --colorspaces 10000 writes one
+to profile the application by hand.
+"""
+import argparse
+import os
+
+import PyOpenColorIO as OCIO
+
+LUT_DIR_NAME = "luts"
+LUT_LENGTH = 1024
+FAMILY_COUNT = 50
+
+
+def write_spi1d(lut_path: str, gamma: float):
+    values = "\n".join(
+        f"{(index / (LUT_LENGTH - 1)) ** gamma:.6f}" for index in range(LUT_LENGTH)
+    )
+    with open(lut_path, "w", encoding="utf-8") as lut_file:
+        lut_file.write(
+            f"Version 1\nFrom 0.0 1.0\nLength {LUT_LENGTH}\nComponents 1\n{{\n"
+            f"{values}\n}}\n"
+        )
+
+
+def get_colorspace_transform(index: int, lut_dir: str, file_transforms: int):
+    """A file transform for the first colorspaces, then alternating analytic
+    transforms"""
+    if index < file_transforms:
+        lut_name = f"lut_{index:05d}.spi1d"
+        write_spi1d(os.path.join(lut_dir, lut_name), 1.0 + index / file_transforms)
+        return OCIO.FileTransform(src=lut_name, interpolation=OCIO.INTERP_LINEAR)
+    if index % 3 == 0:
+        return OCIO.ExponentTransform(value=[2.2 + index % 10 / 10] * 3 + [1.0])
+    if index % 3 == 1:
+        scale = 1.0 + index % 7 / 10
+        return OCIO.MatrixTransform(
+            matrix=[scale, 0, 0, 0, 0, scale, 0, 0, 0, 0, scale, 0, 0, 0, 0, 1]
+        )
+    return OCIO.CDLTransform(slope=[1.0, 1.0 + index % 5 / 10, 1.0], power=[1.1] * 3)
+
+
+def write_synthetic_config(  # pylint: disable=too-many-arguments
+    directory: str,
+    colorspaces: int = 2000,
+    looks: int = 200,
+    displays: int = 20,
+    views: int = 10,
+    file_transforms: int = 100,
+) -> str:
+    """Write a valid config with that many colorspaces, looks, displays and
+    views per display, and its luts, return the config path"""
+    lut_dir = os.path.join(directory, LUT_DIR_NAME)
+    os.makedirs(lut_dir, exist_ok=True)
+
+    config = OCIO.Config.CreateRaw()
+    config.setSearchPath(LUT_DIR_NAME)
+    config.setWorkingDir(directory)
+
+    colorspace_names = [f"colorspace_{index:05d}" for index in range(colorspaces)]
+    for index, name in enumerate(colorspace_names):
+        colorspace = OCIO.ColorSpace(
+            name=name, family=f"synthetic/family_{index % FAMILY_COUNT:02d}"
+        )
+        colorspace.setTransform(
+            get_colorspace_transform(index, lut_dir, file_transforms),
+            OCIO.COLORSPACE_DIR_FROM_REFERENCE,
+        )
+        config.addColorSpace(colorspace)
+
+    for index in range(looks):
+        config.addLook(
+            OCIO.Look(
+                name=f"look_{index:04d}",
+                processSpace=colorspace_names[index % colorspaces],
+                transform=OCIO.CDLTransform(slope=[1.0 + index % 9 / 100] * 3),
+            )
+        )
+
+    for display_index in range(displays):
+        for view_index in range(views):
+            config.addDisplayView(
+                f"display_{display_index:03d}",
+                f"view_{view_index:03d}",
+                colorspace_names[(display_index * views + view_index) % colorspaces],
+            )
+    config.setRole(OCIO.ROLE_SCENE_LINEAR, colorspace_names[0])
+    config.validate()
+
+    config_path = os.path.join(directory, "config.ocio")
+    config.serialize(config_path)
+    return config_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="directory receiving the config and luts")
+    parser.add_argument("--colorspaces", type=int, default=2000)
+    parser.add_argument("--looks", type=int, default=200)
+    parser.add_argument("--displays", type=int, default=20)
+    parser.add_argument("--views", type=int, default=10)
+    parser.add_argument("--file-transforms", type=int, default=100)
+    args = parser.parse_args()
+    print(
+        write_synthetic_config(
+            args.directory,
+            args.colorspaces,
+            args.looks,
+            args.displays,
+            args.views,
+            args.file_transforms,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# pylint: disable=no-name-in-module
+"""bake queue related tests, on an offscreen Qt platform
+"""
+import os
+import shutil
+import time
+
+import pytest
+from PySide2.QtCore import QThreadPool
+from PySide2.QtUiTools import QUiLoader
+from PySide2.QtWidgets import QApplication
+
+from ocio_lut_prescription.core import bake_queue, ui
+from tests._constants import make_job
+
+MAIN_WINDOW_UI = os.path.join(
+    os.path.dirname(ui.__file__), os.pardir, "ui", "main_window.ui"
+)
+
+
+@pytest.fixture(name="main_window")
+def fixture_main_window():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    qt_app = QApplication.instance() or QApplication([])
+    main_window = QUiLoader().load(MAIN_WINDOW_UI)
+    bake_queue.initialize_bake_queue(main_window, workers=2)
+    yield main_window
+    QThreadPool.globalInstance().waitForDone()
+    main_window.deleteLater()
+    qt_app.processEvents()
+
+
+def wait_for_queue(main_window, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while main_window.bake_queue_running and time.monotonic() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.01)
+
+
+@pytest.mark.skipif(shutil.which("ociobakelut") is None, reason="needs ociobakelut")
+def test_bake_queue(tmp_path, main_window):
+    """Queued bakes run in parallel, rows are reordered, removed and retried"""
+    for input_space in ("linear", "missing", "gamma"):
+        bake_queue.add_to_queue(
+            main_window,
+            make_job(
+                tmp_path,
+                input_space=input_space,
+                output_space="linear" if input_space == "gamma" else "gamma",
+            ),
+        )
+    rows = list(main_window.bake_queue)
+    table = main_window.queueTableWidget
+    assert table.rowCount() == 3
+
+    table.selectRow(2)
+    bake_queue.move_selected_rows(main_window, -1)
+    assert main_window.bake_queue == [rows[0], rows[2], rows[1]]
+    assert bake_queue.get_selected_indices(main_window) == [1]
+
+    bake_queue.run_queue(main_window)
+    assert [row.status for row in main_window.bake_queue] == [
+        bake_queue.RUNNING,
+        bake_queue.RUNNING,
+        bake_queue.QUEUED,
+    ]
+    wait_for_queue(main_window)
+    assert [row.status for row in rows] == [
+        bake_queue.DONE,
+        bake_queue.FAILED,
+        bake_queue.DONE,
+    ]
+    assert os.path.isfile(rows[0].bake_cmd_data.lut_filename)
+    assert table.item(1, 4).text() == rows[2].bake_cmd_data.lut_filename
+
+    bake_queue.retry_failed_rows(main_window)
+    assert rows[1].status == bake_queue.RUNNING
+    wait_for_queue(main_window)
+    assert rows[1].status == bake_queue.FAILED
+
+    table.selectRow(2)
+    bake_queue.remove_selected_rows(main_window)
+    assert main_window.bake_queue == rows[::2]
+    assert table.rowCount() == 2
+
+
+def test_cube_size_worker(tmp_path):
+    """An "auto" cube size is resolved by a worker, its note reported"""
+    worker = bake_queue.CubeSizeWorker(make_job(tmp_path, cube_size="auto"))
+    resolved = []
+    worker.signals.resolved.connect(lambda *args: resolved.append(args))
+    worker.run()
+    bake_cmd_data, cube_size_note = resolved[0]
+    assert bake_cmd_data.cube_size.isdigit()
+    assert cube_size_note.startswith("auto, max interpolation error")
+
+
+@pytest.mark.skipif(shutil.which("ociobakelut") is None, reason="needs ociobakelut")
+def test_queue_auto_cube_size(tmp_path, main_window):
+    """An "auto" cube size is resolved in the background, then baked"""
+    bake_queue.add_to_queue(main_window, make_job(tmp_path, cube_size="auto"))
+    bake_queue.run_queue(main_window)
+    row = main_window.bake_queue[0]
+    assert row.status == bake_queue.RESOLVING
+    assert main_window.bake_queue_running
+    # a row resolving is not removed, its worker still runs
+    main_window.queueTableWidget.selectRow(0)
+    bake_queue.remove_selected_rows(main_window)
+    assert main_window.bake_queue == [row]
+
+    wait_for_queue(main_window)
+    assert row.status == bake_queue.DONE
+    assert row.cube_size_note.startswith("auto, max interpolation error")
+    assert row.bake_cmd_data.lut_filename.endswith(
+        f"_c{row.bake_cmd_data.cube_size}.spi3d"
+    )
+    assert os.path.isfile(row.bake_cmd_data.lut_filename)
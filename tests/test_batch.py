@@ -0,0 +1,461 @@
+"""batch and preflight related tests
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from ocio_lut_prescription.core import (
+    batch,
+    engine,
+    journal,
+    prefetch,
+    preflight,
+    resources,
+    shard,
+    stream,
+)
+from tests._constants import TEST_CONFIG, make_job
+from tests._synthetic_config import LUT_DIR_NAME, write_synthetic_config
+
+
+def test_manifest_record_defaults():
+    """use_* flags follow the fields set by the record, filename is generated"""
+    bake_cmd_data = batch.bake_cmd_data_from_dict(
+        {
+            "ocio_config": "/path/to/test/config.ocio",
+            "input_space": "test_input_space",
+            "output_space": "test_output_space",
+            "cube_size": 17,
+            "lut_format": "flame",
+            "output_dir": "/var/tmp",
+        }
+    )
+    assert bake_cmd_data.use_output_space
+    assert bake_cmd_data.use_cube_size
+    assert not bake_cmd_data.use_shaper_size
+    assert not bake_cmd_data.use_looks
+    assert bake_cmd_data.cube_size == "17"
+    assert bake_cmd_data.lut_ext == "3dl"
+    assert (
+        bake_cmd_data.lut_filename
+        == "/var/tmp/test_input_space_to_test_output_space_c17.3dl"
+    )
+
+
+def test_manifest_roundtrip(tmp_path):
+    """A written manifest loads back to the same jobs, with the same keys"""
+    jobs = [
+        batch.bake_cmd_data_from_dict(
+            {"input_space": "a", "output_space": name, "output_dir": "/var/tmp"}
+        )
+        for name in ("b", "c")
+    ]
+    manifest_path = str(tmp_path / "manifest.json")
+    batch.write_manifest(manifest_path, jobs)
+    loaded_jobs = batch.load_manifest(manifest_path)
+    assert loaded_jobs == jobs
+    assert [batch.get_job_key(job) for job in loaded_jobs] == [
+        batch.get_job_key(job) for job in jobs
+    ]
+
+
+def test_lut_formats_fan_out(tmp_path):
+    """A prescription listing formats is evaluated once for all of them"""
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text(TEST_CONFIG)
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            [
+                {
+                    "ocio_config": str(config_path),
+                    "input_space": "linear",
+                    "output_space": "gamma",
+                    "cube_size": 5,
+                    "lut_formats": ["iridas_cube", "spi3d", "cinespace"],
+                    "output_dir": str(tmp_path),
+                }
+            ]
+        )
+    )
+    jobs = batch.load_manifest(str(manifest_path))
+    assert [job.lut_filename for job in jobs] == [
+        str(tmp_path / f"linear_to_gamma_c5.{ext}") for ext in ("cube", "spi3d", "csp")
+    ]
+
+    results = batch.run_batch(jobs, in_process=True)
+    assert all(result.ok for result in results)
+    assert all("lattice shared by 3 LUTs" in result.log for result in results)
+    cube_lines = (tmp_path / "linear_to_gamma_c5.cube").read_text().splitlines()
+    assert cube_lines[0] == "LUT_3D_SIZE 5"
+    assert cube_lines[2] == f"{0.25 ** (1 / 2.2):.6f} 0.000000 0.000000"
+
+
+def test_derive_cube_sizes(tmp_path):
+    """Smaller cubes are resampled from the largest one, within the tolerance"""
+    identity = engine.get_identity_lattice(9)
+    assert (
+        abs(
+            engine.resample_lattice(identity, 9, 4) - engine.get_identity_lattice(4)
+        ).max()
+        < 1e-6
+    )
+    # the errors of larger lattices are measured on a sample of their nodes
+    assert engine.get_error_label(9) == "max error"
+    assert engine.get_error_label(17) == "max error on 9^3 sampled nodes"
+
+    jobs = [
+        make_job(tmp_path, cube_size=cube_size, lut_format="resolve_cube")
+        for cube_size in (9, 5, 4)
+    ]
+    notes = engine.bake_transform_group(jobs, resample_tolerance=1e-4)
+    # the nodes of the 5 points cube are nodes of the 9 points one
+    assert "resampled from 9, max error 0" in notes[5]
+    assert "exceeds" in notes[4]
+    assert (tmp_path / "linear_to_gamma_c4.cube").read_text().splitlines()[2] == (
+        f"{(1 / 3) ** (1 / 2.2):.6f} 0.000000 0.000000"
+    )
+
+
+def test_share_input_lattice(tmp_path):
+    """Output spaces of an input share its conversion to the reference space,
+    with the values of independent bakes"""
+
+    def get_jobs(share_input: bool) -> list:
+        return [
+            make_job(
+                tmp_path,
+                input_space="gamma",
+                output_space=output_space,
+                cube_size=9,
+                output_dir=str(tmp_path / str(share_input)),
+            )
+            for output_space in ("linear", "gamma")
+        ]
+
+    batch.run_batch(get_jobs(False), in_process=True)
+    results = batch.run_batch(get_jobs(True), in_process=True, share_input=True)
+    assert all("from the shared input lattice" in result.log for result in results)
+
+    for shared_job, job in zip(get_jobs(True), get_jobs(False)):
+        with open(shared_job.lut_filename, encoding="utf-8") as lut_file:
+            shared_lines = lut_file.readlines()
+        with open(job.lut_filename, encoding="utf-8") as lut_file:
+            lines = lut_file.readlines()
+        assert shared_lines[:3] == lines[:3]
+        assert np.allclose(
+            np.loadtxt(shared_lines[3:]), np.loadtxt(lines[3:]), rtol=0, atol=1e-5
+        )
+
+
+def test_split_edited_config(tmp_path):
+    """The halves of a transform follow an edited config"""
+    job = make_job(tmp_path, input_space="gamma", output_space="linear")
+    config_path = tmp_path / "config.ocio"
+    engine.get_split_cpu_processors(job)
+
+    config_path.write_text(TEST_CONFIG.replace("value: 2.2", "value: 2.4"))
+    pixel = np.full(3, 0.5, dtype=np.float32)
+    for cpu_processor in engine.get_split_cpu_processors(job):
+        cpu_processor.applyRGB(pixel)
+    assert pixel[0] == pytest.approx(0.5**2.4, abs=1e-4)
+
+
+def test_auto_cube_size(tmp_path):
+    """A cube size within the tolerance is baked and reported, the smallest
+    one for an error decreasing with the size"""
+    job = make_job(
+        tmp_path, input_space="gamma", output_space="linear", cube_size="auto"
+    )
+    cube_size, error = engine.search_cube_size(engine.get_transform_key(job), 1e-3)
+    assert error <= 1e-3
+    # the sample of the search
+    points = np.random.default_rng(0).random(
+        (engine.AUTO_CUBE_SAMPLES, 3), dtype=np.float32
+    )
+    cpu_processor = engine.get_cpu_processor(job)
+    expected = points.copy()
+    cpu_processor.applyRGB(expected)
+    assert (
+        engine.measure_interpolation_error(
+            cpu_processor, cube_size - 1, points, expected
+        )
+        > 1e-3
+    )
+
+    (result,) = batch.run_batch([job], in_process=True, auto_cube_tolerance=1e-3)
+    assert result.lut_filename == str(tmp_path / f"gamma_to_linear_c{cube_size}.spi3d")
+    assert f"Cube Size: {cube_size} (auto, max interpolation error" in result.log
+
+
+def test_auto_cube_size_edited_config(tmp_path):
+    """The size of an edited config is searched again"""
+    job = make_job(
+        tmp_path, input_space="gamma", output_space="linear", cube_size="auto"
+    )
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text(TEST_CONFIG.replace("value: 2.2", "value: 1.0"))
+    identity_job, _ = engine.resolve_cube_size(job, 1e-3)
+    assert identity_job.cube_size == "2"
+
+    config_path.write_text(TEST_CONFIG)
+    gamma_job, note = engine.resolve_cube_size(job, 1e-3)
+    assert int(gamma_job.cube_size) > 2
+    assert note.endswith("within 0.001")
+
+
+def test_prefetch_job_files(tmp_path):
+    """Only the files of the job transforms are read, missing ones reported"""
+    config_path = write_synthetic_config(
+        str(tmp_path), colorspaces=20, looks=5, displays=1, views=1, file_transforms=10
+    )
+    (tmp_path / LUT_DIR_NAME / "lut_00004.spi1d").unlink()
+    jobs = [
+        batch.bake_cmd_data_from_dict(
+            {
+                "ocio_config": config_path,
+                "input_space": input_space,
+                "output_space": "colorspace_00001",
+                "looks": "look_0002",
+            }
+        )
+        for input_space in ("colorspace_00000", "colorspace_00004", "colorspace_00015")
+    ]
+
+    report = prefetch.prefetch_jobs(jobs)
+    lut_names = ("lut_00000.spi1d", "lut_00001.spi1d", "lut_00002.spi1d")
+    assert report.files == len(lut_names)
+    assert report.bytes_read == sum(
+        (tmp_path / LUT_DIR_NAME / lut_name).stat().st_size for lut_name in lut_names
+    )
+    assert report.missing == ["lut_00004.spi1d"]
+
+
+def test_look_names():
+    """Look names are extracted from an OCIO looks string"""
+    assert preflight.get_look_names("+grade, -neutral:film") == [
+        "grade",
+        "neutral",
+        "film",
+    ]
+
+
+def test_config_labels():
+    """Configs sharing a file name are told apart by their directories"""
+    assert batch.get_config_labels(["/show/v001/config.ocio"]) == ["config"]
+    assert batch.get_config_labels(
+        ["/show/v001/config.ocio", "/show/v002/config.ocio"]
+    ) == ["v001_config", "v002_config"]
+    assert batch.get_config_labels(
+        ["/show/v1/config.ocio", "/show/v1/config.ocio"]
+    ) == ["config", "config_2"]
+    assert batch.get_config_labels(
+        ["/show/v1/config.ocio", "/show/v1_config.ocio"]
+    ) == ["v1_config", "v1_config_2"]
+
+
+def test_multi_config_refuses_duplicate_lut_names(tmp_path):
+    """LUTs of different directories sharing a file name are refused, they
+    would overwrite each other in the directory of a config"""
+    jobs = [
+        batch.bake_cmd_data_from_dict(
+            {"input_space": "a", "output_space": "b", "output_dir": output_dir}
+        )
+        for output_dir in ("/show/luts/a", "/show/luts/b", "/show/luts/b")
+    ]
+    assert batch.get_duplicate_lut_names(jobs) == ["a_to_b.csp"]
+    with pytest.raises(ValueError, match="a_to_b.csp"):
+        batch.run_multi_config(jobs, ["/show/config.ocio"], str(tmp_path))
+    assert not batch.get_duplicate_lut_names(jobs[1:])
+
+
+def test_split_jobs_by_cost():
+    """Shards are balanced by cost, and the split is reproducible"""
+    jobs = [
+        batch.bake_cmd_data_from_dict(
+            {
+                "input_space": "a",
+                "output_space": f"output_{index}",
+                "cube_size": size,
+                "output_dir": "/var/tmp",
+            }
+        )
+        for index, size in enumerate([65, 65, 17, 17, 17, 17, 33, 33])
+    ]
+    shards = shard.split_jobs(jobs, 2)
+    assert shards == shard.split_jobs(list(reversed(jobs)), 2)
+    assert sorted(len(shard_jobs) for shard_jobs in shards) == [4, 4]
+    assert [
+        sorted(int(job.cube_size) for job in shard_jobs) for shard_jobs in shards
+    ] == [[17, 17, 33, 65], [17, 17, 33, 65]]
+
+
+def test_split_bake_merge(tmp_path, monkeypatch):
+    """Shards baked from another directory are merged to their destinations,
+    the shards of a previous split are gone"""
+    jobs = [
+        make_job(
+            tmp_path,
+            cube_size=cube_size,
+            output_dir=str(tmp_path / "luts" / f"c{cube_size}"),
+        )
+        for cube_size in (3, 5, 9)
+    ]
+    monkeypatch.chdir(tmp_path)
+    shard.write_shards(jobs, 3, "shards")
+    shard_dirs = shard.write_shards(jobs, 2, "shards")
+    assert sorted(os.listdir(tmp_path / "shards")) == ["shard_000", "shard_001"]
+
+    node_dir = tmp_path / "node"
+    node_dir.mkdir()
+    monkeypatch.chdir(node_dir)
+    for shard_dir in shard_dirs:
+        results = batch.run_batch(
+            batch.load_manifest(os.path.join(shard_dir, shard.MANIFEST_FILENAME)),
+            in_process=True,
+        )
+        batch.write_report(os.path.join(shard_dir, shard.REPORT_FILENAME), results)
+    assert not os.listdir(node_dir)
+
+    results, missing_shards = shard.merge_shards(
+        shard_dirs, str(tmp_path / "report.json")
+    )
+    assert not missing_shards
+    assert sorted(result.lut_filename for result in results) == sorted(
+        job.lut_filename for job in jobs
+    )
+    assert all(result.ok for result in results)
+    assert all(os.path.isfile(job.lut_filename) for job in jobs)
+
+
+def test_adaptive_limiter_memory(monkeypatch):
+    """A bake only starts next to others when its expected memory fits"""
+    monkeypatch.setattr(
+        resources,
+        "read_meminfo",
+        lambda: {"MemTotal": 8 * 1024**3, "MemAvailable": 2.5 * 1024**3},
+    )
+    limiter = resources.AdaptiveLimiter(max_workers=8)
+    limiter.cpu_count = 8
+    limiter.bytes_per_cost = 1024.0
+
+    token = limiter.acquire(1_000_000)
+    assert limiter.can_start(100_000)
+    assert not limiter.can_start(1_000_000)
+
+    # a lighter than expected bake lets larger ones run side by side
+    limiter.release(token, peak_rss=100 * 1024**2, cpu_ratio=1.0)
+    limiter.acquire(1_000_000)
+    assert limiter.can_start(1_000_000)
+
+
+def test_journal_resume(tmp_path):
+    """Only journaled, unchanged, outputs count as completed"""
+    lut_path = tmp_path / "lut.csp"
+    lut_path.write_text("CSPLUTV100")
+    journal_path = str(tmp_path / "manifest.json.journal")
+    bake_journal = journal.Journal(journal_path)
+    bake_journal.record("baked", str(lut_path), True, 1.0)
+    bake_journal.record("failed", str(tmp_path / "failed.csp"), False, 1.0)
+    with open(journal_path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"key": "interrup')
+
+    records = journal.read_journal(journal_path)
+    assert sorted(records) == ["baked", "failed"]
+    assert journal.is_completed(records["baked"])
+    assert not journal.is_completed(records["failed"])
+    assert not journal.is_completed(records.get("never_baked"))
+
+    lut_path.write_text("CSPLUTV100\n3D")
+    assert not journal.is_completed(records["baked"])
+
+
+def test_resume_after_truncated_journal(tmp_path):
+    """A record appended after a crash truncated the journal mid-line is kept,
+    the next resume skips its job"""
+    jobs = [
+        make_job(tmp_path, cube_size=cube_size, output_dir=str(tmp_path / "luts"))
+        for cube_size in (3, 5)
+    ]
+    journal_path = str(tmp_path / "manifest.json.journal")
+    batch.run_batch(
+        jobs[:1], preflight=False, journal_path=journal_path, in_process=True
+    )
+    with open(journal_path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"key": "interrup')
+
+    results = batch.run_batch(
+        jobs, preflight=False, journal_path=journal_path, resume=True, in_process=True
+    )
+    assert [result.resumed for result in results] == [True, False]
+    results = batch.run_batch(
+        jobs, preflight=False, journal_path=journal_path, resume=True, in_process=True
+    )
+    assert [result.resumed for result in results] == [True, True]
+
+
+def test_run_streamed_keeps_tail():
+    """Every line is streamed, only the last ones are kept"""
+    streamed = []
+    returncode, tail = stream.run_streamed(
+        [sys.executable, "-c", "for i in range(100): print(i)"],
+        on_line=lambda name, line: streamed.append((name, line)),
+        max_lines=3,
+    )
+    assert returncode == 0
+    assert tail == ["97", "98", "99"]
+    assert streamed[0] == ("stdout", "0")
+    assert len(streamed) == 100
+
+
+def test_missing_ociobakelut_fails_job(tmp_path):
+    """A bake whose ociobakelut cannot start fails, and is journaled, the
+    batch goes on"""
+    job = batch.bake_cmd_data_from_dict(
+        {
+            "ociobakelut_bin": str(tmp_path / "missing" / "ociobakelut"),
+            "input_space": "linear",
+            "output_dir": str(tmp_path / "luts"),
+        }
+    )
+    journal_path = str(tmp_path / "manifest.json.journal")
+    [result] = batch.run_batch([job], preflight=False, journal_path=journal_path)
+    assert result.returncode == batch.SPAWN_ERROR_RETURNCODE
+    assert "Cannot run" in result.log
+    assert journal.read_journal(journal_path)[result.key]["status"] == "error"
+
+
+def test_invalid_cube_size_fails_job(tmp_path, monkeypatch):
+    """A cube size no lattice has is refused by the preflight and left to
+    ociobakelut, a group failing in process fails its jobs only"""
+    jobs = [
+        make_job(
+            tmp_path,
+            output_space=output_space,
+            cube_size=cube_size,
+            output_dir=str(tmp_path / "luts"),
+        )
+        for output_space, cube_size in (("gamma", 1), ("linear", 5))
+    ]
+    assert engine.get_size_errors(jobs[0]) == [
+        "invalid cube size: 1, at least 2 expected"
+    ]
+    assert not engine.can_bake_in_process(jobs[0])
+    with pytest.raises(preflight.PreflightError, match="invalid cube size: 1"):
+        preflight.run_preflight(jobs)
+
+    def fail_gamma_group(group_jobs, *_):
+        if group_jobs[0].output_space == "gamma":
+            raise ZeroDivisionError("float division by zero")
+        return bake_input_group(group_jobs, *_)
+
+    bake_input_group = engine.bake_input_group
+    monkeypatch.setattr(engine, "bake_input_group", fail_gamma_group)
+    jobs[0] = make_job(tmp_path, cube_size=3, output_dir=str(tmp_path / "luts"))
+    failed, baked = batch.run_batch(jobs, preflight=False, in_process=True)
+    assert not failed.ok
+    assert failed.log.startswith("ZeroDivisionError")
+    assert baked.ok
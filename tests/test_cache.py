@@ -0,0 +1,40 @@
+"""on-disk cache related tests
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from ocio_lut_prescription.core import cache
+
+
+def test_cache_roundtrip(tmp_path, monkeypatch):
+    """An entry written under a key is read back, other keys miss"""
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path))
+    cache.write_cache("test", "key", {"colorspaces": ["a", "b"]})
+    assert cache.read_cache("test", "key") == {"colorspaces": ["a", "b"]}
+    assert cache.read_cache("test", "other_key") is None
+
+
+def test_concurrent_writes(tmp_path, monkeypatch):
+    """Threads writing the same key leave a whole entry and no temp file"""
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path))
+    entries = [{"colorspaces": [str(index)] * 10_000} for index in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        for _ in range(10):
+            list(
+                executor.map(
+                    lambda entry: cache.write_cache("test", "key", entry), entries
+                )
+            )
+    assert cache.read_cache("test", "key") in entries
+    assert [path.name for path in (tmp_path / "test").iterdir()] == ["key.json"]
+
+
+def test_file_hash_follows_content(tmp_path):
+    """The hash changes with the file content and with the salt"""
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text("ocio_profile_version: 2")
+    first_hash = cache.get_file_hash(str(config_path))
+    assert first_hash == cache.get_file_hash(str(config_path))
+    assert first_hash != cache.get_file_hash(str(config_path), "2.1.0")
+
+    config_path.write_text("ocio_profile_version: 2.1")
+    assert first_hash != cache.get_file_hash(str(config_path))
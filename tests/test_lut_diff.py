@@ -0,0 +1,96 @@
+"""LUT directories diff related tests
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ocio_lut_prescription.core import batch, engine, lut_diff, lut_formats
+from tests._constants import TEST_CONFIG, make_job
+
+CUBE_SIZE = 5
+DELTA = 0.01
+
+
+@pytest.mark.parametrize("lut_format", sorted(lut_formats.WRITERS))
+def test_parsers_measure_deltas(tmp_path, lut_format: str):
+    """The values of every format written are parsed, a single changed node is
+    measured"""
+    lattice = engine.get_identity_lattice(CUBE_SIZE) * np.float32(0.5)
+    changed_lattice = lattice.copy()
+    changed_lattice[7, 1] += np.float32(DELTA)
+    lut_name = f"lut.{batch.LUT_FORMAT_EXTENSIONS[lut_format]}"
+    old_path, new_path = str(tmp_path / f"old_{lut_name}"), str(tmp_path / lut_name)
+    lut_formats.write_lut(old_path, lut_format, lattice, CUBE_SIZE)
+    lut_formats.write_lut(new_path, lut_format, changed_lattice, CUBE_SIZE)
+
+    diff = lut_diff.diff_luts(lut_name, old_path, new_path)
+    assert diff.status == lut_diff.CHANGED
+    # the integer formats round to 12 bit code values
+    assert diff.max_delta == pytest.approx(
+        DELTA, abs=1.0 / lut_formats.OUTPUT_BIT_DEPTH
+    )
+    assert diff.values >= lattice.size
+    assert diff.p99_delta <= diff.max_delta
+    assert diff.mean_delta == pytest.approx(diff.max_delta / diff.values, rel=0.01)
+
+
+def test_diff_directories(tmp_path):
+    """LUTs baked with two configs are paired by name, the changed ones are
+    reported first by their largest difference"""
+    lut_dirs = {}
+    for name, config, output_spaces in (
+        ("old", TEST_CONFIG, ("linear", "gamma", "missing")),
+        ("new", TEST_CONFIG.replace("2.2", "2.4"), ("linear", "gamma", "added")),
+    ):
+        config_dir = tmp_path / f"{name}_config"
+        config_dir.mkdir()
+        (config_dir / "config.ocio").write_text(config)
+        lut_dirs[name] = str(tmp_path / name)
+        os.makedirs(lut_dirs[name])
+        for output_space in output_spaces:
+            job = make_job(
+                config_dir,
+                output_space=output_space,
+                cube_size=CUBE_SIZE,
+                output_dir=lut_dirs[name],
+            )
+            if output_space in {"missing", "added"}:
+                with open(job.lut_filename, "w", encoding="utf-8"):
+                    pass
+            else:
+                engine.bake_transform_group([job])
+
+    diffs = lut_diff.diff_directories(lut_dirs["old"], lut_dirs["new"], workers=2)
+    statuses = {diff.name: diff.status for diff in diffs}
+    assert statuses == {
+        "linear_to_linear_c5.spi3d": lut_diff.UNCHANGED,
+        "linear_to_gamma_c5.spi3d": lut_diff.CHANGED,
+        "linear_to_missing_c5.spi3d": lut_diff.REMOVED,
+        "linear_to_added_c5.spi3d": lut_diff.ADDED,
+    }
+
+    report_path = tmp_path / "diff.json"
+    significant = lut_diff.write_diff_report(str(report_path), diffs)
+    assert [diff.name for diff in significant] == [
+        "linear_to_added_c5.spi3d",
+        "linear_to_missing_c5.spi3d",
+        "linear_to_gamma_c5.spi3d",
+    ]
+    changed = significant[-1]
+    # the largest difference is at the 0.25 nodes
+    assert changed.max_delta == pytest.approx(
+        0.25 ** (1 / 2.4) - 0.25 ** (1 / 2.2), abs=1e-5
+    )
+    assert 0 < changed.mean_delta < changed.p99_delta <= changed.max_delta
+    report = json.loads(report_path.read_text())
+    assert report["statuses"][lut_diff.UNCHANGED] == 1
+    assert len(report["significant"]) == 3
+
+    # a LUT of a manifest baked by neither run
+    missing = lut_diff.diff_directories(
+        lut_dirs["old"], lut_dirs["new"], ["linear_to_gamma_c9.spi3d"]
+    )
+    assert missing == [lut_diff.LutDiff("linear_to_gamma_c9.spi3d", lut_diff.MISSING)]
+    assert missing[0].is_significant(lut_diff.DEFAULT_THRESHOLD)
@@ -0,0 +1,103 @@
+"""LUT file writers related tests
+"""
+import shutil
+import subprocess
+from dataclasses import replace
+
+import numpy as np
+import PyOpenColorIO as OCIO
+import pytest
+
+from ocio_lut_prescription import core
+from ocio_lut_prescription.core import engine, lut_formats
+from tests._constants import TEST_CONFIG, make_job
+
+# negative and above 1 values, clipped by the integer formats
+WIDE_GAMUT_CONFIG = (
+    TEST_CONFIG
+    + """  - !<ColorSpace>
+    name: wide
+    from_scene_reference: !<MatrixTransform> {matrix: [1.2, -0.1, -0.1, 0, -0.05, 1.1, -0.05, 0, 0.3, -0.2, 0.9, 0, 0, 0, 0, 1]}
+"""
+)
+
+
+def test_format_table():
+    """Tables formatted at once match the formatting of each value"""
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 2**32, 30000, dtype=np.uint64)
+    values = values.astype(np.uint32).view(np.float32)
+    values = values[np.isfinite(values) & (np.abs(values) < 2**32)]
+    specials = [0.0, -0.0, 1 / 128, -3 / 128, 5e-7, 0.9999995, -1e-9, 2**31]
+    values = np.concatenate([np.float32(specials), values])
+    values = values[: len(values) // 2 * 2].reshape(-1, 2)
+    indices = np.arange(len(values))
+
+    expected = "".join(
+        f"\t{i} {a:.6f} {b:.6f}\n" for i, (a, b) in enumerate(values.tolist())
+    )
+    columns = [indices, values[:, 0], values[:, 1]]
+    assert lut_formats.format_table(columns, prefix="\t") == expected
+
+    values[1, 1] = np.nan
+    values[2, 0] = -np.inf
+    assert lut_formats.format_rgb_lines(values[:3, [0, 1, 1]]) == "".join(
+        f"{a:.6f} {b:.6f} {b:.6f}\n" for a, b in values[:3].tolist()
+    )
+
+
+@pytest.mark.skipif(shutil.which("ociobakelut") is None, reason="needs ociobakelut")
+@pytest.mark.parametrize("lut_format", sorted(lut_formats.WRITERS))
+def test_writers_match_ociobakelut(tmp_path, lut_format: str):
+    """In process bakes write the bytes ociobakelut writes"""
+    (tmp_path / "config.ocio").write_text(WIDE_GAMUT_CONFIG)
+    job = make_job(
+        tmp_path,
+        input_space="gamma",
+        output_space="wide",
+        cube_size=17,
+        lut_format=lut_format,
+    )
+    engine.bake_transform_group([job])
+    reference_path = tmp_path / f"reference.{job.lut_ext}"
+    ociobakelut_cmd = core.get_ociobakelut_cmd(job)[:-1] + [str(reference_path)]
+    subprocess.run(ociobakelut_cmd, check=True, capture_output=True)
+    with open(job.lut_filename, "rb") as lut_file:
+        assert lut_file.read() == reference_path.read_bytes()
+
+
+@pytest.mark.skipif(shutil.which("ociobakelut") is None, reason="needs ociobakelut")
+@pytest.mark.parametrize("lut_format", sorted(lut_formats.SHAPER_WRITERS))
+def test_shaper_writers_match_ociobakelut(tmp_path, lut_format: str):
+    """In process shaper bakes write the bytes ociobakelut writes, a shaper is
+    evaluated once for all the LUTs sharing it"""
+    (tmp_path / "config.ocio").write_text(WIDE_GAMUT_CONFIG)
+    jobs = [
+        make_job(
+            tmp_path,
+            shaper_space="gamma",
+            output_space="wide",
+            cube_size=cube_size,
+            shaper_size=65,
+            lut_format=lut_format,
+        )
+        for cube_size in (9, 17)
+    ]
+    assert all(engine.can_bake_in_process(job) for job in jobs)
+    # without channel crosstalk, ociobakelut writes some formats as 1D LUTs
+    assert engine.can_bake_in_process(replace(jobs[0], output_space="gamma")) == (
+        lut_format not in lut_formats.CROSSTALK_ONLY_FORMATS
+    )
+    shaper_cache = engine.ShaperCache()
+    engine.bake_input_group(jobs, shaper_cache=shaper_cache)
+    assert (shaper_cache.evaluations, shaper_cache.reuses) == (1, 1)
+
+    for job in jobs:
+        reference_path = tmp_path / f"reference.{job.lut_ext}"
+        ociobakelut_cmd = core.get_ociobakelut_cmd(job)[:-1] + [str(reference_path)]
+        subprocess.run(ociobakelut_cmd, check=True, capture_output=True)
+        with open(job.lut_filename, "rb") as lut_file:
+            assert lut_file.read() == reference_path.read_bytes()
+
+    with pytest.raises(OCIO.Exception, match="crosstalk"):
+        engine.evaluate_shaper(replace(jobs[0], shaper_space="wide"))
@@ -0,0 +1,92 @@
+"""memory accounting related tests, and the memory budget of large batches
+
+The memory of each stage is recorded as test suite properties, run with
+--junitxml=<report.xml> to keep them.
+"""
+import json
+
+import pytest
+
+from ocio_lut_prescription.core import batch, memory
+
+JOBS = 100_000
+SHOTS = 1000
+# python memory a job planned may keep, and hold at once while its manifest is
+# parsed
+MAX_JOB_HEAP_BYTES = 640
+MAX_JOB_HEAP_PEAK_BYTES = 2048
+MAX_PLAN_RSS_GROWTH = 256 * 1024**2
+KEPT_BYTES = 1024**2
+
+
+@pytest.fixture(name="accounting")
+def fixture_accounting():
+    memory.ACCOUNTING.clear()
+    memory.ACCOUNTING.start()
+    yield memory.ACCOUNTING
+    memory.ACCOUNTING.stop()
+    memory.ACCOUNTING.clear()
+
+
+def test_stages_report(tmp_path, accounting):
+    """Nested stages record the memory they kept and held at once, the
+    allocating lines, and nothing once turned off"""
+    with memory.stage("outer") as outer:
+        with memory.stage("inner"):
+            kept = bytearray(KEPT_BYTES)
+            released = bytearray(4 * KEPT_BYTES)
+            del released
+    inner = accounting.get_stages("inner")[0]
+    assert outer is accounting.get_stages("outer")[0]
+    assert KEPT_BYTES <= inner.heap_growth < 2 * KEPT_BYTES
+    assert inner.heap_peak >= 5 * KEPT_BYTES
+    assert outer.heap_peak >= inner.heap_peak
+    assert outer.heap_growth >= inner.heap_growth
+    assert __file__ in inner.top_allocations[0]["line"]
+    assert inner.rss > 0
+
+    report_path = tmp_path / "memory.json"
+    memory.write_memory_report(str(report_path))
+    report = json.loads(report_path.read_text())
+    assert [stage["name"] for stage in report["stages"]] == ["inner", "outer"]
+
+    accounting.stop()
+    with memory.stage("off") as off:
+        assert off is None
+    assert not accounting.get_stages("off")
+    assert len(kept) == KEPT_BYTES
+
+
+def test_plan_jobs_budget(tmp_path, accounting, record_testsuite_property):
+    """Planning a manifest of 100k jobs fits in its memory budget"""
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            [
+                {
+                    "ocio_config": "/shows/abc/config/config.ocio",
+                    "env_seq": f"sq{index % SHOTS // 100:03d}",
+                    "env_shot": f"sh{index % SHOTS:04d}",
+                    "input_space": f"camera_{index // SHOTS % 10}",
+                    "output_space": f"display_{index // SHOTS // 10}",
+                    "cube_size": 33,
+                    "lut_format": "spi3d",
+                    "output_dir": "/shows/abc/luts",
+                }
+                for index in range(JOBS)
+            ]
+        )
+    )
+
+    jobs = batch.load_manifest(str(manifest_path))
+    with memory.stage("plan"):
+        jobs, _ = batch.resolve_cube_sizes(jobs)
+
+    assert len({job.lut_filename for job in jobs}) == JOBS
+    stage = accounting.get_stages("load_manifest")[0]
+    for name in ("heap_growth", "heap_peak", "rss_growth"):
+        record_testsuite_property(f"plan_{JOBS}_jobs_{name}", getattr(stage, name))
+    assert stage.heap_growth < JOBS * MAX_JOB_HEAP_BYTES
+    assert stage.heap_peak < JOBS * MAX_JOB_HEAP_PEAK_BYTES
+    assert stage.rss_growth < MAX_PLAN_RSS_GROWTH
+    assert accounting.get_stages("plan")[0].heap_growth < KEPT_BYTES
@@ -0,0 +1,60 @@
+"""metrics related tests
+"""
+from ocio_lut_prescription.core import batch, metrics
+from tests._constants import make_job
+
+
+def test_openmetrics_rendering():
+    """Counters and histograms render as OpenMetrics families"""
+    registry = metrics.Registry()
+    counter = registry.add(metrics.Counter("bakes", "Bakes.", ("status",)))
+    histogram = registry.add(
+        metrics.Histogram("duration_seconds", "D.", unit="seconds", buckets=(1, 2))
+    )
+    counter.inc(status='a"b')
+    counter.inc(2, status='a"b')
+    histogram.observe(0.5)
+    histogram.observe(1.5)
+
+    assert registry.render().splitlines() == [
+        "# TYPE bakes counter",
+        "# HELP bakes Bakes.",
+        'bakes_total{status="a\\"b"} 3',
+        "# TYPE duration_seconds histogram",
+        "# UNIT duration_seconds seconds",
+        "# HELP duration_seconds D.",
+        'duration_seconds_bucket{le="1.0"} 1',
+        'duration_seconds_bucket{le="2.0"} 2',
+        'duration_seconds_bucket{le="+Inf"} 2',
+        "duration_seconds_count 2",
+        "duration_seconds_sum 2.0",
+        "# EOF",
+    ]
+
+
+def test_batch_metrics_file(tmp_path):
+    """A batch counts its bakes and the bytes it wrote, the file is replaced
+    without leftovers"""
+    jobs = [
+        make_job(tmp_path, lut_format=lut_format)
+        for lut_format in ("spi3d", "resolve_cube")
+    ]
+    bakes = metrics.BAKES.get_value(lut_format="spi3d", status="ok") or 0
+    written = metrics.BYTES_WRITTEN.get_value(lut_format="spi3d") or 0
+
+    batch.run_batch(jobs, in_process=True)
+    metrics_path = tmp_path / "metrics" / "ocio_lut_prescription.prom"
+    metrics.write_metrics(str(metrics_path))
+
+    assert metrics.BAKES.get_value(lut_format="spi3d", status="ok") == bakes + 1
+    lut_size = (tmp_path / "linear_to_gamma_c5.spi3d").stat().st_size
+    assert metrics.BYTES_WRITTEN.get_value(lut_format="spi3d") == written + lut_size
+    assert metrics.LAST_BATCH_JOBS.get_value(status="ok") == 2
+
+    lines = metrics_path.read_text().splitlines()
+    assert lines[-1] == "# EOF"
+    assert 'ocio_lut_prescription_cache_hits_total{cache="config"}' in "\n".join(lines)
+    assert "ocio_lut_prescription_config_load_duration_seconds_count" in "\n".join(
+        lines
+    )
+    assert [path.name for path in metrics_path.parent.iterdir()] == [metrics_path.name]
@@ -0,0 +1,74 @@
+"""preset library related tests
+"""
+from ocio_lut_prescription.core import batch, presets
+
+PRESET_COUNT = 5000
+
+
+def get_preset_job(index: int):
+    return batch.bake_cmd_data_from_dict(
+        {
+            "ocio_config": f"/shows/show_{index % 10}/config.ocio",
+            "input_space": "ACEScg",
+            "output_space": f"display_{index % 7}",
+            "lut_format": "resolve_cube",
+            "output_dir": "/var/tmp",
+        }
+    )
+
+
+def test_preset_roundtrip(tmp_path):
+    """A preset loads back to the same prescription, per show"""
+    preset_store = presets.PresetStore(str(tmp_path / "presets.sqlite"))
+    job = get_preset_job(0)
+    preset_store.save("review", job, show="show_a")
+
+    assert preset_store.load("review", show="show_a") == job
+    assert preset_store.exists("review", show="show_a")
+    assert not preset_store.exists("review", show="show_b")
+    assert preset_store.load("review", show="show_b") is None
+
+    preset_store.delete("review", show="show_a")
+    assert preset_store.load("review", show="show_a") is None
+    preset_store.close()
+
+
+def test_preset_listing_at_scale(tmp_path):
+    """Thousands of presets are listed by show, config and output space"""
+    preset_store = presets.PresetStore(str(tmp_path / "presets.sqlite"))
+    for show in ("show_a", "show_b"):
+        preset_store.save_many(
+            (
+                (f"preset_{index:05d}", get_preset_job(index))
+                for index in range(PRESET_COUNT)
+            ),
+            show=show,
+        )
+
+    listed = preset_store.list(
+        show="show_a", ocio_config="/shows/show_3/config.ocio", output_space="display_2"
+    )
+
+    expected = [
+        f"preset_{index:05d}"
+        for index in range(PRESET_COUNT)
+        if index % 10 == 3 and index % 7 == 2
+    ]
+    assert [preset.name for preset in listed] == expected
+    assert len(preset_store.list()) == 2 * PRESET_COUNT
+    assert len(preset_store.list(show="show_b", limit=10)) == 10
+    plan = preset_store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT name FROM presets WHERE ocio_config = ?", ("",)
+    ).fetchall()
+    assert "USING INDEX" in str(plan)
+    preset_store.close()
+
+
+def test_unwritable_preset_store(tmp_path):
+    """A preset library that cannot be created is not opened"""
+    blocking_file = tmp_path / "file"
+    blocking_file.write_text("")
+    assert presets.open_preset_store(str(blocking_file / "presets.sqlite")) is None
+    preset_store = presets.open_preset_store(str(tmp_path / "presets.sqlite"))
+    assert preset_store is not None
+    preset_store.close()
@@ -0,0 +1,80 @@
+"""preview related tests
+
+The render time of the reference image is recorded as a test suite property,
+run with --junitxml=<report.xml> to keep it.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from ocio_lut_prescription.core import ocio, preview
+from tests._constants import TEST_CONFIG, make_job
+
+
+def test_reference_image():
+    """The reference chart and proxies of any image have the proxy size"""
+    reference_image = preview.get_reference_image()
+    assert reference_image.shape == (preview.PROXY_HEIGHT, preview.PROXY_WIDTH, 3)
+    assert reference_image.dtype == np.float32
+    assert reference_image.min() >= 0.0
+
+    proxy = preview.get_proxy(np.zeros((1080, 1920, 4), dtype=np.float32))
+    assert proxy.shape == (144, preview.PROXY_WIDTH, 3)
+
+
+def test_render_preview(tmp_path, record_testsuite_property):
+    """The proxy goes through the transform, with its processor cached"""
+    bake_cmd_data = make_job(tmp_path)
+    proxy = np.full((2, 2, 3), 0.25, dtype=np.float32)
+
+    pixels = preview.render_preview(bake_cmd_data, proxy)
+    assert pixels.dtype == np.uint8
+    assert (pixels == round(0.25 ** (1 / 2.2) * 255)).all()
+
+    start = time.perf_counter()
+    preview.render_preview(bake_cmd_data, preview.get_reference_image())
+    record_testsuite_property(
+        "render_reference_preview_seconds", time.perf_counter() - start
+    )
+    assert ocio.PROCESSOR_CACHE.cache_info().hits >= 1
+
+
+def test_processor_cache(tmp_path):
+    """Processors are served from the cache, the least recently used is evicted"""
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text(TEST_CONFIG)
+    processor_cache = ocio.ProcessorCache(maxsize=2)
+    keys = [
+        (str(config_path), "linear", "gamma", "", "", ""),
+        (str(config_path), "gamma", "linear", "", "", ""),
+        (str(config_path), "linear", "", "", "", ""),
+    ]
+
+    processor = processor_cache.get(keys[0])
+    assert processor_cache.get(keys[0]) is processor
+    processor_cache.get(keys[1])
+    processor_cache.get(keys[0])
+    processor_cache.get(keys[2])
+    assert processor_cache.get(keys[0]) is processor
+
+    cache_info = processor_cache.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (3, 3)
+    assert (cache_info.evictions, cache_info.currsize) == (1, 2)
+
+
+def test_edited_config(tmp_path):
+    """An edited config is parsed again, and gets new processors"""
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text(TEST_CONFIG)
+    processor_key = (str(config_path), "linear", "gamma", "", "", "")
+    ocio_config_obj = ocio.load_config(str(config_path))
+    processor = ocio.PROCESSOR_CACHE.get(processor_key)
+    assert ocio.load_config(str(config_path)) is ocio_config_obj
+    assert ocio.PROCESSOR_CACHE.get(processor_key) is processor
+
+    config_path.write_text(TEST_CONFIG.replace("value: 2.2", "value: 2.4"))
+    assert ocio.load_config(str(config_path)) is not ocio_config_obj
+    pixel = np.full(3, 0.25, dtype=np.float32)
+    ocio.PROCESSOR_CACHE.get(processor_key).getDefaultCPUProcessor().applyRGB(pixel)
+    assert pixel[0] == pytest.approx(0.25 ** (1 / 2.4), abs=1e-4)
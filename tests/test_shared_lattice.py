@@ -0,0 +1,184 @@
+"""shared memory lattice related tests
+
+The copy overhead benchmark records its timings and the bytes pickled as test
+suite properties, run with --junitxml=<report.xml> to keep them.
+"""
+import os
+import pickle
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pytest
+
+from ocio_lut_prescription.core import (
+    batch,
+    engine,
+    lut_formats,
+    resources,
+    shared_lattice,
+)
+from tests._constants import make_job
+
+CUBE_SIZE = 65
+PROCESSES = 2
+
+
+@pytest.fixture(name="job")
+def fixture_job(tmp_path):
+    return make_job(tmp_path, cube_size=CUBE_SIZE)
+
+
+@pytest.fixture(scope="module", name="lattice_pool")
+def fixture_lattice_pool():
+    with shared_lattice.LatticePool(PROCESSES) as lattice_pool:
+        yield lattice_pool
+
+
+def evaluate_slab_copy(cube_size: int, start: int, stop: int, bake_cmd_data):
+    """Slab evaluated in a worker and pickled back, the copying baseline"""
+    slab = shared_lattice.get_identity_nodes(cube_size, start, stop)
+    engine.get_cpu_processor(bake_cmd_data).applyRGB(slab)
+    return slab
+
+
+def crash_slab(block_name: str, cube_size: int, start: int, stop: int, bake_cmd_data):
+    """evaluate_slab of a worker dying halfway through its slab"""
+    shared_lattice.evaluate_slab(
+        block_name, cube_size, start, (start + stop) // 2, bake_cmd_data
+    )
+    os._exit(1)
+
+
+def get_own_blocks() -> set:
+    prefix = f"{shared_lattice.BLOCK_PREFIX}{os.getpid()}_"
+    return {
+        name
+        for name in os.listdir(shared_lattice.SHARED_MEMORY_DIR)
+        if name.startswith(prefix)
+    }
+
+
+def test_pool_lattice_matches(tmp_path, job, lattice_pool):
+    """Lattices evaluated by the pool are the lattices evaluated in process,
+    their blocks are gone once closed"""
+    expected = engine.evaluate_lattice(engine.get_cpu_processor(job), CUBE_SIZE)
+    with lattice_pool.evaluate(job, CUBE_SIZE) as lattice:
+        block_name = lattice.name
+        assert np.array_equal(lattice.array, expected)
+    assert lattice.array is None
+    assert not os.path.exists(
+        os.path.join(shared_lattice.SHARED_MEMORY_DIR, block_name)
+    )
+    assert not shared_lattice.VIEWED_BLOCKS
+
+    notes = engine.bake_transform_group([job], lattice_pool=lattice_pool)
+    assert "processes in shared memory" in notes[CUBE_SIZE]
+    reference_path = str(tmp_path / "reference.spi3d")
+    lut_formats.write_lut(reference_path, job.lut_format, expected, CUBE_SIZE)
+    with open(job.lut_filename, "rb") as lut_file, open(
+        reference_path, "rb"
+    ) as reference_file:
+        assert lut_file.read() == reference_file.read()
+
+
+@pytest.mark.skipif(
+    not os.path.isdir(shared_lattice.SHARED_MEMORY_DIR),
+    reason="needs POSIX shared memory files",
+)
+def test_orphaned_blocks_removed():
+    """Blocks of dead coordinators are unlinked, blocks of running ones kept"""
+    shared_memory_dir = shared_lattice.SHARED_MEMORY_DIR
+    with subprocess.Popen([sys.executable, "-c", "pass"]) as dead_process:
+        pass
+    names = [
+        f"{shared_lattice.BLOCK_PREFIX}{pid}_test"
+        for pid in (dead_process.pid, os.getpid())
+    ]
+    for name in names:
+        with open(os.path.join(shared_memory_dir, name), "wb"):
+            pass
+    try:
+        assert names[0] in shared_lattice.remove_orphaned_blocks()
+        assert not os.path.exists(os.path.join(shared_memory_dir, names[0]))
+        assert os.path.exists(os.path.join(shared_memory_dir, names[1]))
+    finally:
+        os.remove(os.path.join(shared_memory_dir, names[1]))
+
+
+def test_copy_overhead(job, lattice_pool, record_testsuite_property):
+    """Shared lattices send no array between the processes, unlike slabs
+    pickled back to the coordinator"""
+    slab_bounds = lattice_pool.get_slab_bounds(CUBE_SIZE)
+    lattice_bytes = CUBE_SIZE**3 * 3 * np.dtype(np.float32).itemsize
+
+    with ProcessPoolExecutor(
+        max_workers=PROCESSES, mp_context=get_context("spawn")
+    ) as executor:
+        # workers started, and their processors compiled, before the timings
+        list(executor.map(evaluate_slab_copy, *zip(*[(2, 0, 8, job)] * PROCESSES)))
+        lattice_pool.evaluate(job, CUBE_SIZE).close()
+
+        start = time.perf_counter()
+        slabs = list(
+            executor.map(
+                evaluate_slab_copy,
+                *zip(*[(CUBE_SIZE, *bounds, job) for bounds in slab_bounds]),
+            )
+        )
+        copied = np.concatenate(slabs)
+        copy_seconds = time.perf_counter() - start
+    copy_bytes = sum(
+        len(pickle.dumps((CUBE_SIZE, *bounds, job))) + len(pickle.dumps(slab))
+        for bounds, slab in zip(slab_bounds, slabs)
+    )
+
+    start = time.perf_counter()
+    with lattice_pool.evaluate(job, CUBE_SIZE) as lattice:
+        shared_seconds = time.perf_counter() - start
+        assert np.array_equal(lattice.array, copied)
+        shared_bytes = sum(
+            len(pickle.dumps((lattice.name, CUBE_SIZE, *bounds, job)))
+            + len(pickle.dumps(None))
+            for bounds in slab_bounds
+        )
+
+    for name, value in {
+        "copy_seconds": round(copy_seconds, 4),
+        "copy_pickled_bytes": copy_bytes,
+        "shared_seconds": round(shared_seconds, 4),
+        "shared_pickled_bytes": shared_bytes,
+    }.items():
+        record_testsuite_property(f"lattice_{CUBE_SIZE}_{name}", value)
+    assert copy_bytes > lattice_bytes
+    assert shared_bytes < lattice_bytes / 100
+
+
+@pytest.mark.skipif(
+    not os.path.isdir(shared_lattice.SHARED_MEMORY_DIR),
+    reason="needs POSIX shared memory files",
+)
+def test_worker_crash(job, monkeypatch):
+    """A worker dying mid-slab fails its group with a result, its block is
+    unlinked, and the next lattice is evaluated by new workers"""
+    expected = engine.evaluate_lattice(engine.get_cpu_processor(job), CUBE_SIZE)
+    blocks = get_own_blocks()
+    with shared_lattice.LatticePool(PROCESSES) as lattice_pool:
+        executor = lattice_pool._executor
+        monkeypatch.setattr(shared_lattice, "evaluate_slab", crash_slab)
+        result = batch.bake_in_process(
+            [job], resources.AdaptiveLimiter(1), None, lattice_pool=lattice_pool
+        )[0]
+        assert not result.ok
+        assert result.log.startswith("BrokenProcessPool")
+        assert not os.path.exists(job.lut_filename)
+        assert get_own_blocks() == blocks
+        assert lattice_pool._executor is not executor
+
+        monkeypatch.undo()
+        with lattice_pool.evaluate(job, CUBE_SIZE) as lattice:
+            assert np.array_equal(lattice.array, expected)
+    assert get_own_blocks() == blocks
@@ -0,0 +1,286 @@
+# pylint: disable=no-name-in-module
+"""ui load tests, against a large synthetic config, on an offscreen Qt platform
+
+Timings and memory growth are recorded as test suite properties, run with
+--junitxml=<report.xml> to keep them.
+"""
+import os
+import time
+import tracemalloc
+
+import pytest
+from PySide2.QtCore import QSettings, QThreadPool
+from PySide2.QtUiTools import QUiLoader
+from PySide2.QtWidgets import QApplication
+
+from ocio_lut_prescription.core import cache, memory, ocio, resources, ui
+from tests._constants import TEST_CONFIG
+from tests._synthetic_config import write_synthetic_config
+
+MAIN_WINDOW_UI = os.path.join(
+    os.path.dirname(ui.__file__), os.pardir, "ui", "main_window.ui"
+)
+CONFIG_SIZE = {
+    "colorspaces": 3000,
+    "looks": 300,
+    "displays": 30,
+    "views": 10,
+    "file_transforms": 300,
+}
+RELOADS = 3
+# python memory reloading the same config may keep
+MAX_RELOAD_HEAP_GROWTH = 16 * 1024**2
+BUDGET_COLORSPACES = 5000
+# memory budget of the first load of a config, per colorspace: the parsed
+# config, out of reach of tracemalloc, its names kept by the metadata cache,
+# and the items of the combo boxes, held by Qt
+MAX_PARSE_RSS_GROWTH_PER_COLORSPACE = 24 * 1024
+MAX_METADATA_HEAP_GROWTH_PER_COLORSPACE = 256
+MAX_FILL_RSS_GROWTH_PER_COLORSPACE = 1024
+MAX_FILL_HEAP_GROWTH = 64 * 1024
+
+
+@pytest.fixture(scope="module", name="qt_app")
+def fixture_qt_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="module", name="synthetic_config")
+def fixture_synthetic_config(tmp_path_factory):
+    return write_synthetic_config(
+        str(tmp_path_factory.mktemp("synthetic_config")), **CONFIG_SIZE
+    )
+
+
+@pytest.fixture(name="main_window")
+def fixture_main_window(qt_app, tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    main_window = QUiLoader().load(MAIN_WINDOW_UI)
+    yield main_window
+    QThreadPool.globalInstance().waitForDone()
+    main_window.deleteLater()
+    qt_app.processEvents()
+
+
+@pytest.fixture(name="settings")
+def fixture_settings(tmp_path):
+    return QSettings(str(tmp_path / "settings.ini"), QSettings.IniFormat)
+
+
+def measure(qt_app: QApplication, func, *args) -> dict:
+    """Run a ui function and wait for its background work, return its duration
+    and the memory it kept"""
+    rss_before = resources.get_process_usage(os.getpid())[0]
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    QThreadPool.globalInstance().waitForDone()
+    qt_app.processEvents()
+    duration = time.perf_counter() - start
+    heap_growth, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(duration, 4),
+        "heap_growth": heap_growth,
+        "heap_peak": heap_peak,
+        "rss_growth": resources.get_process_usage(os.getpid())[0] - rss_before,
+    }
+
+
+def record_metrics(record_testsuite_property, name: str, metrics: dict):
+    for metric, value in metrics.items():
+        record_testsuite_property(f"{name}_{metric}", value)
+
+
+def test_load_ocio_config(
+    qt_app, main_window, settings, synthetic_config, record_testsuite_property
+):
+    """A large config fills the combo boxes, parsed first, then from the cache"""
+    main_window.ocioCfgLineEdit.setText(synthetic_config)
+    record_metrics(
+        record_testsuite_property,
+        "parsed",
+        measure(qt_app, ui.load_ocio_config, main_window, settings),
+    )
+    ui.initialize_ui_default(main_window)
+    main_window.ocioCfgLineEdit.setText(synthetic_config)
+    record_metrics(
+        record_testsuite_property,
+        "cached",
+        measure(qt_app, ui.load_ocio_config, main_window, settings),
+    )
+
+    # the raw colorspace and sRGB display of the base config come on top
+    assert main_window.inputColorSpacesComboBox.count() == (
+        CONFIG_SIZE["colorspaces"] + 1
+    )
+    assert main_window.looksComboBox.count() == CONFIG_SIZE["looks"]
+    assert main_window.iccDisplaysComboBox.count() == CONFIG_SIZE["displays"] + 1
+    assert settings.value("ocio/config_path") == synthetic_config
+
+
+def test_load_settings(
+    qt_app, main_window, settings, synthetic_config, record_testsuite_property
+):
+    """Saved settings are restored against a large config"""
+    settings.setValue("ocio/config_path", synthetic_config)
+    settings.setValue("colorspaces/input", "colorspace_02345")
+    settings.setValue("colorspaces/looks", "look_0123")
+    record_metrics(
+        record_testsuite_property,
+        "load_settings",
+        measure(qt_app, ui.load_settings, qt_app, settings, main_window),
+    )
+
+    assert main_window.inputColorSpacesComboBox.currentText() == "colorspace_02345"
+    assert main_window.looksComboBox.currentText() == "look_0123"
+
+
+def test_initialize_ui_reloads(
+    qt_app, main_window, settings, synthetic_config, record_testsuite_property
+):
+    """Reloading the same config does not keep growing the memory"""
+
+    def reload_config():
+        ui.initialize_ui_default(main_window)
+        ui.initialize_ui(main_window, settings, {}, {}, synthetic_config)
+
+    reload_config()
+    reloads = [measure(qt_app, reload_config) for _ in range(RELOADS)]
+    for index, metrics in enumerate(reloads):
+        record_metrics(record_testsuite_property, f"reload_{index}", metrics)
+
+    assert main_window.inputColorSpacesComboBox.count() == (
+        CONFIG_SIZE["colorspaces"] + 1
+    )
+    assert sum(metrics["heap_growth"] for metrics in reloads) < MAX_RELOAD_HEAP_GROWTH
+
+
+def test_reload_applies_differences(
+    qt_app, main_window, settings, synthetic_config, record_testsuite_property
+):
+    """Reloading a config keeps the selections and applies only the names
+    removed and added"""
+    ui.initialize_ui_default(main_window)
+    main_window.ocioCfgLineEdit.setText(synthetic_config)
+    ui.load_ocio_config(main_window, settings)
+    main_window.inputColorSpacesComboBox.setCurrentText("colorspace_02345")
+    main_window.outputColorSpacesComboBox.setCurrentText("colorspace_00010")
+    main_window.looksComboBox.setCurrentText("look_0123")
+    main_window.cubeSizeComboBox.setCurrentText("17")
+
+    record_metrics(
+        record_testsuite_property,
+        "reload_unchanged",
+        measure(qt_app, ui.load_ocio_config, main_window, settings),
+    )
+    assert main_window.inputColorSpacesComboBox.count() == (
+        CONFIG_SIZE["colorspaces"] + 1
+    )
+    assert main_window.cubeSizeComboBox.currentText() == "17"
+
+    metadata = ocio.read_cached_config_metadata(synthetic_config)
+    colorspaces = [
+        name
+        for name in metadata["colorspaces"]
+        if name not in ("colorspace_00010", "colorspace_00500")
+    ]
+    colorspaces[100:100] = ["inserted_a", "inserted_b"]
+    colorspaces.append("inserted_c")
+    looks = metadata["looks"][::-1]
+    ui.initialize_ui_with_config_data(
+        main_window, colorspaces, colorspaces, colorspaces, looks, []
+    )
+
+    combo_box = main_window.inputColorSpacesComboBox
+    assert [combo_box.itemText(index) for index in range(combo_box.count())] == (
+        colorspaces
+    )
+    assert combo_box.currentText() == "colorspace_02345"
+    assert main_window.outputColorSpacesComboBox.currentText() != "colorspace_00010"
+    assert main_window.looksComboBox.itemText(0) == looks[0]
+    assert main_window.looksComboBox.currentText() == "look_0123"
+    assert main_window.iccDisplaysComboBox.count() == 0
+
+
+def test_config_memory_budget(
+    qt_app, main_window, settings, tmp_path, record_testsuite_property
+):
+    """Loading a 5k colorspaces config fits in its memory budget"""
+    config_path = write_synthetic_config(
+        str(tmp_path / "budget_config"), colorspaces=BUDGET_COLORSPACES
+    )
+    main_window.ocioCfgLineEdit.setText(config_path)
+    memory.ACCOUNTING.clear()
+    memory.ACCOUNTING.start()
+    try:
+        ui.load_ocio_config(main_window, settings)
+        QThreadPool.globalInstance().waitForDone()
+        qt_app.processEvents()
+    finally:
+        memory.ACCOUNTING.stop()
+    stages = {
+        name: memory.ACCOUNTING.get_stages(name)[0]
+        for name in ("config_parse", "config_metadata", "fill_combo_boxes")
+    }
+    memory.ACCOUNTING.clear()
+    for name, stage in stages.items():
+        record_metrics(
+            record_testsuite_property,
+            f"budget_{name}",
+            {"heap_growth": stage.heap_growth, "rss_growth": stage.rss_growth},
+        )
+
+    assert main_window.inputColorSpacesComboBox.count() == BUDGET_COLORSPACES + 1
+    assert stages["config_parse"].rss_growth < (
+        BUDGET_COLORSPACES * MAX_PARSE_RSS_GROWTH_PER_COLORSPACE
+    )
+    assert stages["config_metadata"].heap_growth < (
+        BUDGET_COLORSPACES * MAX_METADATA_HEAP_GROWTH_PER_COLORSPACE
+    )
+    assert stages["fill_combo_boxes"].rss_growth < (
+        BUDGET_COLORSPACES * MAX_FILL_RSS_GROWTH_PER_COLORSPACE
+    )
+    assert stages["fill_combo_boxes"].heap_growth < MAX_FILL_HEAP_GROWTH
+
+
+def test_prewarm_recent_processors(tmp_path, main_window, settings):
+    """The processors of the last selections are saved, most recent first, and
+    built in the background at the next start"""
+    config_path = tmp_path / "config.ocio"
+    config_path.write_text(TEST_CONFIG)
+    main_window.ocioCfgLineEdit.setText(str(config_path))
+    for combo_box in (
+        main_window.inputColorSpacesComboBox,
+        main_window.outputColorSpacesComboBox,
+        main_window.shaperColorSpacesComboBox,
+    ):
+        combo_box.addItems(["linear", "gamma"])
+    main_window.outputColorSpacesRadioButton.setChecked(True)
+    main_window.outputColorSpacesComboBox.setCurrentText("gamma")
+    ui.save_recent_processors(settings, main_window)
+    main_window.inputColorSpacesComboBox.setCurrentText("gamma")
+    main_window.outputColorSpacesComboBox.setCurrentText("linear")
+    main_window.shaperColorSpacesCheckBox.setChecked(True)
+    main_window.shaperColorSpacesComboBox.setCurrentText("linear")
+    ui.save_recent_processors(settings, main_window)
+    ui.save_recent_processors(settings, main_window)
+
+    # the shaper transform of the last selection is its output transform
+    processor_keys = [
+        (str(config_path), "gamma", "linear", "", "", ""),
+        (str(config_path), "linear", "gamma", "", "", ""),
+    ]
+    assert ui.get_recent_processors(settings) == processor_keys
+
+    misses = ocio.PROCESSOR_CACHE.cache_info().misses
+    ui.prewarm_processors(main_window, settings)
+    QThreadPool.globalInstance().waitForDone()
+    assert ocio.PROCESSOR_CACHE.cache_info().misses == misses + len(processor_keys)
+    for processor_key in processor_keys:
+        ocio.get_cached_processor(*processor_key)
+    assert ocio.PROCESSOR_CACHE.cache_info().misses == misses + len(processor_keys)
+
+    settings.setValue(ui.RECENT_PROCESSORS_KEY, "not json")
+    assert not ui.get_recent_processors(settings)
@@ -0,0 +1,91 @@
+"""shared directory work queue related tests
+"""
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from ocio_lut_prescription.core import batch, resources, work_queue
+from tests._constants import make_job
+
+
+def test_claims_are_exclusive(tmp_path):
+    """A job is claimed once, an expired lease returns it to the queue"""
+    job = make_job(tmp_path)
+    queue_dir = str(tmp_path / "queue")
+    work_queue.submit_jobs([job], queue_dir, lease_timeout=60, preflight=False)
+
+    claim_path = work_queue.claim_job(queue_dir, "a")
+    assert os.path.basename(claim_path).endswith(".json@a")
+    assert work_queue.claim_job(queue_dir, "b") is None
+    assert not work_queue.requeue_expired_leases(queue_dir, 60)
+
+    os.utime(claim_path, (0, 0))
+    assert work_queue.requeue_expired_leases(queue_dir, 60) == [
+        os.path.basename(claim_path).split("@")[0]
+    ]
+    assert work_queue.claim_job(queue_dir, "b").endswith("@b")
+
+
+@pytest.mark.skipif(shutil.which("ociobakelut") is None, reason="needs ociobakelut")
+def test_local_nodes(tmp_path):
+    """Processes standing in for nodes bake every job, the job of a dead worker
+    included, and their results are gathered in one report"""
+    jobs = [
+        make_job(tmp_path, cube_size=cube_size, output_dir=str(tmp_path / "luts"))
+        for cube_size in (3, 5, 9, 17, 33)
+    ]
+    queue_dir = str(tmp_path / "queue")
+    assert work_queue.submit_jobs(jobs, queue_dir, lease_timeout=5) == 5
+
+    # a worker dying with the costliest job
+    dead_claim_path = work_queue.claim_job(queue_dir, "dead")
+    os.utime(dead_claim_path, (0, 0))
+
+    context = multiprocessing.get_context("spawn")
+    nodes = [
+        context.Process(target=work_queue.run_worker, args=(queue_dir, 1, f"node{i}"))
+        for i in range(2)
+    ]
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.join(timeout=120)
+        assert node.exitcode == 0
+
+    report_path = str(tmp_path / "report.json")
+    results, unfinished = work_queue.gather_results(queue_dir, report_path)
+    assert not unfinished
+    assert sorted(result.key for result in results) == sorted(
+        batch.get_job_key(job) for job in jobs
+    )
+    assert all(result.ok for result in results)
+    assert all(os.path.isfile(job.lut_filename) for job in jobs)
+    assert not os.listdir(os.path.join(queue_dir, work_queue.CLAIMED_DIR))
+
+
+def test_failing_bake_is_published(tmp_path, monkeypatch):
+    """A bake that raises is published as failed, its claim released, and the
+    worker goes on with the next job"""
+    jobs = [make_job(tmp_path, cube_size=cube_size) for cube_size in (3, 5)]
+    queue_dir = str(tmp_path / "queue")
+    work_queue.submit_jobs(jobs, queue_dir, lease_timeout=60, preflight=False)
+
+    def fail_bake(job, *_):
+        raise RuntimeError(f"cannot bake {job.cube_size}")
+
+    monkeypatch.setattr(batch, "bake", fail_bake)
+    baked = work_queue.work(queue_dir, "a", resources.AdaptiveLimiter(1))
+    assert len(baked) == 2
+    assert all(not result.ok for _, result in baked)
+    assert {result.log for _, result in baked} == {
+        "RuntimeError: cannot bake 3",
+        "RuntimeError: cannot bake 5",
+    }
+    assert not os.listdir(os.path.join(queue_dir, work_queue.CLAIMED_DIR))
+    results, unfinished = work_queue.gather_results(
+        queue_dir, str(tmp_path / "report.json")
+    )
+    assert not unfinished
+    assert len(results) == 2